@@ -4,8 +4,9 @@ import requests
 import xml.etree.ElementTree as ET
 from requests.adapters import HTTPAdapter, Retry
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict
+from typing import Dict, Iterable, Iterator, Optional
 
+from adapters.throttling.adaptive_rate_limiter import RATE_LIMITER, AdaptiveRateLimiter
 from ports.exchange_admin_client import ExchangeAdminPort
 from application.dto.trace_dto import MessageTraceDTO
 from config.settings import TOKEN_PROVIDER
@@ -18,15 +19,23 @@ XML_NS = {
     'm': 'http://schemas.microsoft.com/ado/2007/08/dataservices/metadata',
     'd': 'http://schemas.microsoft.com/ado/2007/08/dataservices'
 }
+_ATOM_ENTRY = f"{{{XML_NS['atom']}}}entry"
+_ATOM_LINK = f"{{{XML_NS['atom']}}}link"
+_M_PROPERTIES = f"{{{XML_NS['m']}}}properties"
 
 
 class ExchangeAdminClient(ExchangeAdminPort):
     _BASE_URL = "https://reports.office365.com/ecp/reportingwebservice/reporting.svc"
     _API_SCOPE = "https://outlook.office365.com/.default"
     _TIMEOUT = (10, 60)
+    _THROTTLE_STATUS = (429, 503)
+    _THROTTLE_MAX_RETRIES = 5
+    # Janela de cada consulta do rastreamento em lote (o serviço limita o total por consulta)
+    _TRACE_WINDOW = timedelta(hours=24)
 
-    def __init__(self) -> None:
+    def __init__(self, rate_limiter: Optional[AdaptiveRateLimiter] = None) -> None:
         self.session = self._build_session()
+        self.rate_limiter = rate_limiter or RATE_LIMITER
 
     def trace_message_by_id(
         self,
@@ -55,7 +64,7 @@ class ExchangeAdminClient(ExchangeAdminPort):
         url = f"{self._BASE_URL}/MessageTrace?$filter={filter_query}"
 
         try:
-            response_text = self._get_xml_text(url)
+            response_text = self._get_xml_text(url, sender_address)
             if not response_text:
                 log.warn("exchange_client.trace_message.empty_response")
                 return None
@@ -72,10 +81,7 @@ class ExchangeAdminClient(ExchangeAdminPort):
                 log.warn("exchange_client.trace_message.not_found_no_properties")
                 return None
 
-            trace_data = {
-                child.tag.replace(f"{{{XML_NS['d']}}}", ''): child.text
-                for child in properties_element
-            }
+            trace_data = self._properties(properties_element)
             
             log.info("exchange_client.trace_message.found", status=trace_data.get("Status"))
             return self._trace_from_api_properties(trace_data)
@@ -93,23 +99,126 @@ class ExchangeAdminClient(ExchangeAdminPort):
             log.exception("exchange_client.trace_message.generic_error", url=url)
             return None
 
+    def trace_messages(
+        self,
+        sender_address: str,
+        message_ids: Iterable[str],
+        start: datetime,
+        end: datetime,
+    ) -> Dict[str, MessageTraceDTO]:
+        """
+        Rastreia várias mensagens do remetente numa só varredura: lê o
+        MessageTrace de [start, end] (em janelas de `_TRACE_WINDOW`, com
+        paginação) e indexa por MessageId. A varredura vai até o fim: o feed
+        não garante ordem, então uma linha mais antiga da mesma mensagem pode
+        vir depois. Havendo várias linhas por mensagem (uma por destinatário),
+        fica a de `Received` mais antigo. Chaves do resultado: os ids recebidos.
+        """
+        wanted = {mid.strip().strip('<>'): mid for mid in message_ids if mid}
+        if not wanted:
+            return {}
+        log = logger.bind(sender=sender_address, messages=len(wanted))
+        log.info("exchange_client.trace_messages.start", start=start.isoformat(), end=end.isoformat())
+
+        found: Dict[str, MessageTraceDTO] = {}
+        rows = 0
+        try:
+            for trace in self.iter_message_traces(sender_address, start, end):
+                rows += 1
+                key = wanted.get((trace.message_id or '').strip('<>'))
+                if key is None:
+                    continue
+                current = found.get(key)
+                if current is None or trace.received_datetime < current.received_datetime:
+                    found[key] = trace
+        except requests.exceptions.RequestException:
+            log.exception("exchange_client.trace_messages.http_error", resolved=len(found))
+        except ET.ParseError:
+            log.exception("exchange_client.trace_messages.xml_parse_error", resolved=len(found))
+
+        log.info("exchange_client.trace_messages.success", rows=rows, resolved=len(found))
+        return found
+
+    def iter_message_traces(
+        self, sender_address: str, start: datetime, end: datetime
+    ) -> Iterator[MessageTraceDTO]:
+        """
+        Todas as linhas de MessageTrace do remetente em [start, end], janela a
+        janela e página a página (`<link rel="next">` do feed Atom). O XML é
+        lido em streaming com `iterparse`: cada `<entry>` é convertido e
+        descartado, sem montar o documento inteiro em memória.
+        """
+        window_start = start.astimezone(timezone.utc)
+        end = end.astimezone(timezone.utc)
+        while window_start < end:
+            window_end = min(window_start + self._TRACE_WINDOW, end)
+            filter_query = (
+                f"StartDate eq datetime'{window_start:%Y-%m-%dT%H:%M:%SZ}' and "
+                f"EndDate eq datetime'{window_end:%Y-%m-%dT%H:%M:%SZ}' and "
+                f"SenderAddress eq '{sender_address}'"
+            )
+            url: Optional[str] = f"{self._BASE_URL}/MessageTrace?$filter={filter_query}"
+            seen: set[str] = set()
+            while url and url not in seen:
+                seen.add(url)
+                url = yield from self._iter_trace_page(url, sender_address)
+            window_start = window_end
+
+    def _iter_trace_page(self, url: str, sender_address: str) -> Iterator[MessageTraceDTO]:
+        """Entrega as linhas de uma página e retorna o link da próxima (ou None)."""
+        next_link: Optional[str] = None
+        with self._get(url, sender_address, stream=True) as resp:
+            resp.raw.decode_content = True
+            for _, elem in ET.iterparse(resp.raw, events=("end",)):
+                if elem.tag == _ATOM_ENTRY:
+                    props = elem.find(f".//{_M_PROPERTIES}")
+                    if props is not None:
+                        yield self._trace_from_api_properties(self._properties(props))
+                    elem.clear()
+                elif elem.tag == _ATOM_LINK and elem.get("rel") == "next":
+                    next_link = elem.get("href")
+        return next_link
+
+    @staticmethod
+    def _properties(element: ET.Element) -> Dict[str, Optional[str]]:
+        return {child.tag.replace(f"{{{XML_NS['d']}}}", ''): child.text for child in element}
+
     @staticmethod
     def _build_session() -> requests.Session:
         session = requests.Session()
         retry_cfg = Retry(
             total=2, 
             backoff_factor=0.5,
-            status_forcelist=[429, 502, 503, 504],
+            status_forcelist=[502, 504],  # 429/503 ficam com o limitador
             allowed_methods=["GET"]
         )
         session.mount("https://", HTTPAdapter(max_retries=retry_cfg))
         return session
     
-    def _get_xml_text(self, url: str) -> str:
-        """ Executa a requisição GET e retorna o corpo da resposta como texto. """
-        resp = self.session.get(url, headers=self._headers(), timeout=self._TIMEOUT)
+    def _get_xml_text(self, url: str, sender_address: Optional[str] = None) -> str:
+        """ Executa a requisição GET (via limitador) e retorna o corpo da resposta como texto. """
+        return self._get(url, sender_address).text
+
+    def _get(self, url: str, sender_address: Optional[str] = None, stream: bool = False) -> requests.Response:
+        """ GET via limitador; com `stream`, o corpo fica para o chamador ler (e fechar). """
+        keys = self.rate_limiter.keys_for("exchange", sender_address)
+        for _ in range(self._THROTTLE_MAX_RETRIES):
+            self.rate_limiter.acquire(keys)
+            resp = self.session.get(url, headers=self._headers(), timeout=self._TIMEOUT, stream=stream)
+            if resp.status_code not in self._THROTTLE_STATUS:
+                break
+            self.rate_limiter.on_throttle(keys, self._retry_after(resp))
+            resp.close()
         resp.raise_for_status()
-        return resp.text
+        self.rate_limiter.on_success(keys)
+        return resp
+
+    @staticmethod
+    def _retry_after(resp: requests.Response) -> Optional[float]:
+        try:
+            return float(resp.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
 
     def _headers(self) -> dict[str, str]:
         """ Cabeçalhos para a API. """
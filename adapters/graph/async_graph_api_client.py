@@ -0,0 +1,553 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+import structlog
+import httpx
+from typing import AsyncIterator, Awaitable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from adapters.graph.graph_api_client import GraphApiClient
+from adapters.graph.mime_utils import header_block_end, parse_mime_headers_many
+from adapters.telemetry.prometheus_metrics import (
+    CONVERSATION_LOOKUPS,
+    GRAPH_PAGES,
+    GRAPH_RETRIES,
+    GRAPH_THROTTLED,
+    graph_endpoint,
+    observe_graph_response,
+)
+from adapters.throttling.adaptive_rate_limiter import RATE_LIMITER, AdaptiveRateLimiter
+from ports.graph_client import GraphClientPort
+from application.dto.folder_dto import FolderDTO
+from application.dto.mime_headers_dto import MimeHeadersDTO
+from application.dto.email_dto import EmailDTO
+from application.dto.page_dto import MessagePageDTO
+from config.profiling import PROFILER
+from config.settings import GRAPH_BASE_URL, GRAPH_MAX_IN_FLIGHT, MIME_TIMEOUT_SEC, TOKEN_PROVIDER
+
+try:  # HTTP/2 só é negociado quando o pacote `h2` está instalado
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+logger = structlog.get_logger(__name__)
+T = TypeVar("T")
+
+
+class AsyncGraphApiClient(GraphClientPort):
+    """
+    Adaptador Microsoft Graph API assíncrono (httpx, keep-alive, HTTP/2).
+
+    Um event loop dedicado roda em uma thread própria e concentra todas as
+    requisições em um único pool de conexões. Os métodos `*_async` devem ser
+    aguardados nesse loop (`client.loop`); os métodos do `GraphClientPort`
+    são fachadas síncronas, então o adaptador substitui o `GraphApiClient`
+    sem mudanças nos casos de uso — inclusive com várias threads de conta.
+    """
+
+    _TIMEOUT = httpx.Timeout(60.0, connect=3.05)
+    _MAX_RETRIES = 3
+    _RETRY_STATUS = (401, 403, 500, 502, 504)
+    _THROTTLE_STATUS = GraphApiClient._THROTTLE_STATUS
+    _THROTTLE_MAX_RETRIES = GraphApiClient._THROTTLE_MAX_RETRIES
+
+    # Campos, caminhos e conversões idênticos aos do adaptador síncrono
+    _MESSAGE_FIELDS = GraphApiClient._MESSAGE_FIELDS
+    _HEAD_FIELDS = GraphApiClient._HEAD_FIELDS
+    _BATCH_LIMIT = GraphApiClient._BATCH_LIMIT
+    _BATCH_MAX_ATTEMPTS = GraphApiClient._BATCH_MAX_ATTEMPTS
+    _BATCH_RETRY_STATUS = GraphApiClient._BATCH_RETRY_STATUS
+    _SYNC_STATE_ERRORS = GraphApiClient._SYNC_STATE_ERRORS
+    _MAX_HEADER_BYTES = GraphApiClient._MAX_HEADER_BYTES
+    _folder_from_api = staticmethod(GraphApiClient._folder_from_api)
+    _email_from_api = staticmethod(GraphApiClient._email_from_api)
+    _retry_after = staticmethod(GraphApiClient._retry_after)
+    _conversation_head_path = classmethod(GraphApiClient._conversation_head_path.__func__)
+    _delta_page_from_api = classmethod(GraphApiClient._delta_page_from_api.__func__)
+    _is_sync_state_expired = classmethod(GraphApiClient._is_sync_state_expired.__func__)
+    _window_filter = staticmethod(GraphApiClient._window_filter)
+    _clip_to_window = staticmethod(GraphApiClient._clip_to_window)
+
+    def __init__(
+        self,
+        max_in_flight: int = GRAPH_MAX_IN_FLIGHT,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    ) -> None:
+        self.base_url = GRAPH_BASE_URL.rstrip("/")
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = rate_limiter or RATE_LIMITER
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="graph-async-loop", daemon=True
+        )
+        self._thread.start()
+        # Cliente e semáforo precisam ser criados dentro do loop que os usa
+        self._client, self._in_flight = self._run(self._build_client())
+
+    # --------------------------------------------------------------------- #
+    #   API assíncrona                                                      #
+    # --------------------------------------------------------------------- #
+    async def fetch_mail_folders_async(self, account: str) -> List[FolderDTO]:
+        log = logger.bind(user=account)
+        log.info("graph.fetch_mail_folders.start")
+
+        url = f"{self.base_url}/users/{account}/mailFolders"
+        folders = [
+            self._folder_from_api(item)
+            async for page in self._paginate(url, log, account=account)
+            for item in page.get("value", [])
+        ]
+
+        log.info("graph.fetch_mail_folders.success", total=len(folders))
+        return folders
+
+    async def fetch_message_detail_async(self, account: str, message_id: str) -> dict:
+        url = f"{self.base_url}/users/{account}/messages/{message_id}"
+        return await self._get(url, account=account)
+
+    async def fetch_message_mime_async(self, account: str, message_id: str) -> str:
+        """MIME bruto (`/messages/{id}/$value`), com limitador, Retry-After e reenvios como as demais."""
+        url = f"{self.base_url}/users/{account}/messages/{message_id}/$value"
+        resp = await self._request_response("GET", url, account=account)
+        return resp.content.decode(errors="replace")
+
+    async def fetch_message_headers_async(
+        self, account: str, message_id: str, timeout: Optional[float] = None
+    ) -> str:
+        """Só os cabeçalhos do MIME: o stream é fechado ao fim do bloco."""
+        url = f"{self.base_url}/users/{account}/messages/{message_id}/$value"
+        keys = self.rate_limiter.keys_for("graph", account)
+        await asyncio.sleep(self.rate_limiter.reserve(keys))
+        async with self._in_flight:
+            headers = await self._headers()
+            return await asyncio.wait_for(
+                self._read_header_block(url, headers, keys), timeout or MIME_TIMEOUT_SEC
+            )
+
+    async def fetch_message_headers_many_async(
+        self, account: str, message_ids: Iterable[str], max_workers: int, timeout: float
+    ) -> Dict[str, str]:
+        """Cabeçalhos de várias mensagens, até `max_workers` ao mesmo tempo."""
+        limit = asyncio.Semaphore(max_workers)
+
+        async def one(message_id: str) -> tuple[str, Optional[str]]:
+            async with limit:
+                try:
+                    return message_id, await self.fetch_message_headers_async(account, message_id, timeout)
+                except (httpx.HTTPError, asyncio.TimeoutError):
+                    logger.warning("graph.fetch_message_headers.failed", user=account, message_id=message_id)
+                    return message_id, None
+
+        results = await asyncio.gather(*(one(mid) for mid in dict.fromkeys(message_ids)))
+        return {mid: head for mid, head in results if head is not None}
+
+    async def fetch_messages_in_folder_async(
+        self,
+        account: str,
+        folder_id: str,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+    ) -> List[EmailDTO]:
+        return [
+            dto
+            async for page in self.iter_messages_in_folder_async(account, folder_id, page_size, since)
+            for dto in page.emails
+        ]
+
+    async def iter_messages_in_folder_async(
+        self,
+        account: str,
+        folder_id: str,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+        start_link: Optional[str] = None,
+    ) -> AsyncIterator[MessagePageDTO]:
+        log = logger.bind(user=account, folder_id=folder_id, page_size=page_size, since=since)
+        log.info("graph.fetch_messages.start")
+
+        filter_query = f"{self._window_filter('sentDateTime', since)}&" if since else ""
+        url = start_link or (
+            f"{self.base_url}/users/{account}/mailFolders/{folder_id}/messages"
+            f"?{filter_query}$orderby=sentDateTime desc"
+            f"&$select={','.join(self._MESSAGE_FIELDS)}&$top={page_size}"
+        )
+        total = size = 0
+        pages = self._iter_pages(url, log, account=account)
+        async for page, page_bytes in pages:
+            with PROFILER.span("graph.convert", items=len(page.get("value", []))):
+                emails = [self._email_from_api(item) for item in page.get("value", [])]
+            emails, window_reached = self._clip_to_window(emails, since)
+            total += len(emails)
+            size += page_bytes
+            yield MessagePageDTO(
+                emails=emails,
+                next_link=page.get("@odata.nextLink"),
+                size_bytes=page_bytes,
+                window_reached=window_reached,
+            )
+            if window_reached:
+                await pages.aclose()
+                break
+
+        log.info("graph.fetch_messages.success", emails=total, bytes=size)
+
+    async def iter_message_delta_async(
+        self,
+        account: str,
+        folder_id: str,
+        delta_link: Optional[str] = None,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+    ) -> AsyncIterator[MessagePageDTO]:
+        log = logger.bind(user=account, folder_id=folder_id, page_size=page_size)
+        full_resync = delta_link is None
+        log.info("graph.message_delta.start", full_resync=full_resync)
+
+        initial_url = (
+            f"{self.base_url}/users/{account}/mailFolders/{folder_id}/messages/delta"
+            f"?$select={','.join(self._MESSAGE_FIELDS)}"
+        )
+        if since:
+            initial_url += f"&{self._window_filter('receivedDateTime', since)}"
+        headers = {"Prefer": f"odata.maxpagesize={page_size}"}
+
+        pages = self._paginate(delta_link or initial_url, log, headers=headers, account=account)
+        try:
+            current = await anext(pages, None)
+        except httpx.HTTPStatusError as exc:
+            if full_resync or not self._is_sync_state_expired(exc):
+                raise
+            log.warning("graph.message_delta.token_expired")
+            full_resync = True
+            pages = self._paginate(initial_url, log, headers=headers, account=account)
+            current = await anext(pages, None)
+
+        changed = removed = 0
+        while current is not None:
+            with PROFILER.span("graph.convert", items=len(current.get("value", []))):
+                page = self._delta_page_from_api(current, full_resync)
+            page.emails, _ = self._clip_to_window(page.emails, since)
+            changed += len(page.emails)
+            removed += len(page.removed_ids)
+            yield page
+            current = await anext(pages, None)
+
+        log.info(
+            "graph.message_delta.success",
+            changed=changed, removed=removed, full_resync=full_resync,
+        )
+
+    async def fetch_conversation_head_async(
+        self, account: str, conversation_id: str, top: int = 10
+    ) -> List[EmailDTO]:
+        url = f"{self.base_url}{self._conversation_head_path(account, conversation_id, top)}"
+        CONVERSATION_LOOKUPS.inc()
+        page = await self._get(url, account=account)
+        return [self._email_from_api(item) for item in page.get("value", [])]
+
+    async def fetch_conversation_heads_async(
+        self, account: str, conversation_ids: Iterable[str], top: int = 10
+    ) -> Dict[str, List[EmailDTO]]:
+        """Dispara todos os `$batch` da conta em paralelo (limitados por `max_in_flight`)."""
+        log = logger.bind(user=account)
+        conv_ids = list(dict.fromkeys(conversation_ids))
+        log.info("graph.conversation_heads.start", conversations=len(conv_ids))
+        CONVERSATION_LOOKUPS.inc(len(conv_ids))
+
+        chunks = [
+            conv_ids[start : start + self._BATCH_LIMIT]
+            for start in range(0, len(conv_ids), self._BATCH_LIMIT)
+        ]
+        heads: Dict[str, List[EmailDTO]] = {}
+        for partial in await asyncio.gather(
+            *(self._batch_conversation_heads(account, chunk, top, log) for chunk in chunks)
+        ):
+            heads.update(partial)
+
+        log.info(
+            "graph.conversation_heads.success",
+            conversations=len(conv_ids), resolved=len(heads),
+        )
+        return heads
+
+    # --------------------------------------------------------------------- #
+    #   GraphClientPort (fachadas síncronas)                                #
+    # --------------------------------------------------------------------- #
+    def fetch_mail_folders(self, account: str) -> List[FolderDTO]:
+        return self._run(self.fetch_mail_folders_async(account))
+
+    def fetch_message_detail(self, account: str, message_id: str) -> dict:
+        return self._run(self.fetch_message_detail_async(account, message_id))
+
+    def fetch_message_mime(self, account: str, message_id: str) -> str:
+        return self._run(self.fetch_message_mime_async(account, message_id))
+
+    def fetch_message_headers(self, account: str, message_id: str, timeout: Optional[float] = None) -> str:
+        return self._run(self.fetch_message_headers_async(account, message_id, timeout))
+
+    def fetch_message_headers_many(
+        self, account: str, message_ids: Iterable[str], max_workers: int, timeout: float
+    ) -> Dict[str, str]:
+        return self._run(self.fetch_message_headers_many_async(account, message_ids, max_workers, timeout))
+
+    def analyze_message_headers(
+        self, account: str, message_ids: Iterable[str], max_workers: int, timeout: float
+    ) -> Dict[str, MimeHeadersDTO]:
+        return parse_mime_headers_many(self, account, message_ids, max_workers, timeout)
+
+    def fetch_messages_in_folder(
+        self,
+        account: str,
+        folder_id: str,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+    ) -> List[EmailDTO]:
+        return self._run(self.fetch_messages_in_folder_async(account, folder_id, page_size, since))
+
+    def iter_messages_in_folder(
+        self,
+        account: str,
+        folder_id: str,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+        start_link: Optional[str] = None,
+    ) -> Iterator[MessagePageDTO]:
+        pages = self.iter_messages_in_folder_async(account, folder_id, page_size, since, start_link)
+        while (page := self._run(anext(pages, None))) is not None:
+            yield page
+
+    def iter_message_delta(
+        self,
+        account: str,
+        folder_id: str,
+        delta_link: Optional[str] = None,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+    ) -> Iterator[MessagePageDTO]:
+        pages = self.iter_message_delta_async(account, folder_id, delta_link, page_size, since)
+        while (page := self._run(anext(pages, None))) is not None:
+            yield page
+
+    def fetch_conversation_head(
+        self, account: str, conversation_id: str, top: int = 10
+    ) -> List[EmailDTO]:
+        return self._run(self.fetch_conversation_head_async(account, conversation_id, top))
+
+    def fetch_conversation_heads(
+        self, account: str, conversation_ids: Iterable[str], top: int = 10
+    ) -> Dict[str, List[EmailDTO]]:
+        return self._run(self.fetch_conversation_heads_async(account, conversation_ids, top))
+
+    def close(self) -> None:
+        """Fecha o pool de conexões e encerra o loop dedicado."""
+        self._run(self._client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+    # --------------------------------------------------------------------- #
+    #   Helpers privados                                                    #
+    # --------------------------------------------------------------------- #
+    async def _build_client(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        limits = httpx.Limits(
+            max_connections=self.max_in_flight,
+            max_keepalive_connections=self.max_in_flight,
+            keepalive_expiry=30.0,
+        )
+        client = httpx.AsyncClient(http2=_HTTP2_AVAILABLE, limits=limits, timeout=self._TIMEOUT)
+        logger.info(
+            "graph.async_client.ready",
+            http2=_HTTP2_AVAILABLE, max_in_flight=self.max_in_flight,
+        )
+        return client, asyncio.Semaphore(self.max_in_flight)
+
+    async def _read_header_block(self, url: str, headers: dict[str, str], keys) -> str:
+        start = time.perf_counter()
+        async with self._client.stream("GET", url, headers=headers) as resp:
+            observe_graph_response("message_headers", resp.status_code, time.perf_counter() - start)
+            if resp.status_code in self._THROTTLE_STATUS:
+                self.rate_limiter.on_throttle(keys, self._retry_after(resp.headers))
+            resp.raise_for_status()
+            self.rate_limiter.on_success(keys)
+            buf = bytearray()
+            async for chunk in resp.aiter_bytes():
+                searched = len(buf)
+                buf += chunk
+                end = header_block_end(buf, searched)
+                if end >= 0:
+                    return buf[:end].decode(errors="replace")
+                if len(buf) >= self._MAX_HEADER_BYTES:
+                    break
+        return bytes(buf).decode(errors="replace")
+
+    def _run(self, coro: Awaitable[T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _headers(self, extra: Optional[dict[str, str]] = None) -> dict[str, str]:
+        # O TokenManager bloqueia na primeira obtenção (ou com o token vencido); não pode travar o loop
+        token = await asyncio.to_thread(TOKEN_PROVIDER.get_token)
+        return {"Authorization": f"Bearer {token}", **(extra or {})}
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        account: Optional[str] = None,
+        headers: Optional[dict[str, str]] = None,
+        json: Optional[dict] = None,
+        tenant_cost: Optional[float] = None,
+    ) -> dict:
+        resp = await self._request_response(
+            method, url, account=account, headers=headers, json=json, tenant_cost=tenant_cost
+        )
+        return resp.json()
+
+    async def _request_response(
+        self,
+        method: str,
+        url: str,
+        *,
+        account: Optional[str] = None,
+        headers: Optional[dict[str, str]] = None,
+        json: Optional[dict] = None,
+        tenant_cost: Optional[float] = None,
+    ) -> httpx.Response:
+        """Requisição com limitador, limite de concorrência, retries e logging de erro."""
+        keys = self.rate_limiter.keys_for("graph", account)
+        endpoint = graph_endpoint(url)
+        attempt = throttled = 0
+        while True:
+            attempt += 1
+            try:
+                await asyncio.sleep(self.rate_limiter.reserve(keys, tenant_cost=tenant_cost))
+                async with self._in_flight:
+                    start = time.perf_counter()
+                    resp = await self._client.request(
+                        method, url, headers=await self._headers(headers), json=json
+                    )
+                    observe_graph_response(endpoint, resp.status_code, time.perf_counter() - start)
+                if resp.status_code in self._THROTTLE_STATUS and throttled < self._THROTTLE_MAX_RETRIES:
+                    # A espera do Retry-After acontece no próximo `reserve`
+                    throttled += 1
+                    self.rate_limiter.on_throttle(keys, self._retry_after(resp.headers))
+                    GRAPH_RETRIES.labels(endpoint).inc()
+                    continue
+                if resp.status_code in self._RETRY_STATUS and attempt <= self._MAX_RETRIES:
+                    delay = self._retry_after(resp.headers) or 0.5 * 2 ** (attempt - 1)
+                    logger.debug("graph.request.retry", url=url, status=resp.status_code, delay=delay)
+                    GRAPH_RETRIES.labels(endpoint).inc()
+                    await asyncio.sleep(delay)
+                    continue
+                resp.raise_for_status()
+                self.rate_limiter.on_success(keys)
+                return resp
+            except httpx.HTTPError:
+                logger.exception("graph.request.error", url=url)
+                raise
+
+    async def _get(
+        self, url: str, headers: Optional[dict[str, str]] = None, account: Optional[str] = None
+    ) -> dict:
+        return await self._request("GET", url, account=account, headers=headers)
+
+    async def _paginate(
+        self,
+        first_url: str,
+        log,
+        headers: Optional[dict[str, str]] = None,
+        account: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
+        """Itera sobre páginas Graph API, evitando loops de nextLink."""
+        async for data, _ in self._iter_pages(first_url, log, headers, account):
+            yield data
+
+    async def _iter_pages(
+        self,
+        first_url: str,
+        log,
+        headers: Optional[dict[str, str]] = None,
+        account: Optional[str] = None,
+    ) -> AsyncIterator[tuple[dict, int]]:
+        """Como `_paginate`, mas entrega também o tamanho em bytes de cada página."""
+        url = first_url
+        page = 0
+        seen: set[str] = set()
+
+        while url:
+            if url in seen:
+                log.error("graph.pagination.loop_detected", url=url)
+                break
+            seen.add(url)
+
+            page += 1
+            log.debug("graph.pagination.page", num=page, url=url)
+            endpoint = graph_endpoint(url)
+            with PROFILER.span("graph.page", endpoint=endpoint):
+                resp = await self._request_response("GET", url, account=account, headers=headers)
+                data = resp.json()
+            GRAPH_PAGES.labels(endpoint).inc()
+            yield data, len(resp.content)
+            url = data.get("@odata.nextLink")
+
+    async def _batch_conversation_heads(
+        self, account: str, conv_ids: List[str], top: int, log
+    ) -> Dict[str, List[EmailDTO]]:
+        pending = {str(i): conv_id for i, conv_id in enumerate(conv_ids)}
+        heads: Dict[str, List[EmailDTO]] = {}
+
+        for attempt in range(1, self._BATCH_MAX_ATTEMPTS + 1):
+            payload = {
+                "requests": [
+                    {
+                        "id": req_id,
+                        "method": "GET",
+                        "url": self._conversation_head_path(account, conv_id, top),
+                    }
+                    for req_id, conv_id in pending.items()
+                ]
+            }
+            # Um token da caixa postal por requisição HTTP; o tenant paga cada sub-requisição
+            data = await self._request(
+                "POST", f"{self.base_url}/$batch", account=account, json=payload,
+                tenant_cost=len(pending),
+            )
+
+            retry_after, throttled = 0.0, False
+            for resp in data.get("responses", []):
+                conv_id = pending.get(resp.get("id"))
+                if conv_id is None:
+                    continue
+                status = resp.get("status", 0)
+                if status == 200:
+                    heads[conv_id] = [
+                        self._email_from_api(item)
+                        for item in (resp.get("body") or {}).get("value", [])
+                    ]
+                    del pending[resp["id"]]
+                elif status in self._BATCH_RETRY_STATUS:
+                    if status in self._THROTTLE_STATUS:
+                        GRAPH_THROTTLED.labels("batch").inc()
+                    throttled = throttled or status in self._THROTTLE_STATUS
+                    retry_after = max(retry_after, self._retry_after(resp.get("headers") or {}))
+                else:
+                    log.warning("graph.batch.item_failed", conv_id=conv_id, status=status)
+                    del pending[resp["id"]]
+
+            if throttled:
+                self.rate_limiter.on_throttle(
+                    self.rate_limiter.keys_for("graph", account), retry_after or None
+                )
+            if not pending:
+                break
+            if attempt < self._BATCH_MAX_ATTEMPTS:
+                delay = 0.0 if throttled else retry_after or 0.5 * 2 ** (attempt - 1)
+                log.info("graph.batch.retry", pending=len(pending), attempt=attempt, delay=delay)
+                GRAPH_RETRIES.labels("batch").inc()
+                await asyncio.sleep(delay)
+
+        if pending:
+            log.warning("graph.batch.retries_exhausted", pending=len(pending))
+        return heads
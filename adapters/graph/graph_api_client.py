@@ -1,15 +1,30 @@
 from __future__ import annotations
 
+import time
 import structlog
 import requests
 from requests.adapters import HTTPAdapter, Retry
 from datetime import datetime, timezone
-from typing import Generator, List
+from typing import Dict, Generator, Iterable, Iterator, List, Optional
+from urllib.parse import quote
 
+from adapters.telemetry.prometheus_metrics import (
+    CONVERSATION_LOOKUPS,
+    GRAPH_PAGES,
+    GRAPH_RETRIES,
+    GRAPH_THROTTLED,
+    graph_endpoint,
+    observe_graph_response,
+)
+from adapters.graph.mime_utils import header_block_end, parse_mime_headers_many
+from adapters.throttling.adaptive_rate_limiter import RATE_LIMITER, AdaptiveRateLimiter
 from ports.graph_client import GraphClientPort
 from application.dto.folder_dto import FolderDTO
+from application.dto.mime_headers_dto import MimeHeadersDTO
 from application.dto.email_dto import EmailDTO
-from config.settings import GRAPH_BASE_URL, TOKEN_PROVIDER
+from application.dto.page_dto import MessagePageDTO
+from config.profiling import PROFILER
+from config.settings import ACCOUNT_WORKERS, GRAPH_BASE_URL, MIME_TIMEOUT_SEC, TOKEN_PROVIDER
 
 logger = structlog.get_logger(__name__)
 
@@ -17,15 +32,38 @@ logger = structlog.get_logger(__name__)
 class GraphApiClient(GraphClientPort):
     """
     Adaptador Microsoft Graph API.
-    Todas as requisições passam por sessão com timeout + retries.
+    Todas as requisições passam por sessão com timeout + retries e pelo
+    limitador adaptativo (por caixa postal e por tenant), que trata 429/503.
     Produz DTOs prontos para a camada de aplicação.
     """
 
     _TIMEOUT = (3.05, 60)  # (connect, read)
+    _MESSAGE_FIELDS = (
+        "id", "subject", "sentDateTime", "isRead", "conversationId",
+        "hasAttachments", "from", "toRecipients", "ccRecipients",
+        "importance", "isReadReceiptRequested", "isDeliveryReceiptRequested",
+        "internetMessageId"
+    )
+    _HEAD_FIELDS = (
+        "subject", "from", "conversationId", "sentDateTime", "isRead",
+        "hasAttachments", "toRecipients", "importance", "isReadReceiptRequested",
+        "isDeliveryReceiptRequested", "bodyPreview"
+    )
+    _BATCH_LIMIT = 20          # máximo de requisições por $batch
+    _BATCH_MAX_ATTEMPTS = 4
+    _BATCH_RETRY_STATUS = (429, 500, 502, 503, 504)
+    _THROTTLE_STATUS = (429, 503)
+    _THROTTLE_MAX_RETRIES = 5
+    # Leitura só dos cabeçalhos do MIME: tamanho de cada leitura e teto do bloco
+    _HEADER_CHUNK = 8 * 1024
+    _MAX_HEADER_BYTES = 512 * 1024
+    # Códigos devolvidos pelo Graph quando o deltaLink não é mais aceito
+    _SYNC_STATE_ERRORS = ("syncstatenotfound", "syncstateinvalid", "resyncrequired")
 
-    def __init__(self) -> None:
+    def __init__(self, rate_limiter: Optional[AdaptiveRateLimiter] = None) -> None:
         self.base_url = GRAPH_BASE_URL.rstrip("/")
         self.session = self._build_session()
+        self.rate_limiter = rate_limiter or RATE_LIMITER
 
     # --------------------------------------------------------------------- #
     #   API pública                                                         #
@@ -37,7 +75,7 @@ class GraphApiClient(GraphClientPort):
         url = f"{self.base_url}/users/{account}/mailFolders"
         folders = [
             self._folder_from_api(item)
-            for page in self._paginate(url, log)
+            for page in self._paginate(url, log, account=account)
             for item in page.get("value", [])
         ]
 
@@ -47,45 +85,173 @@ class GraphApiClient(GraphClientPort):
     def fetch_message_detail(self, account: str, message_id: str) -> dict:
         """Retorna o corpo JSON completo (`/messages/{id}`)"""
         url = f"{self.base_url}/users/{account}/messages/{message_id}"
-        return self._get(url)
+        return self._get(url, account=account)
 
     def fetch_message_mime(self, account: str, message_id: str) -> str:
         """
-        Retorna o MIME bruto (`/messages/{id}/$value`).
-        Usa streaming para reduzir uso de memória.
+        Retorna o MIME bruto (`/messages/{id}/$value`), pelo mesmo caminho das
+        demais requisições (limitador adaptativo, Retry-After e reenvio em 429/503).
         """
         url = f"{self.base_url}/users/{account}/messages/{message_id}/$value"
-        with self.session.get(url, headers=self._headers(), timeout=self._TIMEOUT, stream=True) as resp:
+        return self._send_response("GET", url, account).content.decode(errors="replace")
+
+    def fetch_message_headers(self, account: str, message_id: str, timeout: Optional[float] = None) -> str:
+        """
+        Lê o `$value` em streaming só até o fim do bloco de cabeçalhos e fecha
+        a conexão; o corpo e os anexos não são baixados.
+        """
+        url = f"{self.base_url}/users/{account}/messages/{message_id}/$value"
+        timeout = timeout or MIME_TIMEOUT_SEC
+        keys = self.rate_limiter.keys_for("graph", account)
+        self.rate_limiter.acquire(keys)
+        start = time.perf_counter()
+        deadline = start + timeout
+        with self.session.get(
+            url, headers=self._headers(), timeout=(self._TIMEOUT[0], timeout), stream=True
+        ) as resp:
+            observe_graph_response("message_headers", resp.status_code, time.perf_counter() - start)
+            if resp.status_code in self._THROTTLE_STATUS:
+                self.rate_limiter.on_throttle(keys, self._retry_after(resp.headers))
             resp.raise_for_status()
-            return resp.content.decode(errors="replace")
+            self.rate_limiter.on_success(keys)
+            return self._read_header_block(resp.iter_content(self._HEADER_CHUNK), deadline)
+
+    def analyze_message_headers(
+        self, account: str, message_ids: Iterable[str], max_workers: int, timeout: float
+    ) -> Dict[str, MimeHeadersDTO]:
+        return parse_mime_headers_many(self, account, message_ids, max_workers, timeout)
+
+    @classmethod
+    def _read_header_block(cls, chunks: Iterable[bytes], deadline: float) -> str:
+        buf = bytearray()
+        for chunk in chunks:
+            searched = len(buf)
+            buf += chunk
+            end = header_block_end(buf, searched)
+            if end >= 0:
+                return buf[:end].decode(errors="replace")
+            if len(buf) >= cls._MAX_HEADER_BYTES:
+                break
+            if time.perf_counter() > deadline:
+                raise TimeoutError("leitura dos cabeçalhos MIME excedeu o tempo limite")
+        # Mensagem sem corpo (ou cabeçalhos acima do teto): devolve o que foi lido
+        return bytes(buf).decode(errors="replace")
         
     def fetch_messages_in_folder(
-        self, account: str, folder_id: str, page_size: int = 50
+        self,
+        account: str,
+        folder_id: str,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
     ) -> List[EmailDTO]:
-        log = logger.bind(user=account, folder_id=folder_id, page_size=page_size)
+        return [
+            dto
+            for page in self.iter_messages_in_folder(account, folder_id, page_size, since)
+            for dto in page.emails
+        ]
+
+    def iter_messages_in_folder(
+        self,
+        account: str,
+        folder_id: str,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+        start_link: Optional[str] = None,
+    ) -> Iterator[MessagePageDTO]:
+        """
+        Entrega a pasta página a página (mais recentes primeiro), sem acumular.
+        Com `since`, a janela vai no `$filter` e a paginação para na primeira
+        mensagem anterior a ela. Com `start_link`, começa por aquele nextLink
+        (que já carrega filtro, ordem e tamanho de página).
+        """
+        log = logger.bind(user=account, folder_id=folder_id, page_size=page_size, since=since)
         log.info("graph.fetch_messages.start")
 
-        fields = [
-            "id", "subject", "sentDateTime", "isRead", "conversationId",
-            "hasAttachments", "from", "toRecipients", "ccRecipients",
-            "importance", "isReadReceiptRequested", "isDeliveryReceiptRequested",
-            "internetMessageId"
-        ]
-        select_query = f"$select={','.join(fields)}"
+        select_query = f"$select={','.join(self._MESSAGE_FIELDS)}"
+        # O Graph só aceita $orderby junto com $filter se a propriedade ordenada
+        # aparecer no filtro; sentDateTime atende aos dois
+        filter_query = f"{self._window_filter('sentDateTime', since)}&" if since else ""
 
-        url = (
+        url = start_link or (
             f"{self.base_url}/users/{account}/mailFolders/{folder_id}/messages"
-            f"?$orderby=sentDateTime desc&{select_query}&$top={page_size}"
+            f"?{filter_query}$orderby=sentDateTime desc&{select_query}&$top={page_size}"
         )
 
-        emails = [
-            self._email_from_api(item)
-            for page in self._paginate(url, log)
-            for item in page.get("value", [])
-        ]
+        total = size = 0
+        for page, page_bytes in self._iter_pages(url, log, account=account):
+            with PROFILER.span("graph.convert", items=len(page.get("value", []))):
+                emails = [self._email_from_api(item) for item in page.get("value", [])]
+            emails, window_reached = self._clip_to_window(emails, since)
+            total += len(emails)
+            size += page_bytes
+            yield MessagePageDTO(
+                emails=emails,
+                next_link=page.get("@odata.nextLink"),
+                size_bytes=page_bytes,
+                window_reached=window_reached,
+            )
+            if window_reached:
+                break
+
+        log.info("graph.fetch_messages.success", emails=total, bytes=size)
+
+    # ------------------------------------------------------------------ #
+    #  Sincronização incremental (delta query)                           #
+    # ------------------------------------------------------------------ #
+    def iter_message_delta(
+        self,
+        account: str,
+        folder_id: str,
+        delta_link: Optional[str] = None,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+    ) -> Iterator[MessagePageDTO]:
+        """
+        Percorre `/messages/delta` a partir do `delta_link` salvo.
+        Se o token expirou, recomeça com uma sincronização completa.
+        `since` limita a sincronização completa (o filtro fica embutido no
+        deltaLink gerado); o delta não tem ordem, então não há parada antecipada.
+        """
+        log = logger.bind(user=account, folder_id=folder_id, page_size=page_size)
+        full_resync = delta_link is None
+        log.info("graph.message_delta.start", full_resync=full_resync)
 
-        log.info("graph.fetch_messages.success", emails=len(emails))
-        return emails
+        initial_url = (
+            f"{self.base_url}/users/{account}/mailFolders/{folder_id}/messages/delta"
+            f"?$select={','.join(self._MESSAGE_FIELDS)}"
+        )
+        if since:
+            # O delta de mensagens só aceita filtro por receivedDateTime
+            initial_url += f"&{self._window_filter('receivedDateTime', since)}"
+        # O delta não aceita $top; o tamanho da página vai no cabeçalho Prefer
+        headers = {"Prefer": f"odata.maxpagesize={page_size}"}
+
+        pages = self._paginate(delta_link or initial_url, log, headers=headers, account=account)
+        try:
+            first = next(pages, None)
+        except requests.HTTPError as exc:
+            if full_resync or not self._is_sync_state_expired(exc):
+                raise
+            log.warning("graph.message_delta.token_expired")
+            full_resync = True
+            pages = self._paginate(initial_url, log, headers=headers, account=account)
+            first = next(pages, None)
+
+        changed = removed = 0
+        current = first
+        while current is not None:
+            with PROFILER.span("graph.convert", items=len(current.get("value", []))):
+                page = self._delta_page_from_api(current, full_resync)
+            page.emails, _ = self._clip_to_window(page.emails, since)
+            changed += len(page.emails)
+            removed += len(page.removed_ids)
+            yield page
+            current = next(pages, None)
+
+        log.info(
+            "graph.message_delta.success",
+            changed=changed, removed=removed, full_resync=full_resync,
+        )
     
     # ------------------------------------------------------------------ #
     #  Conversa completa (head)                                          #
@@ -95,16 +261,37 @@ class GraphApiClient(GraphClientPort):
         Busca até `top` mensagens de qualquer pasta que pertençam à conversa.
         Útil para detectar bounce ou reply sem varrer a mailbox inteira.
         """
-        url = (
-            f"{self.base_url}/users/{account}/messages?"
-            f"$filter=conversationId eq '{conversation_id}'&$top={top}"
-            f"&$select=subject,from,conversationId,sentDateTime,isRead,hasAttachments,toRecipients,importance,isReadReceiptRequested,isDeliveryReceiptRequested,bodyPreview" # ADICIONADO bodyPreview
-        )
-        page = self._get(url)
+        url = f"{self.base_url}{self._conversation_head_path(account, conversation_id, top)}"
+        CONVERSATION_LOOKUPS.inc()
+        page = self._get(url, account=account)
         return [
             self._email_from_api(item)    
             for item in page.get("value", [])
         ]
+
+    def fetch_conversation_heads(
+        self, account: str, conversation_ids: Iterable[str], top: int = 10
+    ) -> Dict[str, List[EmailDTO]]:
+        """
+        Mesmo resultado de `fetch_conversation_head`, mas agrupando até
+        `_BATCH_LIMIT` conversas por requisição JSON `$batch`.
+        Apenas as sub-respostas com falha transitória são reenviadas.
+        """
+        log = logger.bind(user=account)
+        conv_ids = list(dict.fromkeys(conversation_ids))
+        log.info("graph.conversation_heads.start", conversations=len(conv_ids))
+        CONVERSATION_LOOKUPS.inc(len(conv_ids))
+
+        heads: Dict[str, List[EmailDTO]] = {}
+        for start in range(0, len(conv_ids), self._BATCH_LIMIT):
+            chunk = conv_ids[start : start + self._BATCH_LIMIT]
+            heads.update(self._batch_conversation_heads(account, chunk, top, log))
+
+        log.info(
+            "graph.conversation_heads.success",
+            conversations=len(conv_ids), resolved=len(heads),
+        )
+        return heads
         
     # --------------------------------------------------------------------- #
     #   Helpers privados                                                    #
@@ -115,30 +302,156 @@ class GraphApiClient(GraphClientPort):
         retry_cfg = Retry(
             total=3,
             backoff_factor=0.5,
-            status_forcelist=(401, 403, 429, 500, 502, 503, 504),
+            # 429/503 ficam com o limitador, que respeita o Retry-After
+            status_forcelist=(401, 403, 500, 502, 504),
             allowed_methods=("GET",),
         )
-        session.mount("https://", HTTPAdapter(max_retries=retry_cfg))
+        # Uma conexão por conta em paralelo, para as threads não disputarem o pool
+        adapter = HTTPAdapter(max_retries=retry_cfg, pool_maxsize=max(10, ACCOUNT_WORKERS))
+        session.mount("https://", adapter)
         return session
 
-    def _headers(self) -> dict[str, str]:
+    def _headers(self, extra: Optional[dict[str, str]] = None) -> dict[str, str]:
         token = TOKEN_PROVIDER.get_token()
-        return {"Authorization": f"Bearer {token}"}
+        return {"Authorization": f"Bearer {token}", **(extra or {})}
+
+    def _get(
+        self, url: str, headers: Optional[dict[str, str]] = None, account: Optional[str] = None
+    ) -> dict:
+        """GET com timeout, retries, limitador e logging de erro."""
+        return self._send("GET", url, account, headers=headers)
+
+    def _post(
+        self, url: str, payload: dict, account: Optional[str] = None, tenant_cost: Optional[float] = None
+    ) -> dict:
+        """POST JSON com limitador e logging de erro (sem retry de transporte)."""
+        return self._send("POST", url, account, json=payload, tenant_cost=tenant_cost)
 
-    def _get(self, url: str) -> dict:
-        """GET com timeout, retries e logging de erro."""
+    def _send(
+        self,
+        method: str,
+        url: str,
+        account: Optional[str],
+        headers: Optional[dict[str, str]] = None,
+        json: Optional[dict] = None,
+        tenant_cost: Optional[float] = None,
+    ) -> dict:
+        return self._send_response(
+            method, url, account, headers=headers, json=json, tenant_cost=tenant_cost
+        ).json()
+
+    def _send_response(
+        self,
+        method: str,
+        url: str,
+        account: Optional[str],
+        headers: Optional[dict[str, str]] = None,
+        json: Optional[dict] = None,
+        tenant_cost: Optional[float] = None,
+    ) -> requests.Response:
+        keys = self.rate_limiter.keys_for("graph", account)
+        endpoint = graph_endpoint(url)
         try:
-            resp = self.session.get(url, headers=self._headers(), timeout=self._TIMEOUT)
+            for attempt in range(self._THROTTLE_MAX_RETRIES):
+                if attempt:
+                    GRAPH_RETRIES.labels(endpoint).inc()
+                self.rate_limiter.acquire(keys, tenant_cost=tenant_cost)
+                start = time.perf_counter()
+                resp = self.session.request(
+                    method, url, headers=self._headers(headers), json=json, timeout=self._TIMEOUT
+                )
+                observe_graph_response(endpoint, resp.status_code, time.perf_counter() - start)
+                if resp.status_code not in self._THROTTLE_STATUS:
+                    break
+                self.rate_limiter.on_throttle(keys, self._retry_after(resp.headers))
+            else:
+                logger.warning("graph.request.throttle_retries_exhausted", url=url)
             resp.raise_for_status()
-            return resp.json()
+            self.rate_limiter.on_success(keys)
+            return resp
         except requests.RequestException:
             logger.exception("graph.request.error", url=url)
             raise
 
+    def _batch_conversation_heads(
+        self, account: str, conv_ids: List[str], top: int, log
+    ) -> Dict[str, List[EmailDTO]]:
+        pending = {str(i): conv_id for i, conv_id in enumerate(conv_ids)}
+        heads: Dict[str, List[EmailDTO]] = {}
+
+        for attempt in range(1, self._BATCH_MAX_ATTEMPTS + 1):
+            payload = {
+                "requests": [
+                    {
+                        "id": req_id,
+                        "method": "GET",
+                        "url": self._conversation_head_path(account, conv_id, top),
+                    }
+                    for req_id, conv_id in pending.items()
+                ]
+            }
+            # Um token da caixa postal por requisição HTTP; o tenant paga cada sub-requisição
+            data = self._post(
+                f"{self.base_url}/$batch", payload, account=account, tenant_cost=len(pending)
+            )
+
+            retry_after, throttled = 0.0, False
+            for resp in data.get("responses", []):
+                conv_id = pending.get(resp.get("id"))
+                if conv_id is None:
+                    continue
+                status = resp.get("status", 0)
+                if status == 200:
+                    heads[conv_id] = [
+                        self._email_from_api(item)
+                        for item in (resp.get("body") or {}).get("value", [])
+                    ]
+                    del pending[resp["id"]]
+                elif status in self._BATCH_RETRY_STATUS:
+                    if status in self._THROTTLE_STATUS:
+                        GRAPH_THROTTLED.labels("batch").inc()
+                    throttled = throttled or status in self._THROTTLE_STATUS
+                    retry_after = max(retry_after, self._retry_after(resp.get("headers") or {}))
+                else:
+                    log.warning("graph.batch.item_failed", conv_id=conv_id, status=status)
+                    del pending[resp["id"]]
+
+            if throttled:
+                # A espera do Retry-After fica a cargo do limitador no próximo POST
+                self.rate_limiter.on_throttle(
+                    self.rate_limiter.keys_for("graph", account), retry_after or None
+                )
+            if not pending:
+                break
+            if attempt < self._BATCH_MAX_ATTEMPTS:
+                delay = 0.0 if throttled else retry_after or 0.5 * 2 ** (attempt - 1)
+                log.info("graph.batch.retry", pending=len(pending), attempt=attempt, delay=delay)
+                GRAPH_RETRIES.labels("batch").inc()
+                time.sleep(delay)
+
+        if pending:
+            log.warning("graph.batch.retries_exhausted", pending=len(pending))
+        return heads
+
     def _paginate(
-        self, first_url: str, log
+        self,
+        first_url: str,
+        log,
+        headers: Optional[dict[str, str]] = None,
+        account: Optional[str] = None,
     ) -> Generator[dict, None, None]:
         """Itera sobre páginas Graph API, evitando loops de nextLink."""
+        for data, _ in self._iter_pages(first_url, log, headers, account):
+            yield data
+
+    def _iter_pages(
+        self,
+        first_url: str,
+        log,
+        headers: Optional[dict[str, str]] = None,
+        account: Optional[str] = None,
+    ) -> Generator[tuple[dict, int], None, None]:
+        """Como `_paginate`, mas entrega também o tamanho em bytes de cada página."""
         url = first_url
         page = 0
         seen: set[str] = set()
@@ -151,10 +464,63 @@ class GraphApiClient(GraphClientPort):
 
             page += 1
             log.debug("graph.pagination.page", num=page, url=url)
-            data = self._get(url)
-            yield data
+            endpoint = graph_endpoint(url)
+            with PROFILER.span("graph.page", endpoint=endpoint):
+                resp = self._send_response("GET", url, account, headers=headers)
+                data = resp.json()
+            GRAPH_PAGES.labels(endpoint).inc()
+            yield data, len(resp.content)
             url = data.get("@odata.nextLink")
 
+    @classmethod
+    def _conversation_head_path(cls, account: str, conversation_id: str, top: int) -> str:
+        """Caminho relativo (sem base_url), reutilizado pelo GET simples e pelo $batch."""
+        odata_id = conversation_id.replace("'", "''")
+        conv_filter = quote(f"conversationId eq '{odata_id}'", safe="'")
+        return (
+            f"/users/{account}/messages"
+            f"?$filter={conv_filter}&$top={top}"
+            f"&$select={','.join(cls._HEAD_FIELDS)}"
+        )
+
+    @staticmethod
+    def _window_filter(field: str, since: datetime) -> str:
+        """`$filter` de janela (`field ge since`) em UTC, no formato aceito pelo Graph."""
+        return f"$filter={field} ge {since.astimezone(timezone.utc):%Y-%m-%dT%H:%M:%SZ}"
+
+    @staticmethod
+    def _clip_to_window(
+        emails: List[EmailDTO], since: Optional[datetime]
+    ) -> tuple[List[EmailDTO], bool]:
+        """Descarta o que ficou antes de `since`; indica se a janela foi ultrapassada."""
+        if since is None:
+            return emails, False
+        kept = [e for e in emails if e.sent_datetime >= since]
+        return kept, len(kept) < len(emails)
+
+    @staticmethod
+    def _retry_after(headers: dict) -> float:
+        value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+        try:
+            return float(value) if value is not None else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+
+    @classmethod
+    def _is_sync_state_expired(cls, exc: requests.HTTPError) -> bool:
+        resp = exc.response
+        if resp is None:
+            return False
+        if resp.status_code == 410:
+            return True
+        if resp.status_code != 400:
+            return False
+        try:
+            code = resp.json().get("error", {}).get("code", "")
+        except ValueError:
+            return False
+        return code.lower() in cls._SYNC_STATE_ERRORS
+
     # -------- converters -------------------------------------------------- #
     @staticmethod
     def _folder_from_api(item: dict) -> FolderDTO:
@@ -165,6 +531,23 @@ class GraphApiClient(GraphClientPort):
             total_count=item["totalItemCount"],
         )
 
+    @classmethod
+    def _delta_page_from_api(cls, data: dict, full_resync: bool) -> MessagePageDTO:
+        emails: List[EmailDTO] = []
+        removed: List[str] = []
+        for item in data.get("value", []):
+            if "@removed" in item:
+                removed.append(item["id"])
+            elif item.get("sentDateTime"):
+                emails.append(cls._email_from_api(item))
+        return MessagePageDTO(
+            emails=emails,
+            removed_ids=removed,
+            next_link=data.get("@odata.nextLink"),
+            delta_link=data.get("@odata.deltaLink"),
+            full_resync=full_resync,
+        )
+
     @staticmethod
     def _email_from_api(item: dict) -> EmailDTO:
         """
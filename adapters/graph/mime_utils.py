@@ -1,20 +1,47 @@
 from __future__ import annotations
 import re
-from email import message_from_string, policy
+from email.parser import HeaderParser
+from email.policy import compat32
 from email.utils import parsedate_to_datetime
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
+
+from application.dto.mime_headers_dto import MimeHeadersDTO
+from config.settings import MAX_MIME_WORKERS, MIME_TIMEOUT_SEC
+from ports.graph_client import GraphClientPort
 
 _RX_INT   = re.compile(r'-?\d+')
-_IP_RE    = re.compile(r'\[?([0-9a-f:.]+)\]?')
+_IP_RE    = re.compile(r'\[([0-9a-f:.]+)\]', re.I)
 _DKIM_RE  = re.compile(r'dkim=(pass|fail)',  re.I)
 _SPF_RE   = re.compile(r'spf=(pass|fail)',   re.I)
 _DMARC_RE = re.compile(r'dmarc=(pass|fail)', re.I)
+_FOLD_RE  = re.compile(r'\r?\n[ \t]')
+_HEADER_END_RE = re.compile(rb'\r?\n\r?\n')
+_TEXT_HEADER_END_RE = re.compile(r'\r?\n\r?\n')
+
+# compat32 só separa nome/valor (sem a árvore de objetos do policy.default)
+_PARSER = HeaderParser(policy=compat32)
+
+
+def header_block_end(data: bytes, start: int = 0) -> int:
+    """
+    Posição logo após a linha em branco que encerra os cabeçalhos, ou -1.
+    `start` permite buscar só no trecho recém-chegado de um stream.
+    """
+    m = _HEADER_END_RE.search(data, max(0, start - 3))
+    return m.end() if m else -1
+
+
+def _unfold(value: str) -> str:
+    return _FOLD_RE.sub(' ', value)
+
 
 def _header(msg, name: str) -> str:
-    return msg.get(name, '')
+    return _unfold(msg.get(name, ''))
 
 def parse_mime_headers(raw: str) -> Dict[str, Optional[object]]:
-    msg = message_from_string(raw, policy=policy.default)
+    # Só o bloco de cabeçalhos interessa: o corpo (e anexos) nem chega ao parser
+    head = _TEXT_HEADER_END_RE.split(raw, maxsplit=1)[0]
+    msg = _PARSER.parsestr(head, headersonly=True)
 
     # --- SCL ---
     scl_hdr = _header(msg, 'X-MS-Exchange-Organization-SCL').strip()
@@ -36,7 +63,7 @@ def parse_mime_headers(raw: str) -> Dict[str, Optional[object]]:
     _dmarc_pass = _pass(_DMARC_RE)
 
     # --- IPs ---
-    recvs = msg.get_all('Received', [])
+    recvs = [_unfold(r) for r in msg.get_all('Received', [])]
     from_ip = to_ip = None
     if recvs:
         ips_last = _IP_RE.findall(recvs[-1])
@@ -61,4 +88,25 @@ def parse_mime_headers(raw: str) -> Dict[str, Optional[object]]:
     return {
         "from_ip": from_ip,
         "to_ip": to_ip,
+        "scl": _scl,
+        "dkim_pass": _dkim_pass,
+        "spf_pass": _spf_pass,
+        "dmarc_pass": _dmarc_pass,
+        "delivery_latency_sec": _latency.total_seconds() if _latency is not None else None,
     }
+
+
+def parse_mime_headers_many(
+    graph: GraphClientPort,
+    account: str,
+    message_ids: Iterable[str],
+    max_workers: int = MAX_MIME_WORKERS,
+    timeout: float = MIME_TIMEOUT_SEC,
+) -> Dict[str, MimeHeadersDTO]:
+    """
+    Busca só os cabeçalhos de várias mensagens (até `max_workers` em paralelo,
+    cada uma limitada a `timeout` segundos) e os analisa. Mensagens que
+    falharam ou estouraram o tempo ficam fora do resultado.
+    """
+    heads = graph.fetch_message_headers_many(account, message_ids, max_workers, timeout)
+    return {message_id: MimeHeadersDTO(**parse_mime_headers(head)) for message_id, head in heads.items()}
@@ -0,0 +1,212 @@
+"""
+Particionamento mensal da tabela `emails` (RANGE por `sent_datetime`).
+
+Cada mês vive em `emails_pAAAAMM` ([dia 1, dia 1 do mês seguinte)); o
+histórico anterior ao primeiro mês gerenciado fica em `emails_archive`
+([MINVALUE, primeiro mês)). Não há partição DEFAULT: com ela, filtros abertos
+como `sent_datetime >= CURRENT_DATE - 30` nunca descartariam a default.
+"""
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+import structlog
+from sqlalchemy import Table, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = structlog.get_logger(__name__)
+
+_MONTH_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+# DDL de partição pede ACCESS EXCLUSIVE no pai: não fica na fila atrás de consultas longas
+LOCK_TIMEOUT = "10s"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class EmailPartitionManager:
+    """Cria, desanexa e migra as partições mensais de uma tabela particionada por mês."""
+
+    def __init__(self, engine: Engine, table: Table, column: str = "sent_datetime") -> None:
+        self.engine = engine
+        self.table = table
+        self.column = column
+        self.archive_partition = f"{table.name}_archive"
+
+    # ------------------------------------------------------------------ #
+    #  Consulta                                                          #
+    # ------------------------------------------------------------------ #
+    def is_partitioned(self, conn: Connection) -> bool:
+        return bool(
+            conn.execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+                    "JOIN pg_class c ON c.oid = p.partrelid "
+                    "WHERE c.relname = :name AND c.relnamespace = to_regnamespace(current_schema()))"
+                ),
+                {"name": self.table.name},
+            ).scalar()
+        )
+
+    def partitions(self, conn: Connection) -> Dict[str, Optional[date]]:
+        """Partições anexadas: nome -> mês (None para o arquivo ou nomes fora do padrão)."""
+        rows = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:name AS regclass)"
+            ),
+            {"name": self.table.name},
+        ).scalars()
+        result: Dict[str, Optional[date]] = {}
+        for name in rows:
+            m = _MONTH_SUFFIX.search(name)
+            result[name] = date(int(m.group(1)), int(m.group(2)), 1) if m else None
+        return result
+
+    def partition_name(self, month: date) -> str:
+        return f"{self.table.name}_p{month:%Y%m}"
+
+    # ------------------------------------------------------------------ #
+    #  Manutenção                                                        #
+    # ------------------------------------------------------------------ #
+    def maintain(
+        self,
+        months_back: int,
+        months_ahead: int,
+        retention_months: int = 0,
+        today: Optional[date] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Garante as partições de `months_back` meses atrás até `months_ahead`
+        à frente e, com `retention_months`, desanexa as mais antigas que isso.
+        Tabela ainda não particionada: nada a fazer (ver `migrate`).
+        """
+        current = month_start(today or datetime.now(timezone.utc).date())
+        if retention_months:
+            months_back = min(months_back, retention_months - 1)
+        with self.engine.begin() as conn:
+            if not self.is_partitioned(conn):
+                logger.warning("partitions.maintain.skip", table=self.table.name, reason="not_partitioned")
+                return {"created": [], "detached": []}
+            conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            created = self.ensure(
+                conn, add_months(current, -months_back), add_months(current, months_ahead)
+            )
+            detached = (
+                self.detach_before(conn, add_months(current, -(retention_months - 1)))
+                if retention_months else []
+            )
+        if created or detached:
+            logger.info("partitions.maintain.success", table=self.table.name, created=created, detached=detached)
+        return {"created": created, "detached": detached}
+
+    def ensure(self, conn: Connection, first: date, last: date) -> List[str]:
+        """
+        Cria as partições mensais que faltam até `last`. Em tabela vazia de
+        partições, `first` vira o limite do arquivo; depois, meses anteriores
+        ao mais antigo existente já pertencem ao arquivo (ou foram desanexados).
+        """
+        existing = self.partitions(conn)
+        months = sorted(m for m in existing.values() if m is not None)
+        created: List[str] = []
+        if not existing:
+            month = month_start(first)
+            conn.execute(
+                text(
+                    f"CREATE TABLE {self.archive_partition} PARTITION OF {self.table.name} "
+                    f"FOR VALUES FROM (MINVALUE) TO ('{month.isoformat()}')"
+                )
+            )
+            created.append(self.archive_partition)
+        else:
+            month = max(month_start(first), months[0]) if months else month_start(first)
+
+        attached = set(months)
+        while month <= last:
+            if month not in attached:
+                conn.execute(
+                    text(
+                        f"CREATE TABLE {self.partition_name(month)} PARTITION OF {self.table.name} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                    )
+                )
+                created.append(self.partition_name(month))
+            month = add_months(month, 1)
+        return created
+
+    def lower_bound(self, conn: Connection) -> Optional[date]:
+        """Menor `sent_datetime` aceito (None = sem limite, o arquivo segue anexado)."""
+        existing = self.partitions(conn)
+        if self.archive_partition in existing:
+            return None
+        months = [m for m in existing.values() if m is not None]
+        return min(months) if months else None
+
+    def detach_before(self, conn: Connection, cutoff: date) -> List[str]:
+        """
+        Desanexa as partições que terminam até `cutoff` (o arquivo inclusive).
+        Elas continuam no banco como tabelas comuns, prontas para arquivar ou apagar.
+        """
+        existing = self.partitions(conn)
+        months = sorted(m for m in existing.values() if m is not None)
+        detached: List[str] = []
+        if self.archive_partition in existing and (not months or months[0] <= cutoff):
+            conn.execute(text(f"ALTER TABLE {self.table.name} DETACH PARTITION {self.archive_partition}"))
+            detached.append(self.archive_partition)
+        for name, month in sorted(existing.items()):
+            if month is not None and add_months(month, 1) <= cutoff:
+                conn.execute(text(f"ALTER TABLE {self.table.name} DETACH PARTITION {name}"))
+                detached.append(name)
+        return detached
+
+    # ------------------------------------------------------------------ #
+    #  Migração da tabela comum                                          #
+    # ------------------------------------------------------------------ #
+    def migrate(self, months_back: int, months_ahead: int, today: Optional[date] = None) -> bool:
+        """
+        Converte uma tabela comum existente em particionada, numa única transação:
+        renomeia a atual (e seus índices) com o sufixo `_unpartitioned`, cria a
+        particionada (meses desde o e-mail mais antigo, limitado a `months_back`;
+        o resto no arquivo) e copia as linhas.
+        A tabela antiga fica no banco para conferência; linhas sem a coluna de
+        partição não são copiadas. Retorna False se já estava particionada.
+        """
+        legacy = f"{self.table.name}_unpartitioned"
+        current = month_start(today or datetime.now(timezone.utc).date())
+        with self.engine.begin() as conn:
+            if self.is_partitioned(conn):
+                return False
+            conn.execute(text(f"ALTER TABLE {self.table.name} RENAME TO {legacy}"))
+            for index in conn.execute(
+                text("SELECT indexname FROM pg_indexes WHERE tablename = :t AND schemaname = current_schema()"),
+                {"t": legacy},
+            ).scalars().all():
+                conn.execute(text(f"ALTER INDEX {index} RENAME TO {index[:49]}_unpartitioned"))
+
+            self.table.create(conn)
+            oldest = conn.execute(text(f"SELECT min({self.column}) FROM {legacy}")).scalar()
+            first = add_months(current, -months_back)
+            if oldest is not None:
+                first = max(first, month_start(oldest.date()))
+            self.ensure(conn, first, add_months(current, months_ahead))
+
+            columns = ", ".join(c.name for c in self.table.columns)
+            copied = conn.execute(
+                text(
+                    f"INSERT INTO {self.table.name} ({columns}) "
+                    f"SELECT {columns} FROM {legacy} WHERE {self.column} IS NOT NULL"
+                )
+            ).rowcount
+            skipped = conn.execute(
+                text(f"SELECT count(*) FROM {legacy} WHERE {self.column} IS NULL")
+            ).scalar()
+        logger.info("partitions.migrate.success", table=self.table.name, copied=copied, skipped=skipped, legacy=legacy)
+        return True
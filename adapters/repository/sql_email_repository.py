@@ -1,22 +1,77 @@
+import io
 import os
+import threading
+import time
 import uuid
-from typing import List, Dict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Dict, Optional, Set, Tuple
 
 import structlog
 from sqlalchemy import (
-    Column, Float, Integer, String, DateTime, Boolean, Date,
-    create_engine, select, Index, UniqueConstraint, func, ForeignKey,
+    Column, Float, Integer, String, Text, DateTime, Boolean, Date,
+    BigInteger, create_engine, event, select, text, Index, UniqueConstraint, func, ForeignKey,
+    literal_column, tuple_,
 )
 from sqlalchemy.dialects.postgresql import insert as pg_insert, UUID, ARRAY
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
-from domain.model.email import Email
+from config.profiling import PROFILER
+from config.settings import (
+    DB_BULK_MODE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    EMAILS_PARTITION_MONTHS_AHEAD,
+    EMAILS_PARTITION_MONTHS_BACK,
+    EMAILS_RETENTION_MONTHS,
+    ROLLUP_TIMEZONE,
+)
+from adapters.repository.email_partitions import EmailPartitionManager
+from adapters.telemetry.prometheus_metrics import UPSERT_ROWS, UPSERT_SECONDS
+from domain.model.conversation_state import ConversationState
+from domain.model.delivery_signals import DeliverySignals
+from domain.model.email_batch import EmailBatch, Verdict
 from domain.model.metrics import EmailMetrics
-from ports.persistence import EmailRepositoryPort, MetricsRepositoryPort
+from domain.model.sync_checkpoint import SyncCheckpoint
+from ports.persistence import (
+    AccountLeaseRepositoryPort,
+    CheckpointRepositoryPort,
+    ConversationStateRepositoryPort,
+    DeliverySignalRepositoryPort,
+    EmailRepositoryPort,
+    MetricsRepositoryPort,
+    RollupRepositoryPort,
+    SyncStateRepositoryPort,
+    UnitOfWorkPort,
+    UnitOfWorkStats,
+    UpsertStats,
+)
 
 logger = structlog.get_logger(__name__)
 Base = declarative_base()
 CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 300))
+STATE_CHUNK_SIZE = 5000  # ids por IN (...) / linhas por INSERT em conversation_states
+STAGE_TABLE = "_emails_stage"
+# Escapes do formato texto do COPY (o \N fica reservado para NULL)
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+# Chave do UPSERT em `emails`; na tabela particionada inclui a chave de partição
+EMAIL_KEY = ("account_id", "message_id", "conversation_id")
+PARTITIONED_EMAIL_KEY = (*EMAIL_KEY, "sent_datetime")
+ROLLUP_KEY = ("account_id", "day", "temperature_label", "is_forward")
+
+
+def rollup_day(column: str) -> str:
+    """
+    Dia (no fuso ROLLUP_TIMEZONE) de um `timestamp` gravado no fuso da sessão.
+    Mesma expressão no SQL dos rollups e no RETURNING dos UPSERTs.
+    """
+    tz = ROLLUP_TIMEZONE.replace("'", "''")
+    return f"(({column} AT TIME ZONE current_setting('TimeZone')) AT TIME ZONE '{tz}')::date"
 
 class AccountORM(Base):
     __tablename__ = "accounts"
@@ -24,6 +79,7 @@ class AccountORM(Base):
     email_address = Column(String, unique=True, nullable=False)
 
 class EmailORM(Base):
+    """Particionada por mês de `sent_datetime` (ver `email_partitions`)."""
     __tablename__ = "emails"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     recipient_addresses = Column(ARRAY(String), nullable=False)
@@ -31,7 +87,7 @@ class EmailORM(Base):
     message_id = Column(String, nullable=False)
     conversation_id = Column(String, nullable=False)
     subject = Column(String)
-    sent_datetime = Column(DateTime)
+    sent_datetime = Column(DateTime, primary_key=True)  # chave de partição: entra na PK e na UNIQUE
     is_read = Column(Boolean)
     has_attachments = Column(Boolean)
     is_bounced = Column(Boolean, nullable=False, default=False)
@@ -45,7 +101,10 @@ class EmailORM(Base):
     engagement_score = Column(Integer, nullable=False, default=0)
 
     __table_args__ = (
-        UniqueConstraint("account_id", "message_id", "conversation_id", name="uix_account_msg_conv"),
+        UniqueConstraint(*PARTITIONED_EMAIL_KEY, name="uix_account_msg_conv"),
+        Index("ix_emails_account_sent", "account_id", "sent_datetime"),
+        Index("ix_emails_account_conversation", "account_id", "conversation_id", "sent_datetime"),
+        {"postgresql_partition_by": "RANGE (sent_datetime)"},
     )
 
 class MetricsORM(Base):
@@ -79,66 +138,925 @@ class MetricsORM(Base):
         Index("ix_metrics_acc_run_brin", "account_id", "run_at", postgresql_using="brin"),
     )
 
-class PgEmailRepository(EmailRepositoryPort, MetricsRepositoryPort):
-    def __init__(self, db_url: str):
-        self.engine = create_engine(db_url)
+class EmailDailyRollupORM(Base):
+    """
+    Agregado diário de `emails` por conta, temperatura e encaminhamento
+    (assunto ENC:/FW:), mantido pelo `save_all` na mesma transação.
+    """
+    __tablename__ = "email_daily_rollups"
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    temperature_label = Column(String, primary_key=True)
+    is_forward = Column(Boolean, primary_key=True)
+
+    sent = Column(Integer, nullable=False)
+    delivered = Column(Integer, nullable=False)
+    replied = Column(Integer, nullable=False)
+    bounced = Column(Integer, nullable=False)
+    engagement_sum = Column(BigInteger, nullable=False)
+    latency_sum = Column(Float, nullable=False)      # soma de reply_latency_sec
+    latency_count = Column(Integer, nullable=False)  # e-mails com reply_latency_sec
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_email_daily_rollups_day", "day"),
+    )
+
+class SyncStateORM(Base):
+    __tablename__ = "sync_states"
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    folder_id = Column(String, primary_key=True)
+    delta_link = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class SyncCheckpointORM(Base):
+    """Sincronização completa em andamento (RESUMABLE_RUNS); a linha some quando ela termina."""
+    __tablename__ = "sync_checkpoints"
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    folder_id = Column(String, primary_key=True)
+    next_link = Column(Text, nullable=True)
+    boundary = Column(DateTime(timezone=True), nullable=True)
+    window_start = Column(DateTime(timezone=True), nullable=True)
+    chunks = Column(Integer, nullable=False, default=0)
+    emails = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ConversationStateORM(Base):
+    __tablename__ = "conversation_states"
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    conversation_id = Column(String, primary_key=True)
+    is_bounced = Column(Boolean, nullable=False, default=False)
+    is_replied = Column(Boolean, nullable=False, default=False)
+    first_reply_at = Column(DateTime(timezone=True), nullable=True)
+    last_checked_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class DeliverySignalORM(Base):
+    """Sinais de entrega dos cabeçalhos MIME; uma linha por internet_message_id, gravada uma vez."""
+    __tablename__ = "email_delivery_signals"
+    internet_message_id = Column(String, primary_key=True)
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False, index=True)
+    scl = Column(Integer, nullable=True)
+    dkim_pass = Column(Boolean, nullable=True)
+    spf_pass = Column(Boolean, nullable=True)
+    dmarc_pass = Column(Boolean, nullable=True)
+    from_ip = Column(String, nullable=True)
+    to_ip = Column(String, nullable=True)
+    delivery_latency_sec = Column(Float, nullable=True)
+    analyzed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class AccountLeaseORM(Base):
+    """Dono atual de cada conta no modo WORK_DISTRIBUTION=leases."""
+    __tablename__ = "account_leases"
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    owner = Column(String, nullable=True)
+    lease_until = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class WorkerNodeORM(Base):
+    """Instâncias vivas (heartbeat), base da divisão justa das contas."""
+    __tablename__ = "worker_nodes"
+    node_id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+@dataclass
+class _UnitOfWork:
+    repo: "PgEmailRepository"
+    session: Session
+    stats: UnitOfWorkStats = field(default_factory=UnitOfWorkStats)
+    new_accounts: Dict[str, uuid.UUID] = field(default_factory=dict)  # entram no cache após o commit
+
+# Unidade de trabalho ativa na thread/contexto atual
+_CURRENT_UOW: ContextVar[Optional[_UnitOfWork]] = ContextVar("pg_unit_of_work", default=None)
+
+class PgEmailRepository(
+    EmailRepositoryPort,
+    MetricsRepositoryPort,
+    RollupRepositoryPort,
+    SyncStateRepositoryPort,
+    CheckpointRepositoryPort,
+    ConversationStateRepositoryPort,
+    DeliverySignalRepositoryPort,
+    AccountLeaseRepositoryPort,
+    UnitOfWorkPort,
+):
+    """
+    Repositório PostgreSQL. Engine/pool são compartilhados entre as threads de
+    conta; cada operação roda na unidade de trabalho ativa (`unit_of_work`) ou,
+    fora dela, em uma transação própria. Os ids de conta ficam em cache.
+    """
+
+    def __init__(self, db_url: str, bulk_mode: str = DB_BULK_MODE):
+        self.bulk_mode = bulk_mode
+        self.engine = create_engine(
+            db_url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
         self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self._account_ids: Dict[str, uuid.UUID] = {}
+        self._accounts_lock = threading.Lock()
+        self._round_trips = 0
+        self._round_trips_lock = threading.Lock()
+        event.listen(self.engine, "before_cursor_execute", self._on_round_trip)
+        event.listen(self.engine, "commit", self._on_round_trip)
+        event.listen(self.engine, "rollback", self._on_rollback)
         Base.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            # `create_all` não cria índices novos em tabelas já existentes
+            conn.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS ix_emails_account_conversation "
+                    f"ON {EmailORM.__tablename__} (account_id, conversation_id, sent_datetime)"
+                )
+            )
+
+        self.partitions = EmailPartitionManager(self.engine, EmailORM.__table__)
+        with self.engine.connect() as conn:
+            partitioned = self.partitions.is_partitioned(conn)
+        # Bancos anteriores ao particionamento seguem na tabela comum até `migrate_partitions`
+        self._email_key = PARTITIONED_EMAIL_KEY if partitioned else EMAIL_KEY
+        self._retained_from: Optional[datetime] = None
+        if partitioned:
+            self.maintain_partitions()
+        else:
+            logger.warning("email_repo.emails_not_partitioned", hint="python -m application.main --maintain-partitions")
+
+    # ------------------------------------------------------------------ #
+    #  Transações e contas                                               #
+    # ------------------------------------------------------------------ #
+    @property
+    def round_trips(self) -> int:
+        """Total de idas ao banco (statements + COMMIT/ROLLBACK) desde a criação."""
+        return self._round_trips
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[UnitOfWorkStats]:
+        current = _CURRENT_UOW.get()
+        if current is not None and current.repo is self:
+            # Aninhada: participa da unidade externa
+            yield current.stats
+            return
+
+        uow = _UnitOfWork(self, self.Session())
+        token = _CURRENT_UOW.set(uow)
+        try:
+            yield uow.stats
+            uow.session.commit()
+        except Exception:
+            uow.session.rollback()
+            raise
+        finally:
+            _CURRENT_UOW.reset(token)
+            uow.session.close()
+
+        if uow.new_accounts:
+            with self._accounts_lock:
+                self._account_ids.update(uow.new_accounts)
+        logger.debug("db.unit_of_work.commit", round_trips=uow.stats.round_trips)
+
+    def maintain_partitions(self) -> None:
+        self.partitions.maintain(
+            EMAILS_PARTITION_MONTHS_BACK, EMAILS_PARTITION_MONTHS_AHEAD, EMAILS_RETENTION_MONTHS
+        )
+        with self.engine.connect() as conn:
+            lower = self.partitions.lower_bound(conn)
+        # Um dia de folga: o timestamp gravado segue o fuso da sessão, não UTC
+        self._retained_from = (
+            datetime.combine(lower, datetime.min.time(), timezone.utc) + timedelta(days=1)
+            if lower else None
+        )
+
+    def migrate_partitions(self) -> bool:
+        """Converte `emails` (tabela comum) em particionada; False se já era."""
+        migrated = self.partitions.migrate(EMAILS_PARTITION_MONTHS_BACK, EMAILS_PARTITION_MONTHS_AHEAD)
+        self._email_key = PARTITIONED_EMAIL_KEY
+        return migrated
 
-    def save_all(self, account_email: str, emails: List[Email]) -> None:
+    def preload_accounts(self, account_emails: Iterable[str]) -> None:
+        """Cria as contas que faltam e carrega todos os ids em duas consultas."""
+        emails = [e for e in dict.fromkeys(account_emails) if e not in self._account_ids]
         if not emails:
-            logger.info("email_repo.save_all.skip", reason="empty_batch")
             return
-        log = logger.bind(account=account_email, total=len(emails))
-        session = self.Session()
+        with self._transaction() as session:
+            session.execute(
+                pg_insert(AccountORM)
+                .values([{"id": uuid.uuid4(), "email_address": e} for e in emails])
+                .on_conflict_do_nothing()
+            )
+            rows = session.execute(
+                select(AccountORM.email_address, AccountORM.id)
+                .where(AccountORM.email_address.in_(emails))
+            ).all()
+        with self._accounts_lock:
+            self._account_ids.update({email: acc_id for email, acc_id in rows})
+        logger.info("account_repo.preload.success", accounts=len(rows))
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Session]:
+        """
+        Sessão de uma operação: a da unidade de trabalho ativa (commit no fim
+        do bloco, e uma falha invalida a unidade inteira) ou, fora dela, uma
+        unidade só para esta operação.
+        """
+        uow = _CURRENT_UOW.get()
+        if uow is not None and uow.repo is self:
+            yield uow.session
+            return
+        with self.unit_of_work():
+            yield _CURRENT_UOW.get().session
+
+    def _storable(self, emails: EmailBatch, log) -> EmailBatch:
+        """
+        Descarta o que não tem partição: e-mail sem `sent_datetime` (chave de
+        partição) e, com retenção, anterior à partição mais antiga ainda anexada.
+        """
+        sent = emails.sent_datetime
+        kept = [i for i, d in enumerate(sent) if d is not None]
+        if len(kept) < len(emails):
+            log.warning("email_repo.save_all.skip_undated", skipped=len(emails) - len(kept))
+        if self._retained_from is not None:
+            dated = len(kept)
+            kept = [i for i in kept if self._as_utc(sent[i]) >= self._retained_from]
+            if len(kept) < dated:
+                log.info("email_repo.save_all.skip_expired", skipped=dated - len(kept))
+        # Lote inteiro aproveitável (o caso comum): sem cópia
+        return emails if len(kept) == len(emails) else emails.take(kept)
+
+    @staticmethod
+    def _as_utc(value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+    def _account_id(self, session: Session, email: str) -> uuid.UUID:
+        acc_id = self._account_ids.get(email)
+        if acc_id is None:
+            acc_id = self._ensure_account(session, email)
+            _CURRENT_UOW.get().new_accounts[email] = acc_id
+        return acc_id
+
+    def _on_round_trip(self, *_args, **_kwargs) -> None:
+        self._count_round_trips(1)
+
+    def _on_rollback(self, conn) -> None:
+        # A tabela de stage criada nesta transação deixa de existir
+        conn.connection.info.pop(STAGE_TABLE, None)
+        self._count_round_trips(1)
+
+    def _count_round_trips(self, n: int) -> None:
+        with self._round_trips_lock:
+            self._round_trips += n
+        uow = _CURRENT_UOW.get()
+        if uow is not None and uow.repo is self:
+            uow.stats.round_trips += n
+
+    # ------------------------------------------------------------------ #
+    #  Operações                                                         #
+    # ------------------------------------------------------------------ #
+
+    def save_all(self, account_email: str, emails: EmailBatch) -> UpsertStats:
+        if not emails:
+            logger.info("email_repo.save_all.skip", reason="empty_batch")
+            return UpsertStats()
+        log = logger.bind(account=account_email, total=len(emails), mode=self.bulk_mode)
+        emails = self._storable(emails, log)
+        if not emails:
+            return UpsertStats()
+        start = time.perf_counter()
         try:
-            acc_id = self._ensure_account(session, account_email)
-            for i in range(0, len(emails), CHUNK_SIZE):
-                self._upsert_batch(session, acc_id, emails[i : i + CHUNK_SIZE])
-            session.commit()
-            log.info("email_repo.save_all.success")
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                with PROFILER.span("db.upsert", mode=self.bulk_mode, emails=len(emails)):
+                    if self.bulk_mode == "copy":
+                        stats, days = self._copy_or_insert(session, acc_id, emails, log)
+                    else:
+                        stats, days = self._insert_all(session, acc_id, emails)
+                # Só os dias com linhas novas/alteradas são reagregados
+                with PROFILER.span("db.rollups", days=len(days)):
+                    rollups = self._refresh_rollups(session, days, acc_id) if days else 0
         except Exception:
-            session.rollback()
             log.exception("email_repo.save_all.error")
             raise
-        finally:
-            session.close()
+        UPSERT_SECONDS.labels(self.bulk_mode).observe(time.perf_counter() - start)
+        UPSERT_ROWS.labels("inserted").inc(stats.inserted)
+        UPSERT_ROWS.labels("updated").inc(stats.updated)
+        UPSERT_ROWS.labels("unchanged").inc(stats.unchanged)
+        log.info(
+            "email_repo.save_all.success",
+            inserted=stats.inserted, updated=stats.updated, unchanged=stats.unchanged,
+            rollup_days=len(days), rollup_rows=rollups,
+        )
+        return stats
+
+    def rebuild_rollups(self, start: date, end: date, account_email: Optional[str] = None) -> int:
+        log = logger.bind(start=start.isoformat(), end=end.isoformat(), account=account_email)
+        try:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email) if account_email else None
+                days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+                rows = self._refresh_rollups(session, days, acc_id)
+        except Exception:
+            log.exception("rollup_repo.rebuild.error")
+            raise
+        log.info("rollup_repo.rebuild.success", rows=rows)
+        return rows
+
+    def backfill_rollups(self, account_email: Optional[str] = None, step_days: int = 31) -> int:
+        """
+        Carga inicial de `email_daily_rollups` para e-mails gravados antes da
+        tabela existir: reagrega do primeiro ao último dia em `emails`, em
+        janelas de `step_days` (uma transação por janela).
+        """
+        with self._transaction() as session:
+            acc_id = self._account_id(session, account_email) if account_email else None
+            account_filter = "WHERE account_id = CAST(:acc AS uuid)" if acc_id is not None else ""
+            first, last = session.execute(
+                text(
+                    f"SELECT min({rollup_day('sent_datetime')}), max({rollup_day('sent_datetime')}) "
+                    f"FROM {EmailORM.__tablename__} {account_filter}"
+                ),
+                {"acc": str(acc_id) if acc_id is not None else None},
+            ).one()
+        if first is None:
+            logger.info("rollup_repo.backfill.empty", account=account_email)
+            return 0
+        rows = 0
+        start = first
+        while start <= last:
+            end = min(start + timedelta(days=step_days - 1), last)
+            rows += self.rebuild_rollups(start, end, account_email)
+            start = end + timedelta(days=1)
+        logger.info("rollup_repo.backfill.success", account=account_email, first=first.isoformat(),
+                    last=last.isoformat(), rows=rows)
+        return rows
 
     def save(self, metrics: EmailMetrics, account_email: str) -> None:
-        session = self.Session()
         log = logger.bind(id=str(metrics.id), account=account_email)
         try:
-            acc_id = self._ensure_account(session, account_email)
-            session.add(
-                MetricsORM(
-                    id=metrics.id,
-                    account_id=acc_id,
-                    run_at=metrics.run_at,
-                    date=metrics.date,
-                    total_sent=metrics.total_sent,
-                    total_delivered=metrics.total_delivered,
-                    total_bounced=metrics.total_bounced,
-                    total_replied=metrics.total_replied,
-                    total_no_reply=metrics.total_no_reply,
-                    raw_total_sent=metrics.raw_total_sent,
-                    raw_total_delivered=metrics.raw_total_delivered,
-                    raw_total_bounced=metrics.raw_total_bounced,
-                    raw_total_replied=metrics.raw_total_replied,
-                    raw_total_no_reply=metrics.raw_total_no_reply,
-                    delivery_rate=int(metrics.delivery_rate * 10_000),
-                    reply_rate=int(metrics.reply_rate * 10_000),
-                    temperature_label=metrics.temperature_label,
-                    avg_reply_latency_sec=metrics.avg_reply_latency_sec,
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                session.execute(
+                    pg_insert(MetricsORM).values(
+                        id=metrics.id,
+                        account_id=acc_id,
+                        run_at=metrics.run_at,
+                        date=metrics.date,
+                        total_sent=metrics.total_sent,
+                        total_delivered=metrics.total_delivered,
+                        total_bounced=metrics.total_bounced,
+                        total_replied=metrics.total_replied,
+                        total_no_reply=metrics.total_no_reply,
+                        raw_total_sent=metrics.raw_total_sent,
+                        raw_total_delivered=metrics.raw_total_delivered,
+                        raw_total_bounced=metrics.raw_total_bounced,
+                        raw_total_replied=metrics.raw_total_replied,
+                        raw_total_no_reply=metrics.raw_total_no_reply,
+                        delivery_rate=int(metrics.delivery_rate * 10_000),
+                        reply_rate=int(metrics.reply_rate * 10_000),
+                        temperature_label=metrics.temperature_label,
+                        avg_reply_latency_sec=metrics.avg_reply_latency_sec,
+                    )
                 )
-            )
-            session.commit()
-            log.info("metrics_repo.insert.success")
         except Exception:
-            session.rollback()
             log.exception("metrics_repo.insert.error")
             raise
-        finally:
-            session.close()
+        log.info("metrics_repo.insert.success")
+
+    def get_delta_link(self, account_email: str, folder_id: str) -> Optional[str]:
+        acc_id = self._account_ids.get(account_email)
+        with self._transaction() as session:
+            query = select(SyncStateORM.delta_link).where(SyncStateORM.folder_id == folder_id)
+            if acc_id is not None:
+                query = query.where(SyncStateORM.account_id == acc_id)
+            else:
+                query = query.join(AccountORM, AccountORM.id == SyncStateORM.account_id).where(
+                    AccountORM.email_address == account_email
+                )
+            return session.execute(query).scalar_one_or_none()
+
+    def save_delta_link(self, account_email: str, folder_id: str, delta_link: str) -> None:
+        log = logger.bind(account=account_email, folder_id=folder_id)
+        try:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                stmt = pg_insert(SyncStateORM).values(
+                    account_id=acc_id, folder_id=folder_id, delta_link=delta_link
+                )
+                session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["account_id", "folder_id"],
+                        set_={"delta_link": stmt.excluded.delta_link, "updated_at": func.now()},
+                    )
+                )
+        except Exception:
+            log.exception("sync_state_repo.save.error")
+            raise
+        log.info("sync_state_repo.save.success")
+
+    def iter_emails(self, account_email: str, since: datetime, page_size: int) -> Iterator[EmailBatch]:
+        """
+        Páginas de até `page_size` e-mails, por keyset em `(sent_datetime, id)`:
+        cada página é uma consulta própria (na transação aberta por quem pede a
+        próxima), sem deixar a conta inteira em memória.
+        """
+        # A coluna é `timestamp` no fuso da sessão: volta como datetime com fuso
+        sent_at = "(sent_datetime AT TIME ZONE current_setting('TimeZone'))"
+        after: Optional[Tuple[datetime, uuid.UUID]] = None  # (sent_datetime cru, id) da última linha da página anterior
+        while True:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                rows = session.execute(
+                    text(
+                        f"""
+                        SELECT id, sent_datetime AS sent_raw, message_id, internet_message_id, subject,
+                               {sent_at} AS sent_at, is_read, conversation_id, has_attachments,
+                               recipient_addresses, importance, is_read_receipt_requested
+                        FROM {EmailORM.__tablename__}
+                        WHERE account_id = :acc AND sent_datetime >= :since
+                          AND (CAST(:after_sent AS timestamp) IS NULL
+                               OR (sent_datetime, id) < (:after_sent, CAST(:after_id AS uuid)))
+                        ORDER BY sent_datetime DESC, id DESC
+                        LIMIT :limit
+                        """
+                    ),
+                    {
+                        "acc": acc_id,
+                        "since": since,
+                        "after_sent": after[0] if after else None,
+                        "after_id": after[1] if after else None,
+                        "limit": page_size,
+                    },
+                ).all()
+            if not rows:
+                return
+            emails = EmailBatch()
+            for r in rows:
+                emails.append(
+                    message_id=r.message_id,
+                    conversation_id=r.conversation_id,
+                    subject=r.subject,
+                    sent_datetime=r.sent_at,
+                    to_addresses=r.recipient_addresses,
+                    is_read=r.is_read,
+                    has_attachments=r.has_attachments,
+                    importance=r.importance,
+                    is_read_receipt_requested=r.is_read_receipt_requested,
+                    internet_message_id=r.internet_message_id,
+                )
+            after = (rows[-1].sent_raw, rows[-1].id)
+            yield emails
+            if len(rows) < page_size:
+                return
+
+    def delete_emails(self, account_email: str, message_ids: Iterable[str]) -> int:
+        """
+        Apaga os e-mails e, na mesma transação, reagrega os dias afetados e
+        remove o estado das conversas que ficaram sem nenhum e-mail.
+        """
+        ids = list(dict.fromkeys(message_ids))
+        if not ids:
+            return 0
+        log = logger.bind(account=account_email, requested=len(ids))
+        days: set = set()
+        conversations: set = set()
+        deleted = 0
+        try:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                for i in range(0, len(ids), STATE_CHUNK_SIZE):
+                    rows = session.execute(
+                        text(
+                            f"""
+                            DELETE FROM {EmailORM.__tablename__}
+                            WHERE account_id = :acc AND message_id = ANY(:ids)
+                            RETURNING conversation_id, {rollup_day("sent_datetime")} AS day
+                            """
+                        ),
+                        {"acc": acc_id, "ids": ids[i : i + STATE_CHUNK_SIZE]},
+                    ).all()
+                    conversations.update(r.conversation_id for r in rows)
+                    days.update(r.day for r in rows if r.day is not None)
+                    deleted += len(rows)
+                if days:
+                    self._refresh_rollups(session, days, acc_id)
+                if conversations:
+                    session.execute(
+                        text(
+                            f"""
+                            DELETE FROM {ConversationStateORM.__tablename__} cs
+                            WHERE cs.account_id = :acc AND cs.conversation_id = ANY(:convs)
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM {EmailORM.__tablename__} e
+                                  WHERE e.account_id = cs.account_id AND e.conversation_id = cs.conversation_id
+                              )
+                            """
+                        ),
+                        {"acc": acc_id, "convs": list(conversations)},
+                    )
+        except Exception:
+            log.exception("email_repo.delete.error")
+            raise
+        log.info("email_repo.delete.success", deleted=deleted, rollup_days=len(days))
+        return deleted
+
+    def get_checkpoint(self, account_email: str, folder_id: str) -> Optional[SyncCheckpoint]:
+        with self._transaction() as session:
+            acc_id = self._account_id(session, account_email)
+            row = session.get(SyncCheckpointORM, (acc_id, folder_id))
+            if row is None:
+                return None
+            return SyncCheckpoint(
+                folder_id=row.folder_id,
+                next_link=row.next_link,
+                boundary=row.boundary,
+                window_start=row.window_start,
+                chunks=row.chunks,
+                emails=row.emails,
+                started_at=row.started_at,
+                updated_at=row.updated_at,
+            )
+
+    def save_checkpoint(self, account_email: str, checkpoint: SyncCheckpoint) -> None:
+        log = logger.bind(account=account_email, folder_id=checkpoint.folder_id)
+        try:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                values = {
+                    "next_link": checkpoint.next_link,
+                    "boundary": checkpoint.boundary,
+                    "window_start": checkpoint.window_start,
+                    "chunks": checkpoint.chunks,
+                    "emails": checkpoint.emails,
+                }
+                stmt = pg_insert(SyncCheckpointORM).values(
+                    account_id=acc_id, folder_id=checkpoint.folder_id, **values
+                )
+                session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["account_id", "folder_id"],
+                        set_={**values, "updated_at": func.now()},
+                    )
+                )
+        except Exception:
+            log.exception("checkpoint_repo.save.error")
+            raise
+        log.debug("checkpoint_repo.save.success", chunks=checkpoint.chunks, emails=checkpoint.emails)
+
+    def clear_checkpoint(self, account_email: str, folder_id: str) -> None:
+        with self._transaction() as session:
+            acc_id = self._account_id(session, account_email)
+            session.execute(
+                SyncCheckpointORM.__table__.delete().where(
+                    SyncCheckpointORM.account_id == acc_id,
+                    SyncCheckpointORM.folder_id == folder_id,
+                )
+            )
+
+    def get_conversation_states(
+        self, account_email: str, conversation_ids: Iterable[str]
+    ) -> Dict[str, ConversationState]:
+        ids = list(dict.fromkeys(conversation_ids))
+        states: Dict[str, ConversationState] = {}
+        with self._transaction() as session:
+            acc_id = self._account_id(session, account_email)
+            for i in range(0, len(ids), STATE_CHUNK_SIZE):
+                rows = session.execute(
+                    select(ConversationStateORM).where(
+                        ConversationStateORM.account_id == acc_id,
+                        ConversationStateORM.conversation_id.in_(ids[i : i + STATE_CHUNK_SIZE]),
+                    )
+                ).scalars()
+                for row in rows:
+                    states[row.conversation_id] = ConversationState(
+                        conversation_id=row.conversation_id,
+                        is_bounced=row.is_bounced,
+                        is_replied=row.is_replied,
+                        first_reply_at=row.first_reply_at,
+                        last_checked_at=row.last_checked_at,
+                    )
+        return states
+
+    def get_conversation_starts(
+        self, account_email: str, conversation_ids: Iterable[str]
+    ) -> Dict[str, datetime]:
+        ids = list(dict.fromkeys(conversation_ids))
+        starts: Dict[str, datetime] = {}
+        with self._transaction() as session:
+            acc_id = self._account_id(session, account_email)
+            for i in range(0, len(ids), STATE_CHUNK_SIZE):
+                rows = session.execute(
+                    text(
+                        f"""
+                        SELECT conversation_id,
+                               min(sent_datetime) AT TIME ZONE current_setting('TimeZone') AS first_sent
+                        FROM {EmailORM.__tablename__}
+                        WHERE account_id = :acc AND conversation_id = ANY(:ids)
+                        GROUP BY conversation_id
+                        """
+                    ),
+                    {"acc": acc_id, "ids": ids[i : i + STATE_CHUNK_SIZE]},
+                )
+                starts.update((r.conversation_id, r.first_sent) for r in rows if r.first_sent is not None)
+        return starts
+
+    def get_open_conversations(
+        self, account_email: str, started_after: datetime, checked_before: datetime, limit: int
+    ) -> Dict[str, datetime]:
+        with self._transaction() as session:
+            acc_id = self._account_id(session, account_email)
+            rows = session.execute(
+                text(
+                    f"""
+                    SELECT cs.conversation_id,
+                           min(e.sent_datetime) AT TIME ZONE current_setting('TimeZone') AS first_sent
+                    FROM {ConversationStateORM.__tablename__} cs
+                    JOIN {EmailORM.__tablename__} e
+                      ON e.account_id = cs.account_id AND e.conversation_id = cs.conversation_id
+                     AND e.sent_datetime >= :started_after
+                    WHERE cs.account_id = :acc AND NOT cs.is_bounced AND NOT cs.is_replied
+                      AND cs.last_checked_at < :checked_before
+                      -- Conversa iniciada antes da janela (o original é mais antigo): fica de fora
+                      AND NOT EXISTS (
+                          SELECT 1 FROM {EmailORM.__tablename__} o
+                          WHERE o.account_id = cs.account_id AND o.conversation_id = cs.conversation_id
+                            AND o.sent_datetime < :started_after
+                      )
+                    GROUP BY cs.conversation_id, cs.last_checked_at
+                    ORDER BY cs.last_checked_at, cs.conversation_id
+                    LIMIT :limit
+                    """
+                ),
+                {"acc": acc_id, "started_after": started_after, "checked_before": checked_before, "limit": limit},
+            )
+            return {r.conversation_id: r.first_sent for r in rows}
+
+    def save_original_verdicts(self, account_email: str, verdicts: Dict[str, Verdict]) -> int:
+        if not verdicts:
+            return 0
+        log = logger.bind(account=account_email, conversations=len(verdicts))
+        items = list(verdicts.items())
+        days: set = set()
+        updated = 0
+        try:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                for i in range(0, len(items), STATE_CHUNK_SIZE):
+                    chunk = items[i : i + STATE_CHUNK_SIZE]
+                    rows = session.execute(
+                        text(
+                            f"""
+                            WITH v AS (
+                                SELECT * FROM unnest(
+                                    CAST(:convs AS text[]), CAST(:bounced AS boolean[]),
+                                    CAST(:replied AS boolean[]), CAST(:latency AS float8[]),
+                                    CAST(:score AS integer[]), CAST(:label AS text[])
+                                ) AS v(conversation_id, is_bounced, is_replied, reply_latency_sec,
+                                       engagement_score, temperature_label)
+                            ), firsts AS (
+                                SELECT DISTINCT ON (e.conversation_id) e.conversation_id, e.id, e.sent_datetime
+                                FROM {EmailORM.__tablename__} e JOIN v ON v.conversation_id = e.conversation_id
+                                WHERE e.account_id = :acc
+                                ORDER BY e.conversation_id, e.sent_datetime, e.id
+                            )
+                            UPDATE {EmailORM.__tablename__} e
+                            SET is_bounced = v.is_bounced,
+                                is_replied = v.is_replied,
+                                reply_latency_sec = v.reply_latency_sec,
+                                engagement_score = v.engagement_score,
+                                temperature_label = v.temperature_label
+                            FROM firsts f JOIN v ON v.conversation_id = f.conversation_id
+                            WHERE e.account_id = :acc AND e.id = f.id AND e.sent_datetime = f.sent_datetime
+                            RETURNING {rollup_day("e.sent_datetime")} AS day
+                            """
+                        ),
+                        {
+                            "acc": acc_id,
+                            "convs": [conv_id for conv_id, _ in chunk],
+                            "bounced": [v.is_bounced for _, v in chunk],
+                            "replied": [v.is_replied for _, v in chunk],
+                            "latency": [v.reply_latency_sec for _, v in chunk],
+                            "score": [v.engagement_score for _, v in chunk],
+                            "label": [v.temperature_label for _, v in chunk],
+                        },
+                    ).all()
+                    days.update(r.day for r in rows if r.day is not None)
+                    updated += len(rows)
+                if days:
+                    self._refresh_rollups(session, days, acc_id)
+        except Exception:
+            log.exception("conversation_state_repo.save_verdicts.error")
+            raise
+        log.info("conversation_state_repo.save_verdicts.success", updated=updated, rollup_days=len(days))
+        return updated
+
+    def save_conversation_states(self, account_email: str, states: List[ConversationState]) -> None:
+        if not states:
+            return
+        log = logger.bind(account=account_email, total=len(states))
+        try:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                for i in range(0, len(states), STATE_CHUNK_SIZE):
+                    rows = [
+                        {
+                            "account_id": acc_id,
+                            "conversation_id": st.conversation_id,
+                            "is_bounced": st.is_bounced,
+                            "is_replied": st.is_replied,
+                            "first_reply_at": st.first_reply_at,
+                            "last_checked_at": st.last_checked_at or datetime.now(timezone.utc),
+                        }
+                        for st in states[i : i + STATE_CHUNK_SIZE]
+                    ]
+                    stmt = pg_insert(ConversationStateORM).values(rows)
+                    session.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=["account_id", "conversation_id"],
+                            set_={
+                                "is_bounced": stmt.excluded.is_bounced,
+                                "is_replied": stmt.excluded.is_replied,
+                                "first_reply_at": stmt.excluded.first_reply_at,
+                                "last_checked_at": stmt.excluded.last_checked_at,
+                            },
+                        )
+                    )
+        except Exception:
+            log.exception("conversation_state_repo.save.error")
+            raise
+        log.info("conversation_state_repo.save.success")
+
+    def pending_delivery_signals(self, account_email: str, limit: int) -> Dict[str, str]:
+        emails, signals = EmailORM.__tablename__, DeliverySignalORM.__tablename__
+        with self._transaction() as session:
+            acc_id = self._account_id(session, account_email)
+            rows = session.execute(
+                text(
+                    f"""
+                    SELECT message_id, internet_message_id FROM (
+                        SELECT DISTINCT ON (e.internet_message_id)
+                               e.message_id, e.internet_message_id, e.sent_datetime
+                        FROM {emails} e
+                        WHERE e.account_id = CAST(:acc AS uuid)
+                          AND e.internet_message_id IS NOT NULL
+                          AND NOT EXISTS (
+                              SELECT 1 FROM {signals} s
+                              WHERE s.internet_message_id = e.internet_message_id
+                          )
+                        ORDER BY e.internet_message_id, e.sent_datetime DESC
+                    ) pending
+                    ORDER BY sent_datetime DESC
+                    LIMIT :limit
+                    """
+                ),
+                {"acc": str(acc_id), "limit": limit},
+            ).all()
+        return {row.message_id: row.internet_message_id for row in rows}
+
+    def save_delivery_signals(self, account_email: str, signals: List[DeliverySignals]) -> int:
+        if not signals:
+            return 0
+        log = logger.bind(account=account_email, total=len(signals))
+        inserted = 0
+        try:
+            with self._transaction() as session:
+                acc_id = self._account_id(session, account_email)
+                for i in range(0, len(signals), STATE_CHUNK_SIZE):
+                    rows = [
+                        {
+                            "internet_message_id": sig.internet_message_id,
+                            "account_id": acc_id,
+                            "scl": sig.scl,
+                            "dkim_pass": sig.dkim_pass,
+                            "spf_pass": sig.spf_pass,
+                            "dmarc_pass": sig.dmarc_pass,
+                            "from_ip": sig.from_ip,
+                            "to_ip": sig.to_ip,
+                            "delivery_latency_sec": sig.delivery_latency_sec,
+                            "analyzed_at": sig.analyzed_at or datetime.now(timezone.utc),
+                        }
+                        for sig in signals[i : i + STATE_CHUNK_SIZE]
+                    ]
+                    result = session.execute(
+                        pg_insert(DeliverySignalORM)
+                        .values(rows)
+                        .on_conflict_do_nothing(index_elements=["internet_message_id"])
+                        .returning(DeliverySignalORM.internet_message_id)
+                    )
+                    inserted += len(result.all())
+        except Exception:
+            log.exception("delivery_signal_repo.save.error")
+            raise
+        log.info("delivery_signal_repo.save.success", inserted=inserted)
+        return inserted
+
+    # ------------------------------------------------------------------ #
+    #  Leases de conta (várias instâncias)                               #
+    # ------------------------------------------------------------------ #
+    def heartbeat(self, node_id: str, ttl: float) -> int:
+        with self._transaction() as session:
+            session.execute(
+                text(
+                    f"""
+                    INSERT INTO {WorkerNodeORM.__tablename__} (node_id, heartbeat_at) VALUES (:node, now())
+                    ON CONFLICT (node_id) DO UPDATE SET heartbeat_at = now()
+                    """
+                ),
+                {"node": node_id},
+            )
+            # Instâncias sumidas há muito tempo saem da tabela
+            session.execute(
+                text(
+                    f"DELETE FROM {WorkerNodeORM.__tablename__} "
+                    "WHERE heartbeat_at < now() - make_interval(secs => :ttl * 10)"
+                ),
+                {"ttl": ttl},
+            )
+            return session.execute(
+                text(
+                    f"SELECT count(*) FROM {WorkerNodeORM.__tablename__} "
+                    "WHERE heartbeat_at >= now() - make_interval(secs => :ttl)"
+                ),
+                {"ttl": ttl},
+            ).scalar_one()
+
+    def claim_accounts(self, node_id: str, accounts: List[str], limit: int, ttl: float) -> List[str]:
+        if limit <= 0 or not accounts:
+            return []
+        leases = AccountLeaseORM.__tablename__
+        self.preload_accounts(accounts)
+        with self._transaction() as session:
+            session.execute(
+                text(
+                    f"""
+                    INSERT INTO {leases} (account_id)
+                    SELECT id FROM accounts WHERE email_address = ANY(:accounts)
+                    ON CONFLICT (account_id) DO NOTHING
+                    """
+                ),
+                {"accounts": accounts},
+            )
+            # SKIP LOCKED: contas sendo assumidas por outra instância ficam para ela, sem espera
+            rows = session.execute(
+                text(
+                    f"""
+                    WITH free AS (
+                        SELECT l.account_id
+                        FROM {leases} l
+                        JOIN accounts a ON a.id = l.account_id
+                        WHERE a.email_address = ANY(:accounts)
+                          AND (l.owner IS NULL OR l.lease_until IS NULL OR l.lease_until < now())
+                        ORDER BY l.lease_until NULLS FIRST, a.email_address
+                        LIMIT :limit
+                        FOR UPDATE OF l SKIP LOCKED
+                    )
+                    UPDATE {leases} l
+                    SET owner = :node, lease_until = now() + make_interval(secs => :ttl), updated_at = now()
+                    FROM free, accounts a
+                    WHERE l.account_id = free.account_id AND a.id = l.account_id
+                    RETURNING a.email_address
+                    """
+                ),
+                {"accounts": accounts, "limit": limit, "node": node_id, "ttl": ttl},
+            ).scalars().all()
+        if rows:
+            logger.info("lease_repo.claim.success", node=node_id, accounts=rows)
+        return list(rows)
+
+    def renew_leases(self, node_id: str, ttl: float) -> List[str]:
+        leases = AccountLeaseORM.__tablename__
+        with self._transaction() as session:
+            return list(
+                session.execute(
+                    text(
+                        f"""
+                        UPDATE {leases} l
+                        SET lease_until = now() + make_interval(secs => :ttl), updated_at = now()
+                        FROM accounts a
+                        WHERE l.owner = :node AND a.id = l.account_id
+                        RETURNING a.email_address
+                        """
+                    ),
+                    {"node": node_id, "ttl": ttl},
+                ).scalars()
+            )
+
+    def release_leases(self, node_id: str, accounts: Optional[List[str]] = None) -> None:
+        leases = AccountLeaseORM.__tablename__
+        account_filter = (
+            "AND account_id IN (SELECT id FROM accounts WHERE email_address = ANY(:accounts))"
+            if accounts is not None else ""
+        )
+        with self._transaction() as session:
+            session.execute(
+                text(
+                    f"UPDATE {leases} SET owner = NULL, lease_until = NULL, updated_at = now() "
+                    f"WHERE owner = :node {account_filter}"
+                ),
+                {"node": node_id, "accounts": accounts or []},
+            )
+        logger.info("lease_repo.release.success", node=node_id, accounts=accounts)
 
     def _ensure_account(self, session, email: str) -> uuid.UUID:
         stmt = (
@@ -155,35 +1073,289 @@ class PgEmailRepository(EmailRepositoryPort, MetricsRepositoryPort):
         return acc_id
 
     @staticmethod
-    def _build_email_dict(acc_id: uuid.UUID, e: Email) -> Dict:
+    def _build_email_dict(acc_id: uuid.UUID, emails: EmailBatch, i: int) -> Dict:
+        verdict = emails.verdict(i)
         return {
-            "id": e.id,
-            "recipient_addresses": e.to_addresses,
+            # Só vale para linha nova (o UPSERT não reescreve o id): gerado apenas na gravação
+            "id": uuid.uuid4(),
+            "recipient_addresses": list(emails.to_addresses[i]),
             "account_id": acc_id,
-            "message_id": e.message_id,
-            "conversation_id": e.conversation_id,
-            "subject": e.subject,
-            "sent_datetime": e.sent_datetime,
-            "is_read": e.is_read,
-            "has_attachments": e.has_attachments,
-            "is_bounced": e.is_bounced,
-            "is_replied": e.is_replied,
-            "importance": e.importance,
-            "internet_message_id": e.internet_message_id,
-            "is_read_receipt_requested": e.is_read_receipt_requested,
-            "reply_latency_sec": e.reply_latency_sec,
-            "engagement_score": e.engagement_score,
-            "temperature_label": e.temperature_label,
+            "message_id": emails.message_id[i],
+            "conversation_id": emails.conversation_id[i],
+            "subject": emails.subject[i],
+            "sent_datetime": emails.sent_datetime[i],
+            "is_read": bool(emails.is_read[i]),
+            "has_attachments": bool(emails.has_attachments[i]),
+            "is_bounced": verdict.is_bounced,
+            "is_replied": verdict.is_replied,
+            "importance": emails.importance[i],
+            "internet_message_id": emails.internet_message_id[i],
+            "is_read_receipt_requested": bool(emails.is_read_receipt_requested[i]),
+            "reply_latency_sec": verdict.reply_latency_sec,
+            "engagement_score": verdict.engagement_score,
+            "temperature_label": verdict.temperature_label,
         }
 
-    def _upsert_batch(self, session, acc_id: uuid.UUID, batch: List[Email]) -> None:
-        insert_stmt = pg_insert(EmailORM).values([self._build_email_dict(acc_id, e) for e in batch])
+    def _upsert_batch(
+        self, session, acc_id: uuid.UUID, emails: EmailBatch, rows: range
+    ) -> Tuple[UpsertStats, Set[date]]:
+        insert_stmt = pg_insert(EmailORM).values([self._build_email_dict(acc_id, emails, i) for i in rows])
+        columns = self._update_columns()
+        table = EmailORM.__table__
         stmt = insert_stmt.on_conflict_do_update(
-            index_elements=["account_id", "message_id", "conversation_id"],
-            set_={
-                c.name: insert_stmt.excluded[c.name]
-                for c in EmailORM.__table__.columns
-                if c.name not in ("id", "account_id")
-            },
+            index_elements=list(self._email_key),
+            set_={name: insert_stmt.excluded[name] for name in columns},
+            # Linha idêntica não é reescrita: sem tupla morta, WAL nem trabalho de vacuum
+            where=tuple_(*(table.c[name] for name in columns)).is_distinct_from(
+                tuple_(*(insert_stmt.excluded[name] for name in columns))
+            ),
+        ).returning(
+            literal_column(self._inserted_flag()).label("inserted"),
+            literal_column(rollup_day(f"{EmailORM.__tablename__}.sent_datetime")).label("day"),
         )
-        session.execute(stmt)
\ No newline at end of file
+        returned = session.execute(stmt).all()
+        inserted = sum(1 for r in returned if r.inserted)
+        stats = UpsertStats(inserted, len(returned) - inserted, len(rows) - len(returned))
+        return stats, {r.day for r in returned}
+
+    def _insert_all(
+        self, session, acc_id: uuid.UUID, emails: EmailBatch
+    ) -> Tuple[UpsertStats, Set[date]]:
+        stats, days = UpsertStats(), set()
+        for i in range(0, len(emails), CHUNK_SIZE):
+            rows = range(i, min(i + CHUNK_SIZE, len(emails)))
+            batch_stats, batch_days = self._upsert_batch(session, acc_id, emails, rows)
+            stats += batch_stats
+            days |= batch_days
+        return stats, days
+
+    def _inserted_flag(self) -> str:
+        """
+        True para linha nova. A subconsulta usa o snapshot do próprio comando, que
+        não enxerga as linhas que ele grava: só acha a versão anterior (UPDATE).
+        Substitui `xmax = 0`, que o RETURNING de tabela particionada não aceita.
+        """
+        table = EmailORM.__tablename__
+        same_key = " AND ".join(f"prior.{k} = {table}.{k}" for k in self._email_key)
+        return f"NOT EXISTS (SELECT 1 FROM {table} AS prior WHERE {same_key})"
+
+    @staticmethod
+    def _update_columns() -> List[str]:
+        """Colunas reescritas no conflito (e comparadas para detectar mudança)."""
+        return [
+            c.name for c in EmailORM.__table__.columns
+            if c.name != "id" and c.name not in PARTITIONED_EMAIL_KEY
+        ]
+
+    # ------------------------------------------------------------------ #
+    #  Rollups diários                                                   #
+    # ------------------------------------------------------------------ #
+    def _refresh_rollups(self, session, days: Iterable[date], acc_id: Optional[uuid.UUID]) -> int:
+        """
+        Reagrega os `days` (de uma conta ou de todas) a partir de `emails` em um
+        único statement: grupos atuais entram por UPSERT (sem reescrever os que
+        não mudaram) e grupos que deixaram de existir nesses dias são apagados.
+        A faixa de `sent_datetime` (com um dia de folga para o fuso) mantém o
+        pruning de partições e o índice (account_id, sent_datetime).
+        """
+        days = sorted(set(days))
+        table = EmailDailyRollupORM.__tablename__
+        measures = [c for c in self._rollup_columns() if c not in ROLLUP_KEY]
+        account_filter = "AND account_id = CAST(:acc AS uuid)" if acc_id is not None else ""
+        result = session.execute(
+            text(
+                f"""
+                WITH fresh AS (
+                    SELECT
+                        account_id,
+                        {rollup_day("sent_datetime")} AS day,
+                        temperature_label,
+                        -- Mesmo critério dos KPIs antigos (`subject NOT ILIKE ...`): assunto nulo fica fora
+                        (subject NOT ILIKE 'ENC:%' AND subject NOT ILIKE 'FW:%') IS NOT TRUE AS is_forward,
+                        count(*) AS sent,
+                        count(*) FILTER (WHERE NOT is_bounced) AS delivered,
+                        count(*) FILTER (WHERE is_replied) AS replied,
+                        count(*) FILTER (WHERE is_bounced) AS bounced,
+                        coalesce(sum(engagement_score), 0) AS engagement_sum,
+                        coalesce(sum(reply_latency_sec), 0) AS latency_sum,
+                        count(reply_latency_sec) AS latency_count
+                    FROM {EmailORM.__tablename__}
+                    WHERE sent_datetime >= CAST(:lo AS date) - 1
+                      AND sent_datetime < CAST(:hi AS date) + 2
+                      AND {rollup_day("sent_datetime")} = ANY(CAST(:days AS date[]))
+                      {account_filter}
+                    GROUP BY 1, 2, 3, 4
+                ), upserted AS (
+                    INSERT INTO {table} ({", ".join(self._rollup_columns())})
+                    SELECT {", ".join(self._rollup_columns())} FROM fresh
+                    ON CONFLICT ({", ".join(ROLLUP_KEY)}) DO UPDATE SET
+                        {", ".join(f"{c} = EXCLUDED.{c}" for c in measures)}, updated_at = now()
+                    WHERE ({", ".join(f"{table}.{c}" for c in measures)})
+                        IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in measures)})
+                    RETURNING 1
+                ), removed AS (
+                    DELETE FROM {table} r
+                    WHERE r.day = ANY(CAST(:days AS date[])) {account_filter.replace("account_id", "r.account_id")}
+                      AND NOT EXISTS (
+                          SELECT 1 FROM fresh f
+                          WHERE {" AND ".join(f"f.{k} = r.{k}" for k in ROLLUP_KEY)}
+                      )
+                    RETURNING 1
+                )
+                SELECT (SELECT count(*) FROM upserted) + (SELECT count(*) FROM removed)
+                """
+            ),
+            {"lo": days[0], "hi": days[-1], "days": days, "acc": str(acc_id)},
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    def _rollup_columns() -> List[str]:
+        return [c.name for c in EmailDailyRollupORM.__table__.columns if c.name != "updated_at"]
+
+    # ------------------------------------------------------------------ #
+    #  Carga em massa: COPY para tabela temporária + merge set-based     #
+    # ------------------------------------------------------------------ #
+    def _copy_or_insert(
+        self, session, acc_id: uuid.UUID, emails: EmailBatch, log
+    ) -> Tuple[UpsertStats, Set[date]]:
+        """
+        Tenta o COPY dentro de um savepoint; se falhar (driver sem COPY,
+        dado rejeitado...), desfaz só o savepoint e grava pelo INSERT em lotes.
+        """
+        try:
+            with session.begin_nested():
+                return self._copy_merge(session, acc_id, emails)
+        except Exception:
+            log.warning("email_repo.copy.fallback_to_insert", exc_info=True)
+            # A tabela temporária pode ter sumido com o rollback; recria na próxima vez
+            session.connection().connection.info.pop(STAGE_TABLE, None)
+            return self._insert_all(session, acc_id, emails)
+
+    def _copy_merge(
+        self, session, acc_id: uuid.UUID, emails: EmailBatch
+    ) -> Tuple[UpsertStats, Set[date]]:
+        """
+        Envia as linhas por `COPY ... FROM STDIN` (geradas sob demanda) para uma
+        tabela temporária da conexão e faz um único INSERT ... SELECT ... ON CONFLICT.
+        `DISTINCT ON` mantém só a última versão de cada e-mail repetido no lote;
+        o `WHERE ... IS DISTINCT FROM` deixa intactas as linhas que não mudaram.
+        """
+        columns = self._stage_columns()
+        updated = self._update_columns()
+        target = ", ".join(["account_id", *columns])
+        assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in updated)
+        current = ", ".join(f"{EmailORM.__tablename__}.{c}" for c in updated)
+        incoming = ", ".join(f"EXCLUDED.{c}" for c in updated)
+        # Igual ao caminho INSERT: o timestamptz recebido vira timestamp no fuso da sessão
+        select_cols = ", ".join(
+            "sent_datetime::timestamp" if c == "sent_datetime" else c for c in columns
+        )
+
+        raw = session.connection().connection
+        with raw.cursor() as cur:
+            # A tabela temporária vive com a conexão do pool: DDL só na primeira vez
+            if not raw.info.get(STAGE_TABLE):
+                cur.execute(self._stage_ddl())
+                raw.info[STAGE_TABLE] = True
+                self._count_round_trips(1)
+            cur.copy_expert(
+                f"COPY {STAGE_TABLE} (seq, {', '.join(columns)}) FROM STDIN",
+                _CopyStream(self._copy_lines(emails, columns)),
+            )
+            cur.execute(
+                f"""
+                WITH stage AS (
+                    SELECT DISTINCT ON (message_id, conversation_id) *
+                    FROM {STAGE_TABLE}
+                    ORDER BY message_id, conversation_id, seq DESC
+                ), merged AS (
+                    INSERT INTO {EmailORM.__tablename__} ({target})
+                    SELECT %(acc_id)s, {select_cols} FROM stage
+                    ON CONFLICT ({", ".join(self._email_key)}) DO UPDATE SET {assignments}
+                    WHERE ({current}) IS DISTINCT FROM ({incoming})
+                    RETURNING {self._inserted_flag()} AS inserted, {rollup_day("sent_datetime")} AS day
+                ), cleared AS (
+                    -- Mesmo snapshot: não afeta o que `stage` leu; esvazia para o próximo lote da transação
+                    DELETE FROM {STAGE_TABLE}
+                )
+                SELECT
+                    count(*) FILTER (WHERE inserted),
+                    count(*) FILTER (WHERE NOT inserted),
+                    (SELECT count(*) FROM stage),
+                    array_agg(DISTINCT day)
+                FROM merged
+                """,
+                {"acc_id": str(acc_id)},
+            )
+            self._count_round_trips(2)  # COPY + merge (cursor cru, fora dos eventos do engine)
+            inserted, updated_rows, distinct, days = cur.fetchone()
+            stats = UpsertStats(inserted, updated_rows, distinct - inserted - updated_rows)
+            return stats, set(days or ())
+
+    @staticmethod
+    def _stage_columns() -> List[str]:
+        return [c.name for c in EmailORM.__table__.columns if c.name != "account_id"]
+
+    def _stage_ddl(self) -> str:
+        """Tabela temporária por conexão (esvaziada no commit e a cada merge)."""
+        dialect = self.engine.dialect
+        cols = ["seq bigint NOT NULL"]
+        for c in EmailORM.__table__.columns:
+            if c.name == "account_id":
+                continue
+            col_type = "timestamptz" if c.name == "sent_datetime" else c.type.compile(dialect=dialect)
+            cols.append(f"{c.name} {col_type}")
+        return (
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} ({', '.join(cols)}) "
+            "ON COMMIT DELETE ROWS"
+        )
+
+    @classmethod
+    def _copy_lines(cls, emails: EmailBatch, columns: List[str]) -> Iterator[str]:
+        for seq in range(len(emails)):
+            row = cls._build_email_dict(None, emails, seq)
+            yield "\t".join([str(seq), *(cls._copy_value(row[c]) for c in columns)]) + "\n"
+
+    @staticmethod
+    def _copy_value(value) -> str:
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (list, tuple)):
+            items = (
+                "NULL" if v is None
+                else '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+                for v in value
+            )
+            value = "{" + ",".join(items) + "}"
+        return str(value).translate(_COPY_ESCAPES)
+
+
+class _CopyStream(io.TextIOBase):
+    """Arquivo somente leitura que produz as linhas do COPY à medida que o driver lê."""
+
+    def __init__(self, lines: Iterator[str]) -> None:
+        self._lines = lines
+        self._pending = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        parts = [self._pending]
+        length = len(self._pending)
+        for line in self._lines:
+            parts.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = "".join(parts)
+        if size < 0:
+            self._pending = ""
+            return data
+        self._pending = data[size:]
+        return data[:size]
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Set
+
+import structlog
+
+from config.settings import EMAIL_ACCOUNTS, LEASE_TTL_SEC, NODE_ID
+from ports.persistence import AccountLeaseRepositoryPort
+
+logger = structlog.get_logger(__name__)
+
+
+class AccountLeases:
+    """
+    Contas desta instância no modo WORK_DISTRIBUTION=leases.
+
+    A cada `ttl / 3` segundos (thread de fundo): heartbeat, renovação dos
+    leases e ajuste à cota justa `ceil(contas / instâncias vivas)` — assume
+    contas livres ou de instâncias caídas (lease vencido) até a cota e libera
+    o excedente quando outra instância entra. `owned()` é lido pelos
+    agendadores antes de cada execução e não toca no banco.
+
+    Cada execução de conta roda dentro de `running(account)`. Uma conta
+    excedente com execução em andamento não é liberada: sai de `owned()` (não
+    recebe nova execução), mas o lease segue renovado e só é devolvido na
+    primeira renovação depois que a execução termina.
+    """
+
+    def __init__(
+        self,
+        repo: AccountLeaseRepositoryPort,
+        accounts: Optional[List[str]] = None,
+        node_id: str = NODE_ID,
+        ttl: float = LEASE_TTL_SEC,
+    ) -> None:
+        self.repo = repo
+        self.accounts = list(dict.fromkeys(accounts if accounts is not None else EMAIL_ACCOUNTS))
+        self.node_id = node_id
+        self.ttl = ttl
+        self._owned: frozenset[str] = frozenset()
+        self._valid_until = 0.0  # monotonic; sem renovação até lá, os leases podem ter vencido
+        self._running: Set[str] = set()
+        self._draining: frozenset[str] = frozenset()  # excedentes à espera do fim da execução
+        self._lock = threading.Lock()  # `_running` e a decisão do que liberar
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def owned(self) -> List[str]:
+        """Contas desta instância, na ordem de EMAIL_ACCOUNTS (nenhuma se a renovação atrasou)."""
+        if time.monotonic() >= self._valid_until:
+            return []
+        owned = self._owned
+        return [a for a in self.accounts if a in owned]
+
+    @contextmanager
+    def running(self, account: str) -> Iterator[None]:
+        """Marca a execução da conta: enquanto durar, o lease não é liberado."""
+        with self._lock:
+            if account not in self._owned:
+                # Liberada entre a leitura de `owned()` pelo agendador e o início da execução
+                raise RuntimeError(f"conta {account} não pertence mais a {self.node_id}")
+            self._running.add(account)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running.discard(account)
+
+    def start(self) -> None:
+        """Primeira divisão (bloqueante) e a thread de renovação."""
+        self.refresh()
+        self._thread = threading.Thread(target=self._loop, name="account-leases", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Para a renovação e devolve as contas (outra instância assume sem esperar o TTL)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.ttl)
+        self.repo.release_leases(self.node_id)
+        self._owned = frozenset()
+
+    def refresh(self) -> None:
+        started = time.monotonic()
+        nodes = self.repo.heartbeat(self.node_id, self.ttl)
+        configured = set(self.accounts)
+        held = [a for a in dict.fromkeys(self.repo.renew_leases(self.node_id, self.ttl)) if a in configured]
+        share = math.ceil(len(self.accounts) / max(1, nodes))
+        with self._lock:
+            draining: List[str] = []
+            if len(held) > share:
+                # Contas em execução ficam na cota; as que sobrarem esperam a execução acabar
+                held.sort(key=lambda a: a not in self._running)
+                surplus = held[share:]
+                draining = [a for a in surplus if a in self._running]
+                released = [a for a in surplus if a not in self._running]
+                if released:
+                    self.repo.release_leases(self.node_id, released)
+                held = held[:share]
+            elif len(held) < share:
+                held += self.repo.claim_accounts(self.node_id, self.accounts, share - len(held), self.ttl)
+
+            owned = frozenset(held)
+            if owned != self._owned or frozenset(draining) != self._draining:
+                logger.info(
+                    "leases.changed", node=self.node_id, nodes=nodes, share=share,
+                    gained=sorted(owned - self._owned), lost=sorted(self._owned - owned),
+                    draining=sorted(draining),
+                )
+            self._owned = owned
+            self._draining = frozenset(draining)
+            self._valid_until = started + self.ttl
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.refresh()
+            except Exception:
+                # Sem renovar, os leases vencem e outra instância assume as contas
+                logger.warning("leases.refresh_failed", node=self.node_id, exc_info=True)
+
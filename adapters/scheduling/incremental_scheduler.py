@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import structlog
+
+from application.usecase.fetch_and_store_metrics import AccountRunResult, FetchAndStoreMetrics
+from config.settings import (
+    ACCOUNT_WORKERS,
+    EMAIL_ACCOUNTS,
+    SYNC_JITTER,
+    SYNC_MAX_INTERVAL_SEC,
+    SYNC_MIN_INTERVAL_SEC,
+)
+from ports.scheduler import SchedulerPort
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(order=True)
+class _Slot:
+    due: float
+    account: str = field(compare=False)
+    interval: float = field(compare=False)
+
+
+class IncrementalScheduler(SchedulerPort):
+    """
+    Sincroniza cada conta separadamente, em vez de todas de uma vez por dia.
+
+    - Cada conta tem o próprio intervalo, entre `min_interval` e `max_interval`:
+      cai pela metade quando a execução grava e-mails novos/alterados (caixa
+      ativa) e dobra quando nada mudou ou houve erro (caixa ociosa).
+    - O próximo horário leva ± `jitter` (fração do intervalo) e a primeira
+      rodada é espalhada ao longo de `min_interval`: as contas não disparam juntas.
+    - Uma conta só volta à fila quando a execução anterior termina (sem
+      sobreposição); no máximo `workers` contas rodam ao mesmo tempo.
+    - A manutenção (`prepare`: partições, ids das contas) roda a cada
+      `maintenance_interval`, esperando as contas em andamento terminarem.
+
+    Com `account_source` (ex.: `AccountLeases.owned`), o conjunto de contas
+    é relido a cada volta: contas novas entram na fila (espalhadas ao longo
+    de `min_interval`) e as que saíram não voltam para ela.
+
+    Com GRAPH_SYNC_MODE=delta, cada execução busca só as mudanças desde a anterior.
+    """
+
+    _MAX_WAIT = 30.0  # segundos entre verificações da fila
+
+    def __init__(
+        self,
+        job: FetchAndStoreMetrics,
+        accounts: Optional[List[str]] = None,
+        min_interval: float = SYNC_MIN_INTERVAL_SEC,
+        max_interval: float = SYNC_MAX_INTERVAL_SEC,
+        jitter: float = SYNC_JITTER,
+        workers: int = ACCOUNT_WORKERS,
+        maintenance_interval: float = 24 * 3600,
+        clock: Callable[[], float] = time.monotonic,
+        account_source: Optional[Callable[[], List[str]]] = None,
+    ) -> None:
+        self.job = job
+        self.accounts = list(dict.fromkeys(accounts if accounts is not None else EMAIL_ACCOUNTS))
+        self.account_source = account_source
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.jitter = jitter
+        self.workers = max(1, workers)
+        self.maintenance_interval = maintenance_interval
+        self._clock = clock
+        self._random = random.Random()
+        self._stop = threading.Event()
+
+    def start(self):
+        if not self.accounts and self.account_source is None:
+            logger.warning("scheduler.incremental.no_accounts")
+            return
+        logger.info(
+            "scheduler.incremental.start",
+            accounts=len(self.accounts), workers=self.workers,
+            min_interval=self.min_interval, max_interval=self.max_interval,
+        )
+        now = self._clock()
+        active = self._active_accounts()
+        queue = [
+            # Primeira rodada espalhada uniformemente ao longo do intervalo mínimo
+            _Slot(now + self.min_interval * i / max(1, len(active)), account, self.min_interval)
+            for i, account in enumerate(active)
+        ]
+        heapq.heapify(queue)
+        running: Dict[Future, _Slot] = {}
+        maintenance_due = now
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="account") as pool:
+            while not self._stop.is_set():
+                now = self._clock()
+                if now >= maintenance_due and not running:
+                    self.job.prepare(self.accounts)
+                    maintenance_due = now + self.maintenance_interval
+                active = self._active_accounts()
+                self._enqueue_new(queue, running, active, now)
+                active_set = set(active)
+                # Com manutenção pendente, nada novo começa até as contas em andamento terminarem
+                while queue and queue[0].due <= now and len(running) < self.workers and now < maintenance_due:
+                    slot = heapq.heappop(queue)
+                    if slot.account not in active_set:
+                        logger.info("scheduler.incremental.account_dropped", account=slot.account)
+                        continue
+                    running[pool.submit(self.job.run_account, slot.account)] = slot
+
+                # Sem vaga (ou com manutenção pendente), só o fim de uma conta muda algo:
+                # esperar pelo horário da próxima, já vencido, giraria o laço sem parar
+                can_start = len(running) < self.workers and now < maintenance_due
+                timeout = self._MAX_WAIT
+                if can_start and queue:
+                    timeout = min(self._MAX_WAIT, max(0.0, queue[0].due - now))
+                if not running:
+                    self._stop.wait(timeout)
+                    continue
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    heapq.heappush(queue, self._reschedule(running.pop(future), future))
+
+    def _active_accounts(self) -> List[str]:
+        return self.account_source() if self.account_source is not None else self.accounts
+
+    def _enqueue_new(
+        self, queue: List[_Slot], running: Dict[Future, _Slot], active: List[str], now: float
+    ) -> None:
+        known = {slot.account for slot in queue} | {slot.account for slot in running.values()}
+        for account in active:
+            if account not in known:
+                heapq.heappush(
+                    queue, _Slot(now + self._random.uniform(0, self.min_interval), account, self.min_interval)
+                )
+
+    def stop(self) -> None:
+        """Encerra o laço após as contas em andamento."""
+        self._stop.set()
+
+    def _reschedule(self, slot: _Slot, future: Future) -> _Slot:
+        try:
+            result: AccountRunResult = future.result()
+        except Exception:
+            # run_account já isola os erros; isto só cobre falhas inesperadas
+            logger.exception("scheduler.incremental.run_error", account=slot.account)
+            result = AccountRunResult()
+        if result.ok and result.changed:
+            interval = max(self.min_interval, slot.interval / 2)
+        else:
+            interval = min(self.max_interval, slot.interval * 2)
+        delay = interval * (1 + self._random.uniform(-self.jitter, self.jitter))
+        logger.info(
+            "scheduler.incremental.next",
+            account=slot.account, ok=result.ok, changed=result.changed,
+            interval=round(interval, 1), next_in=round(delay, 1),
+        )
+        return _Slot(self._clock() + delay, slot.account, interval)
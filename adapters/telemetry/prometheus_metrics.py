@@ -0,0 +1,112 @@
+"""
+Métricas Prometheus do processo, expostas em `/metrics` na porta METRICS_PORT.
+
+Os adaptadores (Graph, repositório) registram direto nas métricas deste
+módulo; o caso de uso fala com `PrometheusTelemetry` pela `TelemetryPort`.
+Rótulos têm cardinalidade baixa: tipo de endpoint (sem ids nem query),
+status HTTP e conta monitorada.
+"""
+from __future__ import annotations
+
+import time
+from urllib.parse import urlsplit
+
+import structlog
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from ports.telemetry import TelemetryPort
+
+logger = structlog.get_logger(__name__)
+
+_NS = "email_metrics"
+
+GRAPH_REQUEST_SECONDS = Histogram(
+    "graph_request_duration_seconds", "Latência das requisições ao Graph (cada tentativa).",
+    ["endpoint"], namespace=_NS,
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+GRAPH_REQUESTS = Counter(
+    "graph_requests_total", "Respostas do Graph por endpoint e status HTTP.",
+    ["endpoint", "status"], namespace=_NS,
+)
+GRAPH_THROTTLED = Counter(
+    "graph_throttled_total", "Respostas 429/503 (inclui sub-respostas do $batch).",
+    ["endpoint"], namespace=_NS,
+)
+GRAPH_RETRIES = Counter(
+    "graph_retries_total", "Requisições reenviadas após throttling ou falha transitória.",
+    ["endpoint"], namespace=_NS,
+)
+GRAPH_PAGES = Counter(
+    "graph_pages_total", "Páginas lidas em listagens paginadas.",
+    ["endpoint"], namespace=_NS,
+)
+CONVERSATION_LOOKUPS = Counter(
+    "graph_conversation_lookups_total", "Conversas consultadas no Graph para reply/bounce.",
+    namespace=_NS,
+)
+UPSERT_SECONDS = Histogram(
+    "db_upsert_duration_seconds", "Duração de cada lote gravado em `save_all`.",
+    ["mode"], namespace=_NS,
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+UPSERT_ROWS = Counter(
+    "db_upsert_rows_total", "Linhas de e-mail por resultado do UPSERT.",
+    ["outcome"], namespace=_NS,
+)
+ACCOUNT_RUN_SECONDS = Gauge(
+    "account_run_duration_seconds", "Duração da última execução da conta.",
+    ["account"], namespace=_NS,
+)
+ACCOUNT_RUNS = Counter(
+    "account_runs_total", "Execuções por conta e resultado (ok/error).",
+    ["account", "result"], namespace=_NS,
+)
+ACCOUNT_LAST_SUCCESS = Gauge(
+    "account_last_success_timestamp_seconds", "Unix time do fim da última execução sem erro.",
+    ["account"], namespace=_NS,
+)
+
+
+def graph_endpoint(url: str) -> str:
+    """Rótulo do endpoint Graph a partir da URL (ids e query ficam de fora)."""
+    path = urlsplit(url).path
+    if path.endswith("/$batch"):
+        return "batch"
+    if path.endswith("/messages/delta"):
+        return "message_delta"
+    if path.endswith("/mailFolders"):
+        return "mail_folders"
+    if "/mailFolders/" in path and path.endswith("/messages"):
+        return "folder_messages"
+    if path.endswith("/$value"):
+        return "message_mime"
+    if path.endswith("/messages"):
+        return "conversation_head"
+    if "/messages/" in path:
+        return "message_detail"
+    return "other"
+
+
+def observe_graph_response(endpoint: str, status: int, seconds: float) -> None:
+    GRAPH_REQUEST_SECONDS.labels(endpoint).observe(seconds)
+    GRAPH_REQUESTS.labels(endpoint, str(status)).inc()
+    if status in (429, 503):
+        GRAPH_THROTTLED.labels(endpoint).inc()
+
+
+class PrometheusTelemetry(TelemetryPort):
+    def account_run(self, account_email: str, seconds: float, ok: bool) -> None:
+        ACCOUNT_RUN_SECONDS.labels(account_email).set(seconds)
+        ACCOUNT_RUNS.labels(account_email, "ok" if ok else "error").inc()
+        if ok:
+            ACCOUNT_LAST_SUCCESS.labels(account_email).set(time.time())
+
+
+def start_metrics_server(port: int) -> None:
+    """Sobe o endpoint `/metrics` numa thread daemon; porta 0 desliga."""
+    if not port:
+        logger.info("metrics_server.disabled")
+        return
+    start_http_server(port)
+    logger.info("metrics_server.started", port=port)
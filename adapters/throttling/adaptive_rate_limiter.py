@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+import structlog
+
+from config.settings import (
+    RATE_LIMIT_MAILBOX_RPS,
+    RATE_LIMIT_MAX_FACTOR,
+    RATE_LIMIT_MIN_RPS,
+    RATE_LIMIT_TENANT_RPS,
+    TENANT_ID,
+)
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(slots=True)
+class _Bucket:
+    rate: float            # tokens/s atual (ajustado por AIMD)
+    max_rate: float
+    tokens: float
+    updated_at: float
+    blocked_until: float = 0.0
+    last_decrease_at: float = float("-inf")
+    throttles: int = 0
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket por chave (caixa postal e tenant), compartilhado entre threads.
+
+    - `reserve` consome um token de cada chave e devolve quanto o chamador deve
+      esperar; o saldo pode ficar negativo, o que enfileira as próximas reservas.
+    - Sucesso aumenta a taxa de forma aditiva; 429/503 reduz de forma
+      multiplicativa (no máximo uma vez por `decrease_cooldown`) e bloqueia a
+      chave mais específica até o fim do `Retry-After`.
+    - `rates()` expõe a taxa corrente de cada chave.
+
+    Chaves começando com `tenant:` usam a taxa inicial de tenant; as demais,
+    a de caixa postal. Use `keys_for` para montá-las.
+    """
+
+    def __init__(
+        self,
+        mailbox_rate: float = RATE_LIMIT_MAILBOX_RPS,
+        tenant_rate: float = RATE_LIMIT_TENANT_RPS,
+        min_rate: float = RATE_LIMIT_MIN_RPS,
+        max_factor: float = RATE_LIMIT_MAX_FACTOR,
+        increase_step: float = 0.05,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.mailbox_rate = mailbox_rate
+        self.tenant_rate = tenant_rate
+        self.min_rate = min_rate
+        self.max_factor = max_factor
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self._clock = clock
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    #  API pública                                                       #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def keys_for(service: str, mailbox: Optional[str] = None) -> tuple[str, ...]:
+        """Chaves do bucket da caixa postal (se houver) e do tenant para um serviço."""
+        tenant_key = f"tenant:{service}:{TENANT_ID}"
+        if mailbox:
+            return (f"mailbox:{service}:{mailbox.lower()}", tenant_key)
+        return (tenant_key,)
+
+    def reserve(
+        self, keys: Sequence[str], cost: float = 1.0, tenant_cost: Optional[float] = None
+    ) -> float:
+        """
+        Reserva `cost` tokens em todas as chaves (`tenant_cost`, se informado,
+        nas chaves de tenant); retorna a espera em segundos.
+        """
+        with self._lock:
+            now = self._clock()
+            wait = 0.0
+            for key in keys:
+                bucket = self._refill(key, now)
+                if tenant_cost is not None and key.startswith("tenant:"):
+                    bucket.tokens -= tenant_cost
+                else:
+                    bucket.tokens -= cost
+                debt_wait = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+                wait = max(wait, debt_wait, bucket.blocked_until - now)
+            return wait
+
+    def acquire(
+        self, keys: Sequence[str], cost: float = 1.0, tenant_cost: Optional[float] = None
+    ) -> None:
+        """Versão bloqueante de `reserve`."""
+        wait = self.reserve(keys, cost, tenant_cost)
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            for key in keys:
+                bucket = self._bucket(key)
+                bucket.rate = min(bucket.max_rate, bucket.rate + self.increase_step)
+
+    def on_throttle(self, keys: Sequence[str], retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            now = self._clock()
+            for i, key in enumerate(keys):
+                bucket = self._refill(key, now)
+                bucket.throttles += 1
+                if now - bucket.last_decrease_at >= self.decrease_cooldown:
+                    bucket.rate = max(self.min_rate, bucket.rate * self.decrease_factor)
+                    bucket.last_decrease_at = now
+                bucket.tokens = min(bucket.tokens, 0.0)
+                # O Retry-After vale para a chave mais específica (a caixa postal)
+                if i == 0 and retry_after:
+                    bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+            logger.warning(
+                "rate_limiter.throttled",
+                keys=list(keys),
+                retry_after=retry_after,
+                rates={k: round(self._buckets[k].rate, 3) for k in keys},
+            )
+
+    def rates(self) -> Dict[str, dict]:
+        """Snapshot das taxas correntes por chave."""
+        with self._lock:
+            now = self._clock()
+            return {
+                key: {
+                    "rate": round(b.rate, 3),
+                    "max_rate": b.max_rate,
+                    "tokens": round(b.tokens, 3),
+                    "blocked_for": round(max(0.0, b.blocked_until - now), 3),
+                    "throttles": b.throttles,
+                }
+                for key, b in self._buckets.items()
+            }
+
+    # ------------------------------------------------------------------ #
+    #  Helpers                                                           #
+    # ------------------------------------------------------------------ #
+    def _bucket(self, key: str) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate = self.tenant_rate if key.startswith("tenant:") else self.mailbox_rate
+            bucket = _Bucket(
+                rate=rate,
+                max_rate=rate * self.max_factor,
+                tokens=rate,  # permite uma rajada de ~1s na primeira chamada
+                updated_at=self._clock(),
+            )
+            self._buckets[key] = bucket
+        return bucket
+
+    def _refill(self, key: str, now: float) -> _Bucket:
+        bucket = self._bucket(key)
+        elapsed = now - bucket.updated_at
+        if elapsed > 0:
+            bucket.tokens = min(bucket.rate, bucket.tokens + elapsed * bucket.rate)
+            bucket.updated_at = now
+        return bucket
+
+
+RATE_LIMITER = AdaptiveRateLimiter()
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class MimeHeadersDTO:
+    """Sinais de entrega extraídos dos cabeçalhos MIME de uma mensagem."""
+    from_ip: Optional[str] = None
+    to_ip: Optional[str] = None
+    scl: Optional[int] = None
+    dkim_pass: Optional[bool] = None
+    spf_pass: Optional[bool] = None
+    dmarc_pass: Optional[bool] = None
+    delivery_latency_sec: Optional[float] = None
@@ -0,0 +1,15 @@
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from application.dto.email_dto import EmailDTO
+
+@dataclass
+class MessagePageDTO:
+    emails: List[EmailDTO]
+    removed_ids: List[str] = field(default_factory=list)
+    next_link: Optional[str] = None
+    delta_link: Optional[str] = None
+    full_resync: bool = False
+    size_bytes: int = 0            # tamanho da resposta HTTP da página
+    window_reached: bool = False   # a página cruzou o início da janela de look-back
@@ -1,10 +1,28 @@
 import argparse
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional
 from adapters.graph.graph_api_client import GraphApiClient
+from ports.graph_client import GraphClientPort
 from adapters.repository.sql_email_repository import PgEmailRepository
+from adapters.scheduling.account_leases import AccountLeases
 from adapters.scheduling.cron_scheduler import CronScheduler
-from application.usecase.fetch_and_store_metrics import FetchAndStoreMetrics
+from adapters.scheduling.incremental_scheduler import IncrementalScheduler
+from application.usecase.enrich_delivery_signals import EnrichDeliverySignals
+from application.usecase.fetch_and_store_metrics import AccountRunResult, FetchAndStoreMetrics
 from domain.service.email_metrics_service import EmailMetricsService
-from config.settings import DB_URL
+from adapters.telemetry.prometheus_metrics import PrometheusTelemetry, start_metrics_server
+from config.profiling import PROFILER
+from config.settings import (
+    DB_URL,
+    ENRICH_AFTER_RUN,
+    GRAPH_CLIENT_MODE,
+    GRAPH_SYNC_MODE,
+    LOOKBACK_DAYS,
+    METRICS_PORT,
+    SCHEDULER_MODE,
+    WORK_DISTRIBUTION,
+)
 from config.logging import configure_logging
 
 configure_logging() 
@@ -12,23 +30,92 @@ configure_logging()
 import structlog  # noqa: E402
 logger = structlog.get_logger(__name__)
 
+def make_graph_client() -> GraphClientPort:
+    """Seleciona o adaptador Graph conforme `GRAPH_CLIENT_MODE`."""
+    if GRAPH_CLIENT_MODE == "async":
+        from adapters.graph.async_graph_api_client import AsyncGraphApiClient
+        return AsyncGraphApiClient()
+    return GraphApiClient()
+
+class ProfiledJob:
+    """Cada `execute` do caso de uso vira uma execução perfilada (um trace por execução)."""
+
+    def __init__(self, job: FetchAndStoreMetrics, directory: str, cpu: bool, memory: bool) -> None:
+        self.job = job
+        self.directory = directory
+        self.cpu = cpu
+        self.memory = memory
+
+    def execute(self):
+        with PROFILER.run(self.directory, cpu=self.cpu, memory=self.memory):
+            return self.job.execute()
+
+class EnrichAfterRun:
+    """
+    Depois de cada `execute` (ou `run_account`, no agendador incremental),
+    dispara o enriquecimento de entrega numa thread própria: a coleta não
+    espera por ele. Se o anterior (da mesma conta) ainda roda, não dispara outro.
+    """
+
+    def __init__(self, job, enrich: EnrichDeliverySignals) -> None:
+        self.job = job
+        self.enrich = enrich
+        self._threads: Dict[Optional[str], threading.Thread] = {}  # None = todas as contas
+        self._lock = threading.Lock()
+
+    def execute(self):
+        try:
+            return self.job.execute()
+        finally:
+            self._start_enrichment(None, self.enrich.execute)
+
+    def run_account(self, account: str) -> AccountRunResult:
+        result = self.job.run_account(account)
+        if result.changed:
+            self._start_enrichment(account, lambda: self.enrich.run_account(account))
+        return result
+
+    def prepare(self, accounts: List[str]) -> None:
+        self.job.prepare(accounts)
+
+    def wait(self) -> None:
+        for thread in list(self._threads.values()):
+            thread.join()
+
+    def _start_enrichment(self, account: Optional[str], target: Callable[[], object]) -> None:
+        with self._lock:
+            thread = self._threads.get(account)
+            if thread is not None and thread.is_alive():
+                logger.info("enrich.skip", reason="still_running", account=account)
+                return
+            thread = threading.Thread(target=target, name="enrich", daemon=True)
+            self._threads[account] = thread
+            thread.start()
+
+def make_enrich_job(graph_client: GraphClientPort, repo: PgEmailRepository) -> EnrichDeliverySignals:
+    return EnrichDeliverySignals(graph_client=graph_client, signal_repo=repo)
+
 def make_job() -> FetchAndStoreMetrics:
     """
     Constrói o objeto do caso de uso com todas as suas dependências.
     """
     logger.info("boot.make_job")
     
-    graph_client = GraphApiClient()
+    graph_client = make_graph_client()
     email_repo = PgEmailRepository(DB_URL)
     metrics_repo = email_repo 
     
-    metrics_service = EmailMetricsService(graph_client)
+    metrics_service = EmailMetricsService(graph_client, state_repo=email_repo)
     
     use_case = FetchAndStoreMetrics(
         graph_client=graph_client,
         email_repo=email_repo,
         metrics_repo=metrics_repo,
-        metrics_service=metrics_service
+        metrics_service=metrics_service,
+        sync_state_repo=email_repo,
+        unit_of_work=email_repo,
+        telemetry=PrometheusTelemetry(),
+        checkpoint_repo=email_repo,
     )
     return use_case
 
@@ -39,14 +126,115 @@ if __name__ == "__main__":
         action="store_true",
         help="Executa apenas uma vez e sai (sem scheduler)."
     )
+    parser.add_argument(
+        "--maintain-partitions",
+        action="store_true",
+        help="Converte `emails` para particionada (se preciso), cria/desanexa partições e sai."
+    )
+    parser.add_argument(
+        "--rebuild-rollups",
+        nargs=2,
+        metavar=("INICIO", "FIM"),
+        type=date.fromisoformat,
+        help="Reagrega email_daily_rollups entre as datas (AAAA-MM-DD, inclusive) e sai."
+    )
+    parser.add_argument(
+        "--backfill-rollups",
+        action="store_true",
+        help="Reagrega email_daily_rollups de todo o histórico de `emails` (carga inicial) e sai."
+    )
+    parser.add_argument(
+        "--enrich",
+        action="store_true",
+        help="Só o enriquecimento de entrega (cabeçalhos MIME dos e-mails já gravados) e sai."
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profiles",
+        metavar="DIR",
+        help="Grava um trace por execução (Chrome trace JSON) em DIR (padrão: profiles)."
+    )
+    parser.add_argument(
+        "--profile-cpu",
+        action="store_true",
+        help="Com --profile, também grava o cProfile das contas (.prof)."
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Com --profile, liga o tracemalloc (pico por conta no trace e snapshot .tracemalloc)."
+    )
+    parser.add_argument(
+        "--account",
+        help="Com --rebuild-rollups/--backfill-rollups, limita a reagregação a uma conta."
+    )
     args = parser.parse_args()
+    incremental = SCHEDULER_MODE == "incremental" and not args.once
+    if incremental and args.profile:
+        # O trace cobre uma execução inteira; contas concorrentes do agendador não cabem nele
+        parser.error("--profile exige --once ou SCHEDULER_MODE=daily")
+
+    if args.rebuild_rollups:
+        start, end = args.rebuild_rollups
+        logger.info("main.run_mode.rebuild_rollups", start=start.isoformat(), end=end.isoformat())
+        PgEmailRepository(DB_URL).rebuild_rollups(start, end, args.account)
+        raise SystemExit(0)
+
+    if args.backfill_rollups:
+        logger.info("main.run_mode.backfill_rollups", account=args.account)
+        PgEmailRepository(DB_URL).backfill_rollups(args.account)
+        raise SystemExit(0)
+
+    if args.maintain_partitions:
+        logger.info("main.run_mode.maintain_partitions")
+        repo = PgEmailRepository(DB_URL)
+        repo.migrate_partitions()
+        repo.maintain_partitions()
+        raise SystemExit(0)
+
+    if args.enrich:
+        logger.info("main.run_mode.enrich")
+        make_enrich_job(make_graph_client(), PgEmailRepository(DB_URL)).execute()
+        raise SystemExit(0)
+
+    if incremental and GRAPH_SYNC_MODE != "delta" and not LOOKBACK_DAYS:
+        # Cada execução curta releria a pasta Enviados inteira e gravaria mais uma linha de métricas
+        logger.error("main.incremental.full_sync_refused", graph_sync_mode=GRAPH_SYNC_MODE)
+        raise SystemExit("SCHEDULER_MODE=incremental exige GRAPH_SYNC_MODE=delta ou LOOKBACK_DAYS > 0")
 
-    job = make_job()
+    start_metrics_server(METRICS_PORT)
+    use_case = make_job()
+    leases = None
+    if WORK_DISTRIBUTION == "leases":
+        # Cada instância processa só as contas cujo lease detém (ver account_leases)
+        leases = AccountLeases(use_case.email_repo)
+        leases.start()
+        use_case.accounts = leases.owned
+        use_case.account_guard = leases.running
+        logger.info("main.work_distribution.leases", node=leases.node_id, accounts=leases.owned())
+    job = use_case
+    if args.profile:
+        logger.info("main.profile", directory=args.profile, cpu=args.profile_cpu, memory=args.profile_memory)
+        job = ProfiledJob(job, args.profile, args.profile_cpu, args.profile_memory)
+    if ENRICH_AFTER_RUN:
+        job = EnrichAfterRun(job, make_enrich_job(use_case.graph_client, use_case.email_repo))
 
-    if args.once:
-        logger.info("main.run_mode.once")
-        job.execute()
-    else:
-        logger.info("main.run_mode.scheduler")
-        scheduler = CronScheduler(job)
-        scheduler.start()
\ No newline at end of file
+    try:
+        if args.once:
+            logger.info("main.run_mode.once")
+            job.execute()
+            if isinstance(job, EnrichAfterRun):
+                job.wait()
+        elif incremental:
+            # Execuções por conta: o enriquecimento (se ligado) roda após cada conta com mudanças
+            logger.info("main.run_mode.scheduler", mode=SCHEDULER_MODE)
+            IncrementalScheduler(job, account_source=use_case.accounts).start()
+        else:
+            logger.info("main.run_mode.scheduler", mode=SCHEDULER_MODE)
+            scheduler = CronScheduler(job)
+            scheduler.start()
+    finally:
+        if leases is not None:
+            # Devolve as contas: as outras instâncias assumem sem esperar o lease vencer
+            leases.stop()
\ No newline at end of file
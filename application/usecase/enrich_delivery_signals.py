@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import time
+import structlog
+from datetime import datetime, timezone
+from typing import Dict, List, Set
+
+from application.dto.mime_headers_dto import MimeHeadersDTO
+from config.settings import EMAIL_ACCOUNTS, ENRICH_BATCH_SIZE, MAX_MIME_WORKERS, MIME_TIMEOUT_SEC
+from domain.model.delivery_signals import DeliverySignals
+from ports.graph_client import GraphClientPort
+from ports.persistence import DeliverySignalRepositoryPort
+
+logger = structlog.get_logger(__name__).bind(use_case="enrich_delivery_signals")
+
+
+class EnrichDeliverySignals:
+    """
+    Etapa opcional, separada de `FetchAndStoreMetrics`: para os e-mails já
+    gravados que ainda não têm sinais de entrega, lê só os cabeçalhos MIME
+    (até `max_workers` em paralelo, `timeout` segundos por mensagem) e grava
+    SCL, DKIM/SPF/DMARC, IPs e latência por `internet_message_id`.
+    Uma mensagem já enriquecida não volta a ser buscada.
+    """
+
+    def __init__(
+        self,
+        graph_client: GraphClientPort,
+        signal_repo: DeliverySignalRepositoryPort,
+        max_workers: int = MAX_MIME_WORKERS,
+        timeout: float = MIME_TIMEOUT_SEC,
+        batch_size: int = ENRICH_BATCH_SIZE,
+    ) -> None:
+        self.graph_client = graph_client
+        self.signal_repo = signal_repo
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.batch_size = batch_size
+
+    def execute(self) -> int:
+        """Enriquece todas as contas de `EMAIL_ACCOUNTS`; retorna quantas mensagens foram gravadas."""
+        return sum(self._enrich_account(account) for account in EMAIL_ACCOUNTS)
+
+    def run_account(self, account: str) -> int:
+        """Enriquece uma única conta (agendador incremental)."""
+        return self._enrich_account(account)
+
+    def _enrich_account(self, account: str) -> int:
+        """Lote a lote até não restar pendente; erros ficam isolados na conta."""
+        log = logger.new(account=account)
+        start = time.perf_counter()
+        saved = 0
+        failed: Set[str] = set()  # não voltam a ser buscadas nesta execução
+        try:
+            while True:
+                pending = self.signal_repo.pending_delivery_signals(account, self.batch_size + len(failed))
+                pending = {mid: imid for mid, imid in pending.items() if mid not in failed}
+                if not pending:
+                    break
+                heads = self.graph_client.analyze_message_headers(
+                    account, pending, self.max_workers, self.timeout
+                )
+                failed.update(mid for mid in pending if mid not in heads)
+                saved += self.signal_repo.save_delivery_signals(account, self._to_domain(pending, heads))
+        except Exception:
+            log.exception("enrich.error", saved=saved)
+        log.info("enrich.finish", saved=saved, failed=len(failed), elapsed=round(time.perf_counter() - start, 3))
+        return saved
+
+    @staticmethod
+    def _to_domain(pending: Dict[str, str], heads: Dict[str, MimeHeadersDTO]) -> List[DeliverySignals]:
+        now = datetime.now(timezone.utc)
+        return [
+            DeliverySignals(
+                internet_message_id=pending[message_id],
+                scl=dto.scl,
+                dkim_pass=dto.dkim_pass,
+                spf_pass=dto.spf_pass,
+                dmarc_pass=dto.dmarc_pass,
+                from_ip=dto.from_ip,
+                to_ip=dto.to_ip,
+                delivery_latency_sec=dto.delivery_latency_sec,
+                analyzed_at=now,
+            )
+            for message_id, dto in heads.items()
+        ]
@@ -1,29 +1,89 @@
 from __future__ import annotations
 
+import math
+import time
 import structlog
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, ContextManager, Iterator, List, Optional, Tuple
 
 from application.dto.email_dto import EmailDTO
 from application.dto.folder_dto import FolderDTO
+from application.dto.page_dto import MessagePageDTO
+from config.profiling import PROFILER
 from config.settings import (
+    ACCOUNT_WORKERS,
+    CHECKPOINT_MAX_AGE_HOURS,
     EMAIL_ACCOUNTS,
-    IGNORED_RECIPIENT_PATTERNS,
+    GRAPH_SYNC_MODE,
+    LOOKBACK_DAYS,
+    OPEN_CONVERSATION_RECHECK_DAYS,
+    OPEN_CONVERSATION_RECHECK_INTERVAL_SEC,
+    OPEN_CONVERSATION_RECHECK_LIMIT,
+    PIPELINE_CHUNK_SIZE,
+    PIPELINE_MODE,
+    RESUMABLE_RUNS,
     SENT_FOLDER_NAME,
-    SUBJECT_FILTER,
 )
-from domain.model.email import Email
+from domain.model.email_batch import EmailBatch
 from domain.model.metrics import EmailMetrics
-from domain.service.email_metrics_service import EmailMetricsService
+from domain.model.sync_checkpoint import SyncCheckpoint
+from domain.service.email_metrics_service import DailyMetricsAccumulator, EmailMetricsService
+from domain.service.filter_rules import FILTER_RULES
 from ports.graph_client import GraphClientPort
-from ports.persistence import EmailRepositoryPort, MetricsRepositoryPort
+from ports.persistence import (
+    CheckpointRepositoryPort,
+    EmailRepositoryPort,
+    MetricsRepositoryPort,
+    SyncStateRepositoryPort,
+    UnitOfWorkPort,
+    UnitOfWorkStats,
+    UpsertStats,
+)
+from ports.telemetry import TelemetryPort
 
 logger = structlog.get_logger(__name__).bind(use_case="fetch_and_store_metrics")
 
 
+@dataclass
+class _SyncProgress:
+    """O que a leitura das páginas deixa para o final da execução da conta."""
+    delta_link: Optional[str] = None
+    next_link: Optional[str] = None  # página seguinte à última lida (None: acabou)
+    full_resync: bool = False
+    pages: int = 0
+    messages: int = 0          # mensagens recebidas do Graph, antes dos filtros
+    bytes: int = 0
+    window_reached: bool = False
+    incremental: bool = False  # delta a partir de um deltaLink (só mudanças)
+    removed: set[str] = field(default_factory=set)  # ids apagados/movidos da pasta (delta)
+
+
+@dataclass
+class AccountRunResult:
+    """Resultado da execução de uma conta (usado pelo agendador incremental)."""
+    metrics: Optional[EmailMetrics] = None
+    changed: int = 0   # e-mails novos, alterados ou removidos nesta execução
+    ok: bool = False
+
+
 class FetchAndStoreMetrics:
     """
     Executa coleta + persistência para todas as contas listadas
-    em `EMAIL_ACCOUNTS`.
+    em `EMAIL_ACCOUNTS` (ou as devolvidas por `accounts`), com até
+    `ACCOUNT_WORKERS` contas em paralelo.
+    O cliente Graph e o repositório são compartilhados entre as threads.
+    Com `unit_of_work`, tudo o que uma conta grava (e-mails, métricas,
+    deltaLink, estado das conversas) é confirmado em uma única transação.
+
+    Com RESUMABLE_RUNS (modo `stream`, sincronização completa) e
+    `checkpoint_repo`, cada lote é confirmado na própria transação junto com
+    um checkpoint (próxima página e e-mail mais antigo gravado). Uma execução
+    que cair no meio é retomada pela próxima: o acumulador é refeito com os
+    e-mails já gravados e a paginação continua do nextLink salvo. O checkpoint
+    é apagado na transação final (métricas).
     """
 
     def __init__(
@@ -32,79 +92,399 @@ class FetchAndStoreMetrics:
         email_repo: EmailRepositoryPort,
         metrics_repo: MetricsRepositoryPort,
         metrics_service: EmailMetricsService,
+        sync_state_repo: Optional[SyncStateRepositoryPort] = None,
+        unit_of_work: Optional[UnitOfWorkPort] = None,
+        telemetry: Optional[TelemetryPort] = None,
+        accounts: Optional[Callable[[], List[str]]] = None,
+        checkpoint_repo: Optional[CheckpointRepositoryPort] = None,
+        account_guard: Optional[Callable[[str], ContextManager[None]]] = None,
     ) -> None:
         self.graph_client = graph_client
         self.email_repo = email_repo
         self.metrics_repo = metrics_repo
         self.metrics_service = metrics_service
+        self.sync_state_repo = sync_state_repo
+        self.unit_of_work = unit_of_work
+        self.telemetry = telemetry or TelemetryPort()
+        self.checkpoint_repo = checkpoint_repo
+        # O nextLink só serve para retomar a listagem da pasta (o delta tem estado próprio)
+        full_sync = GRAPH_SYNC_MODE != "delta" or sync_state_repo is None
+        self.resumable = (
+            RESUMABLE_RUNS and PIPELINE_MODE == "stream" and full_sync and checkpoint_repo is not None
+        )
+        # Contas desta instância a cada execução (com leases, só a parte dela)
+        self.accounts = accounts or (lambda: list(EMAIL_ACCOUNTS))
+        # Envolve cada execução de conta (com leases, impede liberar a conta no meio dela)
+        self.account_guard = account_guard or (lambda account: nullcontext())
 
     # ------------------------------------------------------------------ #
     #  API pública                                                       #
     # ------------------------------------------------------------------ #
     def execute(self) -> List[EmailMetrics]:
-        all_metrics: list[EmailMetrics] = []
-
-        for account in EMAIL_ACCOUNTS:
-            log = logger.new(account=account)
-            log.info("start")
-
-            try:
-                # 1️⃣  Pasta “Itens Enviados”
-                folders = self.graph_client.fetch_mail_folders(account)
-                sent_folder = self._find_sent_folder(folders)
-                if not sent_folder:
-                    log.warning("sent_folder.not_found")
-                    continue
-
-                # 2️⃣  Mensagens enviadas
-                raw_dto = self.graph_client.fetch_messages_in_folder(
-                    account, sent_folder.id
-                )
+        accounts = self.accounts()
+        workers = min(ACCOUNT_WORKERS, len(accounts))
+        self.prepare(accounts)
 
-                subj_filtered = [
-                    d
-                    for d in raw_dto
-                    if any(expr.lower() in (d.subject or "").lower() for expr in SUBJECT_FILTER)
-                ]
-                
-                test_pattern = "oportunidade de acordo: - parte:"
-                prod_dto = [
-                    d for d in subj_filtered
-                    if test_pattern not in (d.subject or "").lower()
-                ]
-
-                def _ignored(dto: EmailDTO) -> bool:
-                    recip = " ".join(dto.to_addresses).lower()
-                    return any(p in recip for p in IGNORED_RECIPIENT_PATTERNS)
-
-                filtered_dto = [d for d in prod_dto if not _ignored(d)]
-                emails = [self._to_domain(dto) for dto in filtered_dto]
-
-                # 3️⃣  Métricas (também marca flags nos objetos)
-                metrics = self.metrics_service.calculate_daily_metrics(emails, account)
-
-                # 4️⃣  UPSERT e-mails
-                if emails:
-                    self.email_repo.save_all(account, emails)
-                    log.info("emails.persisted", total=len(emails))
-
-                # 5️⃣  INSERT métricas
-                self.metrics_repo.save(metrics, account)
-                log.info("metrics.persisted", **metrics.to_dict())
+        if workers <= 1:
+            results = [self._process_account(account) for account in accounts]
+        else:
+            logger.info("execute.concurrent", accounts=len(accounts), workers=workers)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="account") as pool:
+                # `map` devolve na ordem de EMAIL_ACCOUNTS, independente de quem termina antes
+                results = list(pool.map(self._process_account, accounts))
+
+        return [metrics for metrics in results if metrics is not None]
+
+    def prepare(self, accounts: List[str]) -> None:
+        """
+        Manutenção antes de processar contas: partições e ids das contas.
+        Deve rodar sem nenhuma conta em andamento (a DDL de partição disputaria
+        o lock com as transações abertas).
+        """
+        try:
+            self.email_repo.maintain_partitions()
+        except Exception:
+            logger.warning("execute.maintain_partitions.error", exc_info=True)
+        try:
+            # Ids de todas as contas de uma vez, antes das threads
+            self.email_repo.preload_accounts(accounts)
+        except Exception:
+            logger.warning("execute.preload_accounts.error", exc_info=True)
+
+    def run_account(self, account: str) -> AccountRunResult:
+        """Processa uma conta; erros ficam isolados (`ok=False`)."""
+        log = logger.new(account=account)
+        log.info("start")
+
+        result = AccountRunResult()
+        stats = UnitOfWorkStats()
+        start = time.perf_counter()
+        try:
+            # Com checkpoints, cada lote tem a própria transação (ver `_sync_account`)
+            uow = nullcontext() if self.resumable else self._transaction(stats)
+            with self.account_guard(account), PROFILER.account(account), uow:
+                result.metrics, result.changed = self._sync_account(account, log, stats)
+            result.ok = True
 
-                all_metrics.append(metrics)
+        except Exception:
+            log.exception("execute.error")
 
-            except Exception:
-                log.exception("execute.error")
+        finally:
+            self.telemetry.account_run(account, time.perf_counter() - start, result.ok)
+            log.info("finish", db_round_trips=stats.round_trips)
+        return result
 
-            finally:
-                log.info("finish")
+    def _process_account(self, account: str) -> Optional[EmailMetrics]:
+        return self.run_account(account).metrics
 
-        return all_metrics
+    def _sync_account(
+        self, account: str, log, stats: UnitOfWorkStats
+    ) -> Tuple[Optional[EmailMetrics], int]:
+        # 1️⃣  Pasta “Itens Enviados”
+        with PROFILER.span("graph.mail_folders"):
+            folders = self.graph_client.fetch_mail_folders(account)
+        sent_folder = self._find_sent_folder(folders)
+        if not sent_folder:
+            log.warning("sent_folder.not_found")
+            return None, 0
+
+        # Sem checkpoints, tudo já roda na transação da conta (`run_account`)
+        tx = (lambda: self._transaction(stats)) if self.resumable else nullcontext
+        acc = self.metrics_service.accumulator(account)
+        upserts = UpsertStats()
+        checkpoint: Optional[SyncCheckpoint] = None
+        at_boundary: set[str] = set()
+        if self.resumable:
+            with tx():
+                checkpoint = self._load_checkpoint(account, sent_folder.id, log)
+            if checkpoint is not None:
+                upserts, at_boundary = self._resume(account, checkpoint, acc, tx, log)
+            else:
+                checkpoint = SyncCheckpoint(folder_id=sent_folder.id, window_start=self._window_start())
+
+        # 2️⃣  Mensagens enviadas, página a página (janela/pasta inteira ou apenas o delta)
+        progress = _SyncProgress()
+        since = checkpoint.window_start if checkpoint is not None else self._window_start()
+        if checkpoint is not None and checkpoint.chunks and checkpoint.next_link is None:
+            pages: Iterator[MessagePageDTO] = iter(())  # todas as páginas já estavam gravadas
+        else:
+            start_link, boundary = (
+                (checkpoint.next_link, checkpoint.boundary) if checkpoint is not None else (None, None)
+            )
+            pages = self._iter_sent_pages(
+                account, sent_folder.id, since, progress, log, start_link, boundary, at_boundary
+            )
+
+        # 3️⃣  Métricas incrementais (também marcam flags) + 4️⃣ UPSERT por lote
+        for chunk in self._iter_chunks(pages):
+            with tx():
+                with PROFILER.span("metrics.add", emails=len(chunk)):
+                    to_save = acc.add(chunk)
+                if to_save:
+                    with PROFILER.span("db.save_all", emails=len(to_save)):
+                        upserts += self.email_repo.save_all(account, to_save)
+                if checkpoint is not None:
+                    self._save_checkpoint(account, checkpoint, chunk, progress)
+        with PROFILER.span("metrics.result"):
+            metrics = acc.result()
+        if upserts.changed or upserts.unchanged:
+            log.info(
+                "emails.persisted",
+                inserted=upserts.inserted,
+                updated=upserts.updated,
+                unchanged=upserts.unchanged,
+                pages=progress.pages,
+            )
+        self._log_fetch_stats(sent_folder, since, progress, log)
+
+        removed = 0
+        with tx():
+            # Apagadas/movidas da pasta (delta): saem de `emails`, rollups e estados das conversas
+            if progress.removed:
+                with PROFILER.span("db.delete_emails", emails=len(progress.removed)):
+                    removed = self.email_repo.delete_emails(account, progress.removed)
+                log.info("emails.removed", requested=len(progress.removed), deleted=removed)
+
+            # Conversas abertas de execuções anteriores: respostas/NDRs não passam por Enviados
+            closed = 0
+            if OPEN_CONVERSATION_RECHECK_DAYS:
+                with PROFILER.span("metrics.recheck_open"):
+                    closed = acc.recheck_open(
+                        timedelta(days=OPEN_CONVERSATION_RECHECK_DAYS),
+                        timedelta(seconds=OPEN_CONVERSATION_RECHECK_INTERVAL_SEC),
+                        OPEN_CONVERSATION_RECHECK_LIMIT,
+                    )
+
+            # 5️⃣  INSERT métricas
+            with PROFILER.span("db.save_metrics"):
+                self.metrics_repo.save(metrics, account)
+            log.info("metrics.persisted", **metrics.to_dict())
+
+            # 6️⃣  deltaLink só avança junto com o resto (mesma transação)
+            if progress.delta_link:
+                self.sync_state_repo.save_delta_link(
+                    account, sent_folder.id, progress.delta_link
+                )
+            if checkpoint is not None:
+                self.checkpoint_repo.clear_checkpoint(account, sent_folder.id)
+
+        return metrics, upserts.changed + removed + closed
 
     # ------------------------------------------------------------------ #
     #  Helpers                                                           #
     # ------------------------------------------------------------------ #
+    @contextmanager
+    def _transaction(self, stats: UnitOfWorkStats) -> Iterator[None]:
+        """Unidade de trabalho (se houver); as idas ao banco dela somam em `stats`."""
+        if self.unit_of_work is None:
+            yield
+            return
+        uow_stats = UnitOfWorkStats()
+        try:
+            with self.unit_of_work.unit_of_work() as uow_stats:
+                yield
+        finally:
+            stats.round_trips += uow_stats.round_trips
+
+    def _load_checkpoint(self, account: str, folder_id: str, log) -> Optional[SyncCheckpoint]:
+        """Checkpoint de uma execução interrompida; vencido, é descartado (recomeça do início)."""
+        checkpoint = self.checkpoint_repo.get_checkpoint(account, folder_id)
+        if checkpoint is None:
+            return None
+        age = datetime.now(timezone.utc) - checkpoint.updated_at
+        if CHECKPOINT_MAX_AGE_HOURS and age > timedelta(hours=CHECKPOINT_MAX_AGE_HOURS):
+            # O nextLink usa $skip: com a caixa muito mudada, a posição já não é confiável
+            log.info("checkpoint.expired", age_hours=round(age.total_seconds() / 3600, 1))
+            self.checkpoint_repo.clear_checkpoint(account, folder_id)
+            return None
+        return checkpoint
+
+    def _resume(
+        self,
+        account: str,
+        checkpoint: SyncCheckpoint,
+        acc: DailyMetricsAccumulator,
+        tx: Callable[[], ContextManager],
+        log,
+    ) -> Tuple[UpsertStats, set[str]]:
+        """
+        Refaz o acumulador com os e-mails dos lotes já confirmados (os gravados
+        a partir de `checkpoint.boundary`), regravando os que mudarem. Retorna o
+        UPSERT e os ids recarregados com `sent_datetime` igual ao boundary: as
+        páginas seguintes ignoram os posteriores a ele (novas mensagens na caixa
+        deslocam o $skip do nextLink) e, no empate, só esses ids.
+        """
+        upserts = UpsertStats()
+        at_boundary: set[str] = set()
+        if checkpoint.boundary is None:
+            return upserts, at_boundary
+        boundary = checkpoint.boundary
+        # Recarga em lotes de PIPELINE_CHUNK_SIZE: cada página é lida e somada na própria transação
+        pages = self.email_repo.iter_emails(account, boundary, PIPELINE_CHUNK_SIZE)
+        loaded = 0
+        while True:
+            with tx():
+                with PROFILER.span("db.load_emails"):
+                    batch = next(pages, None)
+                if batch is None:
+                    break
+                loaded += len(batch)
+                at_boundary.update(
+                    mid for mid, sent in zip(batch.message_id, batch.sent_datetime) if sent == boundary
+                )
+                with PROFILER.span("metrics.add", emails=len(batch)):
+                    to_save = acc.add(batch)
+                with PROFILER.span("db.save_all", emails=len(to_save)):
+                    upserts += self.email_repo.save_all(account, to_save)
+        log.info(
+            "checkpoint.resumed",
+            chunks=checkpoint.chunks, emails=loaded,
+            started_at=checkpoint.started_at.isoformat() if checkpoint.started_at else None,
+            pages_left=checkpoint.next_link is not None,
+        )
+        return upserts, at_boundary
+
+    def _save_checkpoint(
+        self, account: str, checkpoint: SyncCheckpoint, chunk: EmailBatch, progress: _SyncProgress
+    ) -> None:
+        """Avança o checkpoint para depois do lote (na transação do próprio lote)."""
+        oldest = min(filter(None, chunk.sent_datetime), default=None)
+        if oldest is not None and (checkpoint.boundary is None or oldest < checkpoint.boundary):
+            checkpoint.boundary = oldest
+        # Os lotes fecham no fim de uma página: o nextLink dela é o ponto de retomada
+        checkpoint.next_link = progress.next_link
+        checkpoint.chunks += 1
+        checkpoint.emails += len(chunk)
+        self.checkpoint_repo.save_checkpoint(account, checkpoint)
+
+    @staticmethod
+    def _window_start() -> Optional[datetime]:
+        """
+        Início da janela de look-back (`LOOKBACK_DAYS`), ou None para a pasta
+        inteira. O original de uma conversa anterior à janela segue sendo o
+        gravado (ver `DailyMetricsAccumulator`), mas não é mais reavaliado.
+        """
+        if not LOOKBACK_DAYS:
+            return None
+        return datetime.now(timezone.utc) - timedelta(days=LOOKBACK_DAYS)
+
+    def _iter_sent_pages(
+        self,
+        account: str,
+        folder_id: str,
+        since: Optional[datetime],
+        progress: _SyncProgress,
+        log,
+        start_link: Optional[str] = None,
+        boundary: Optional[datetime] = None,
+        at_boundary: Optional[set[str]] = None,
+    ) -> Iterator[MessagePageDTO]:
+        """
+        Páginas a processar. No modo delta, apenas as mensagens novas ou
+        alteradas desde a última execução; o deltaLink a salvar ao final
+        fica em `progress`. Na retomada, a pasta continua de `start_link`
+        e as mensagens já recarregadas ficam de fora: a pasta vem em ordem
+        decrescente de envio, então são as posteriores a `boundary` e, no
+        empate, as de `at_boundary` (sem guardar os ids de todas).
+        """
+        if GRAPH_SYNC_MODE != "delta" or self.sync_state_repo is None:
+            pages = self.graph_client.iter_messages_in_folder(
+                account, folder_id, since=since, start_link=start_link
+            )
+            for page in pages:
+                if boundary is not None:
+                    page.emails = [
+                        d for d in page.emails
+                        if d.sent_datetime < boundary
+                        or (d.sent_datetime == boundary and d.id not in (at_boundary or ()))
+                    ]
+                self._track_page(page, progress)
+                yield page
+            return
+
+        delta_link = self.sync_state_repo.get_delta_link(account, folder_id)
+        progress.full_resync = delta_link is None
+        # Hash de 64 bits dos ids em vez dos ids (~150 caracteres cada): o conjunto cresce
+        # com as mudanças; uma colisão (improvável) deixaria uma mensagem para a próxima ressincronização
+        seen: set[int] = set()
+        changed = 0
+
+        for page in self.graph_client.iter_message_delta(account, folder_id, delta_link, since=since):
+            self._track_page(page, progress)
+            progress.full_resync = progress.full_resync or page.full_resync
+            progress.delta_link = page.delta_link or progress.delta_link
+            # O delta pode repetir a mesma mensagem em páginas diferentes
+            page.emails = [d for d in page.emails if hash(d.id) not in seen]
+            seen.update(hash(d.id) for d in page.emails)
+            progress.removed.update(page.removed_ids)
+            changed += len(page.emails)
+            yield page
+
+        # Uma mensagem que voltou à pasta depois de removida vem também como alterada
+        progress.removed = {mid for mid in progress.removed if hash(mid) not in seen}
+        progress.incremental = not progress.full_resync
+        log.info(
+            "delta.change_set",
+            changed=changed, removed=len(progress.removed), full_resync=progress.full_resync,
+        )
+
+    @staticmethod
+    def _track_page(page: MessagePageDTO, progress: _SyncProgress) -> None:
+        progress.pages += 1
+        progress.messages += len(page.emails)
+        progress.bytes += page.size_bytes
+        progress.window_reached = progress.window_reached or page.window_reached
+        progress.next_link = None if page.window_reached else page.next_link
+
+    @staticmethod
+    def _log_fetch_stats(
+        folder: FolderDTO, since: Optional[datetime], progress: _SyncProgress, log
+    ) -> None:
+        """
+        Registra páginas/bytes lidos e, com janela de look-back, uma estimativa
+        do que deixou de ser lido (pelo total de itens da pasta e pela média
+        de mensagens e bytes por página desta execução).
+        """
+        stats = {"pages": progress.pages, "messages": progress.messages, "bytes": progress.bytes}
+        if since is not None and not progress.incremental and progress.messages:
+            skipped = max(0, folder.total_count - progress.messages)
+            stats.update(
+                since=since.isoformat(),
+                window_reached=progress.window_reached,
+                messages_skipped=skipped,
+                pages_skipped_est=math.ceil(skipped * progress.pages / progress.messages),
+                bytes_skipped_est=round(skipped * progress.bytes / progress.messages),
+            )
+        log.info("fetch.stats", **stats)
+
+    def _iter_chunks(self, pages: Iterator[MessagePageDTO]) -> Iterator[EmailBatch]:
+        """
+        Filtra e converte as páginas, agrupando em lotes fechados sempre no fim
+        de uma página. No modo `stream` o lote tem ~PIPELINE_CHUNK_SIZE e-mails;
+        no modo `batch` a pasta inteira forma um único lote. Cada lote tem o
+        próprio pool de strings, descartado com ele: a memória acompanha o lote,
+        não a caixa (os ids de conversa que atravessam lotes ficam no acumulador).
+        """
+        chunk_size = PIPELINE_CHUNK_SIZE if PIPELINE_MODE == "stream" else None
+        buffer = EmailBatch()
+        for page in pages:
+            with PROFILER.span("filter_map", messages=len(page.emails)):
+                for dto in page.emails:
+                    if self._accepts(dto):
+                        self._to_domain(dto, buffer)
+            if chunk_size and len(buffer) >= chunk_size:
+                yield buffer
+                buffer = EmailBatch()
+        if buffer or chunk_size is None:
+            yield buffer
+
+    @staticmethod
+    def _accepts(dto: EmailDTO) -> bool:
+        """Filtro de assunto, exclusões e destinatários ignorados (ver `FilterRules`)."""
+        return FILTER_RULES.accepts(
+            FILTER_RULES.classify(subject=dto.subject, recipients=dto.to_addresses)
+        )
+
     @staticmethod
     def _find_sent_folder(folders: List[FolderDTO]) -> Optional[FolderDTO]:
         return next(
@@ -113,17 +493,17 @@ class FetchAndStoreMetrics:
         )
 
     @staticmethod
-    def _to_domain(dto: EmailDTO) -> Email:
-        """ Mapeia o internet_message_id para o objeto de domínio. """
-        return Email(
-            message_id=dto.id, 
-            internet_message_id=dto.internet_message_id, 
+    def _to_domain(dto: EmailDTO, batch: EmailBatch) -> None:
+        """Acrescenta o DTO como uma linha do lote (com o internet_message_id)."""
+        batch.append(
+            message_id=dto.id,
+            conversation_id=dto.conversation_id,
             subject=dto.subject,
             sent_datetime=dto.sent_datetime,
+            to_addresses=dto.to_addresses,
             is_read=dto.is_read,
-            conversation_id=dto.conversation_id,
             has_attachments=dto.has_attachments,
-            to_addresses=dto.to_addresses,
             importance=dto.importance,
             is_read_receipt_requested=dto.is_read_receipt_requested,
+            internet_message_id=dto.internet_message_id,
         )
@@ -0,0 +1,115 @@
+"""
+Benchmark da gravação de e-mails em `PgEmailRepository.save_all`.
+
+Compara o caminho `insert` (INSERT ... ON CONFLICT em lotes de
+BULK_CHUNK_SIZE) com o `copy` (COPY para tabela temporária + merge) em
+três fases: linhas novas, regravação com 1/4 das linhas alteradas e
+regravação idêntica (nenhuma linha reescrita).
+
+    python -m benchmarks.bulk_load_bench --db-url postgresql+psycopg2://... --rows 10000 100000 1000000
+
+Usa contas `bench-<modo>@bench.local`, apagadas antes de cada rodada.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+from sqlalchemy import text
+
+from adapters.repository.sql_email_repository import PgEmailRepository
+from domain.model.email_batch import EmailBatch, Verdict
+from ports.persistence import UpsertStats
+
+
+def synthetic_batches(rows: int, batch: int, seed: int, replied: bool) -> Iterator[EmailBatch]:
+    """Lotes de e-mails determinísticos; `replied` muda as flags para forçar UPDATE."""
+    rnd = random.Random(seed)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for start in range(0, rows, batch):
+        out = EmailBatch()
+        for i in range(start, min(start + batch, rows)):
+            row = out.append(
+                message_id=f"AAMkAD-bench-{i:09d}",
+                conversation_id=f"AAQkAD-conv-{i // 3:09d}",
+                subject=f"Proposta de acordo - processo {rnd.randrange(10**7)}",
+                sent_datetime=base + timedelta(seconds=i * 37),
+                to_addresses=[f"cliente{rnd.randrange(10**5)}@exemplo.com.br"],
+                is_read=bool(i % 2),
+                importance="normal",
+                internet_message_id=f"<bench.{i}@nossa.com.br>",
+            )
+            hot = replied and i % 4 == 0
+            out.verdicts[row] = Verdict(
+                is_replied=hot,
+                reply_latency_sec=3600.0 if hot else None,
+                engagement_score=70 if hot else 0,
+                temperature_label="quente" if hot else "morno",
+            )
+        yield out
+
+
+def _reset(repo: PgEmailRepository, account: str) -> None:
+    with repo.engine.begin() as conn:
+        conn.execute(
+            text(
+                "DELETE FROM emails WHERE account_id IN "
+                "(SELECT id FROM accounts WHERE email_address = :acc)"
+            ),
+            {"acc": account},
+        )
+
+
+def _timed_load(
+    repo: PgEmailRepository, account: str, rows: int, batch: int, replied: bool
+) -> tuple[float, UpsertStats]:
+    elapsed, stats = 0.0, UpsertStats()
+    for emails in synthetic_batches(rows, batch, seed=rows, replied=replied):
+        start = time.perf_counter()
+        stats += repo.save_all(account, emails)
+        elapsed += time.perf_counter() - start
+    return elapsed, stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DB_URL"), help="URL SQLAlchemy (padrão: BENCH_DB_URL)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch", type=int, default=10_000, help="e-mails por chamada de save_all")
+    parser.add_argument("--modes", nargs="+", default=["insert", "copy"], choices=["insert", "copy"])
+    args = parser.parse_args()
+
+    if not args.db_url:
+        from config.settings import DB_URL
+        args.db_url = DB_URL
+
+    import structlog, logging  # noqa: E401 - silencia o log por lote durante a medição
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    print(
+        f"{'linhas':>10} {'modo':<7} {'novas (s)':>10} {'linhas/s':>10} "
+        f"{'update (s)':>11} {'reescritas':>10} {'iguais (s)':>11} {'reescritas':>10}"
+    )
+    for rows in args.rows:
+        for mode in args.modes:
+            repo = PgEmailRepository(args.db_url, bulk_mode=mode)
+            account = f"bench-{mode}@bench.local"
+            _reset(repo, account)
+            inserted, _ = _timed_load(repo, account, rows, args.batch, replied=False)
+            updated, upd_stats = _timed_load(repo, account, rows, args.batch, replied=True)
+            unchanged, same_stats = _timed_load(repo, account, rows, args.batch, replied=True)
+            print(
+                f"{rows:>10,} {mode:<7} {inserted:>10.2f} {rows / inserted:>10,.0f} "
+                f"{updated:>11.2f} {upd_stats.updated:>10,} "
+                f"{unchanged:>11.2f} {same_stats.updated:>10,}"
+            )
+            _reset(repo, account)
+            repo.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Servidor Graph falso, em memória, para os benchmarks de ponta a ponta.
+
+`generate_mailbox` monta uma caixa determinística (Itens Enviados + respostas
+e bounces das conversas) e `FakeGraphServer` a serve por HTTP local com os
+mesmos caminhos usados pelos adaptadores: token OAuth, `mailFolders`,
+mensagens paginadas (`$filter`/`$top`/`@odata.nextLink`), `messages/delta`,
+cabeça de conversa e `$batch`. Uma fração configurável das requisições (e
+das sub-requisições do `$batch`) recebe 429 com `Retry-After`.
+
+Os contadores ficam em `GET /_bench/stats` (`?reset=1` zera depois de ler).
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+SENT_FOLDER_ID = "sentitems"
+SENT_FOLDER_NAME = "Itens Enviados"
+
+
+@dataclass
+class Mailbox:
+    """Mensagens já no formato JSON do Graph; `sent` do mais recente para o mais antigo."""
+    account: str
+    sent: List[dict] = field(default_factory=list)
+    conversations: Dict[str, List[dict]] = field(default_factory=dict)
+
+
+def generate_mailbox(
+    account: str,
+    size: int,
+    fanout: int = 3,
+    reply_ratio: float = 0.3,
+    bounce_ratio: float = 0.05,
+    days: int = 90,
+    seed: int = 0,
+    now: Optional[datetime] = None,
+) -> Mailbox:
+    """
+    `size` e-mails enviados em conversas de `fanout` mensagens (a primeira e
+    os follow-ups), espalhados pelos últimos `days` dias. Cada conversa recebe
+    uma resposta do cliente com probabilidade `reply_ratio` ou um aviso de
+    não entrega com probabilidade `bounce_ratio`.
+    """
+    rnd = random.Random(seed)
+    now = (now or datetime.now(timezone.utc)).replace(microsecond=0)
+    box = Mailbox(account)
+    prefix = account.split("@")[0]
+    fanout = max(1, fanout)
+
+    for c in range((size + fanout - 1) // fanout):
+        conv_id = f"AAQkAD-{prefix}-{c:07d}"
+        client = f"cliente{rnd.randrange(10**5)}@exemplo.com.br"
+        subject = f"Proposta de acordo - processo {rnd.randrange(10**7)}"
+        # Os follow-ups (48 h entre eles) também ficam no passado
+        start = now - timedelta(seconds=rnd.randrange(days * 86400), hours=48 * (fanout - 1))
+        thread = []
+        for k in range(min(fanout, size - c * fanout)):
+            sent_at = start + timedelta(hours=k * 48)
+            thread.append(
+                _message(
+                    f"AAMkAD-{prefix}-{c:07d}-{k}", conv_id, subject, sent_at, account, client,
+                    importance="high" if rnd.random() < 0.1 else "normal",
+                )
+            )
+        outcome = rnd.random()
+        if outcome < bounce_ratio:
+            thread.append(
+                _message(
+                    f"AAMkAD-{prefix}-{c:07d}-ndr", conv_id, f"Undeliverable: {subject}",
+                    start + timedelta(minutes=2), "postmaster@exemplo.com.br", account,
+                    preview="Delivery has failed to these recipients or groups",
+                )
+            )
+        elif outcome < bounce_ratio + reply_ratio:
+            thread.append(
+                _message(
+                    f"AAMkAD-{prefix}-{c:07d}-re", conv_id, f"RE: {subject}",
+                    start + timedelta(seconds=rnd.randrange(60, 5 * 86400)), client, account,
+                )
+            )
+        box.sent.extend(m for m in thread if m["from"]["emailAddress"]["address"] == account)
+        box.conversations[conv_id] = sorted(thread, key=lambda m: m["sentDateTime"])
+
+    box.sent.sort(key=lambda m: m["sentDateTime"], reverse=True)
+    return box
+
+
+def _message(
+    message_id: str,
+    conv_id: str,
+    subject: str,
+    sent_at: datetime,
+    sender: str,
+    recipient: str,
+    importance: str = "normal",
+    preview: str = "",
+) -> dict:
+    return {
+        "id": message_id,
+        "subject": subject,
+        "sentDateTime": f"{sent_at.astimezone(timezone.utc):%Y-%m-%dT%H:%M:%SZ}",
+        "isRead": True,
+        "conversationId": conv_id,
+        "hasAttachments": False,
+        "from": {"emailAddress": {"address": sender}},
+        "toRecipients": [{"emailAddress": {"address": recipient}}],
+        "ccRecipients": [],
+        "importance": importance,
+        "isReadReceiptRequested": False,
+        "isDeliveryReceiptRequested": False,
+        "internetMessageId": f"<{message_id}@bench.local>",
+        "bodyPreview": preview,
+    }
+
+
+class FakeGraphServer:
+    """
+    Servidor HTTP (uma thread por conexão) com as caixas de `mailboxes`.
+    `throttle_ratio` é a fração de requisições respondidas com 429.
+    """
+
+    def __init__(
+        self,
+        mailboxes: List[Mailbox],
+        throttle_ratio: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.mailboxes = {box.account.lower(): box for box in mailboxes}
+        self.throttle_ratio = throttle_ratio
+        self.retry_after = retry_after
+        self.stats: Counter = Counter()
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGraphServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-graph", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeGraphServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ------------------------------------------------------------------ #
+    #  Rotas                                                             #
+    # ------------------------------------------------------------------ #
+    def count(self, kind: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[kind] += n
+
+    def throttled(self) -> bool:
+        if not self.throttle_ratio:
+            return False
+        with self._lock:
+            hit = self._rnd.random() < self.throttle_ratio
+            if hit:
+                self.stats["throttled"] += 1
+        return hit
+
+    def handle_get(
+        self, path: str, query: Dict[str, str], headers: Dict[str, str], counted: bool = True
+    ) -> Tuple[int, dict]:
+        """`counted=False` para sub-requisições do `$batch` (já contadas em `batch_items`)."""
+        count = self.count if counted else (lambda kind: None)
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        # Aceita o prefixo de versão (/v1.0/users/...) se vier na URL base
+        if parts and parts[0] != "users" and "users" in parts:
+            parts = parts[parts.index("users"):]
+        if len(parts) < 3 or parts[0] != "users":
+            return 404, _error("ResourceNotFound")
+        box = self.mailboxes.get(parts[1].lower())
+        if box is None:
+            return 404, _error("ErrorInvalidUser")
+
+        rest = parts[2:]
+        if rest == ["mailFolders"]:
+            count("folders")
+            return 200, {"value": [{
+                "id": SENT_FOLDER_ID,
+                "displayName": SENT_FOLDER_NAME,
+                "unreadItemCount": 0,
+                "totalItemCount": len(box.sent),
+            }]}
+        if rest == ["mailFolders", SENT_FOLDER_ID, "messages"]:
+            count("messages")
+            return 200, self._messages_page(path, box, query)
+        if rest == ["mailFolders", SENT_FOLDER_ID, "messages", "delta"]:
+            count("delta")
+            return 200, self._delta_page(path, box, query, headers)
+        if rest == ["messages"]:
+            count("heads")
+            return 200, self._conversation_head(box, query)
+        return 404, _error("ResourceNotFound")
+
+    def handle_batch(self, payload: dict) -> dict:
+        self.count("batch")
+        responses = []
+        for req in payload.get("requests", []):
+            self.count("batch_items")
+            if self.throttled():
+                responses.append({
+                    "id": req.get("id"),
+                    "status": 429,
+                    "headers": {"Retry-After": f"{self.retry_after:g}"},
+                    "body": _error("ApplicationThrottled"),
+                })
+                continue
+            split = urlsplit(req.get("url", ""))
+            status, body = self.handle_get(split.path, dict(parse_qsl(split.query)), {}, counted=False)
+            responses.append({"id": req.get("id"), "status": status, "body": body})
+        return {"responses": responses}
+
+    def _messages_page(self, path: str, box: Mailbox, query: Dict[str, str]) -> dict:
+        items = _window(box.sent, query.get("$filter"), "sentDateTime")
+        top = int(query.get("$top", 10))
+        skip = int(query.get("$skip", 0))
+        page = {"value": items[skip : skip + top]}
+        if skip + top < len(items):
+            page["@odata.nextLink"] = self._link(path, {**query, "$skip": str(skip + top)})
+        return page
+
+    def _delta_page(self, path: str, box: Mailbox, query: Dict[str, str], headers: Dict[str, str]) -> dict:
+        # A caixa não muda durante o benchmark: depois do deltaLink, nada de novo
+        if "$deltatoken" in query:
+            return {"value": [], "@odata.deltaLink": self._link(path, {"$deltatoken": query["$deltatoken"]})}
+        items = _window(box.sent, query.get("$filter"), "sentDateTime")
+        size = _max_page_size(headers) or 10
+        skip = int(query.get("$skiptoken", 0))
+        page = {"value": items[skip : skip + size]}
+        if skip + size < len(items):
+            page["@odata.nextLink"] = self._link(path, {**query, "$skiptoken": str(skip + size)})
+        else:
+            page["@odata.deltaLink"] = self._link(path, {"$deltatoken": str(len(box.sent))})
+        return page
+
+    @staticmethod
+    def _conversation_head(box: Mailbox, query: Dict[str, str]) -> dict:
+        filter_ = query.get("$filter", "")
+        conv_id = filter_.partition("'")[2].rpartition("'")[0].replace("''", "'")
+        return {"value": box.conversations.get(conv_id, [])[: int(query.get("$top", 10))]}
+
+    def _link(self, path: str, query: Dict[str, str]) -> str:
+        return f"{self.url}{path}?{urlencode(query, safe='$,: ')}".replace(" ", "%20")
+
+
+def _window(items: List[dict], filter_: Optional[str], field_name: str) -> List[dict]:
+    """Aplica `field ge AAAA-MM-DDTHH:MM:SSZ`; o formato ISO em UTC ordena como texto."""
+    if not filter_:
+        return items
+    name, op, value = filter_.split(" ", 2)
+    if op != "ge":
+        return items
+    # delta filtra por receivedDateTime: aqui recebimento e envio coincidem
+    return [m for m in items if m[field_name] >= value]
+
+
+def _max_page_size(headers: Dict[str, str]) -> Optional[int]:
+    prefer = next((v for k, v in headers.items() if k.lower() == "prefer"), "")
+    for part in prefer.split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "odata.maxpagesize" and value.isdigit():
+            return int(value)
+    return None
+
+
+def _error(code: str) -> dict:
+    return {"error": {"code": code, "message": code}}
+
+
+def _handler(server: FakeGraphServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            split = urlsplit(self.path)
+            query = dict(parse_qsl(split.query))
+            if split.path == "/_bench/stats":
+                with server._lock:
+                    stats = dict(server.stats)
+                    if query.get("reset"):
+                        server.stats.clear()
+                return self._reply(200, stats)
+            if self._throttle():
+                return
+            status, body = server.handle_get(split.path, query, dict(self.headers))
+            self._reply(status, body)
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.endswith("/oauth2/v2.0/token"):
+                server.count("token")
+                return self._reply(200, {"access_token": "bench-token", "expires_in": 3599, "token_type": "Bearer"})
+            if self._throttle():
+                return
+            if urlsplit(self.path).path.endswith("/$batch"):
+                return self._reply(200, server.handle_batch(json.loads(body or b"{}")))
+            self._reply(404, _error("ResourceNotFound"))
+
+        def _throttle(self) -> bool:
+            if not server.throttled():
+                return False
+            self._reply(429, _error("ApplicationThrottled"), {"Retry-After": f"{server.retry_after:g}"})
+            return True
+
+        def _reply(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
@@ -0,0 +1,143 @@
+"""
+Micro-benchmark do motor de regras (`domain.service.filter_rules`).
+
+Compara, sobre N assuntos sintéticos, o caminho antigo (laços `any(...)`
+por termo + regexes separadas de bounce/prefixo) com `FilterRules.classify`,
+conferindo que os dois chegam ao mesmo resultado.
+
+    python -m benchmarks.filter_rules_bench --n 1000000
+    python -m benchmarks.filter_rules_bench --n 1000000 --extra-terms 50
+
+`--extra-terms` acrescenta termos sintéticos a SUBJECT_FILTER e a
+IGNORED_RECIPIENT_PATTERNS para simular configurações maiores.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from typing import Callable, List, Tuple
+
+from domain.service.filter_rules import (
+    BOUNCE_SENDER,
+    BOUNCE_SENDER_TERMS,
+    BOUNCE_TEXT,
+    BOUNCE_TEXT_TERMS,
+    RECIPIENT_IGNORED,
+    SUBJECT_EXCLUDED,
+    SUBJECT_MATCH,
+    SUBJECT_PREFIXED,
+    FilterRules,
+    Rule,
+)
+
+_WORDS = (
+    "cliente processo acordo valor proposta oportunidade parte referente contrato "
+    "pagamento parcela desconto quitação débito negociação prazo boleto retorno"
+).split()
+_PREFIXES = ["RES:", "ENC:", "FW:", "FWD:"]
+_EXCLUDED = ["oportunidade de acordo: - parte:"]
+_SUBJECT_FILTER = ["OPORTUNIDADE DE ACORDO", "PROPOSTA"]
+_IGNORED_RECIPIENTS = ["@empresa-interna.com.br", "noreply"]
+
+Message = Tuple[str, List[str], str, str]  # assunto, destinatários, remetente, corpo
+
+
+def synthetic_messages(n: int, seed: int = 42) -> List[Message]:
+    rnd = random.Random(seed)
+    messages: List[Message] = []
+    for i in range(n):
+        subject = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(4, 12)))
+        roll = rnd.random()
+        if roll < 0.30:
+            subject = f"OPORTUNIDADE DE ACORDO - {subject}"
+        elif roll < 0.35:
+            subject = f"Oportunidade de acordo: - Parte: {subject}"
+        elif roll < 0.45:
+            subject = f"{rnd.choice(_PREFIXES)} Proposta {subject}"
+        elif roll < 0.48:
+            subject = f"Undeliverable: {subject}"
+        recipients = [f"contato{rnd.randrange(10_000)}@cliente{rnd.randrange(500)}.com.br"]
+        if rnd.random() < 0.05:
+            recipients.append(f"time{rnd.randrange(50)}@empresa-interna.com.br")
+        sender = "postmaster@cliente.com.br" if rnd.random() < 0.02 else f"vendas{rnd.randrange(20)}@nossa.com.br"
+        body = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(5, 20)))
+        messages.append((f"{subject} #{i}", recipients, sender, body))
+    return messages
+
+
+def legacy_classifier(subject_filter, excluded, recipients_ignored, prefixes) -> Callable[[Message], tuple]:
+    """O caminho anterior ao motor de regras, reproduzido para comparação."""
+    bounce_re = re.compile("|".join(map(re.escape, BOUNCE_TEXT_TERMS)), re.I)
+    postmaster_re = re.compile("|".join(map(re.escape, BOUNCE_SENDER_TERMS)), re.I)
+    upper_prefixes = tuple(p.upper() for p in prefixes)
+
+    def classify(msg: Message) -> tuple:
+        subject, recipients, sender, body = msg
+        low = subject.lower()
+        recip = " ".join(recipients).lower()
+        accepted = (
+            any(expr.lower() in low for expr in subject_filter)
+            and not any(p in low for p in excluded)
+            and not any(p in recip for p in recipients_ignored)
+        )
+        bounced = bool(postmaster_re.search(sender) or bounce_re.search(subject + " " + body))
+        prefixed = subject.lstrip().upper().startswith(upper_prefixes)
+        return accepted, bounced, prefixed
+
+    return classify
+
+
+def engine_classifier(subject_filter, excluded, recipients_ignored, prefixes) -> Callable[[Message], tuple]:
+    rules = FilterRules([
+        Rule(SUBJECT_MATCH, ("subject",), tuple(subject_filter)),
+        Rule(SUBJECT_EXCLUDED, ("subject",), tuple(excluded)),
+        Rule(SUBJECT_PREFIXED, ("subject",), tuple(prefixes), anchored=True),
+        Rule(RECIPIENT_IGNORED, ("recipients",), tuple(recipients_ignored)),
+        Rule(BOUNCE_SENDER, ("sender",), BOUNCE_SENDER_TERMS),
+        Rule(BOUNCE_TEXT, ("subject", "body"), BOUNCE_TEXT_TERMS),
+    ])
+
+    def classify(msg: Message) -> tuple:
+        subject, recipients, sender, body = msg
+        hits = rules.classify(subject=subject, recipients=recipients, sender=sender, body=body)
+        return rules.accepts(hits), rules.is_bounce(hits), rules.is_prefixed(hits)
+
+    return classify
+
+
+def _run(name: str, classify: Callable[[Message], tuple], messages: List[Message]) -> tuple[float, list]:
+    start = time.perf_counter()
+    results = [classify(m) for m in messages]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {elapsed:8.2f}s  {len(messages) / elapsed:>12,.0f} msgs/s")
+    return elapsed, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1_000_000, help="quantidade de mensagens sintéticas")
+    parser.add_argument("--extra-terms", type=int, default=0, help="termos sintéticos extras por regra")
+    args = parser.parse_args()
+
+    extra = [f"campanha {i:03d} {w}" for i, w in zip(range(args.extra_terms), _WORDS * 100)]
+    config = (
+        _SUBJECT_FILTER + extra,
+        _EXCLUDED,
+        _IGNORED_RECIPIENTS + [f"@parceiro{i}.com.br" for i in range(args.extra_terms)],
+        _PREFIXES,
+    )
+
+    print(f"gerando {args.n:,} mensagens (termos extras por regra: {args.extra_terms})...")
+    messages = synthetic_messages(args.n)
+
+    legacy_time, legacy = _run("legado", legacy_classifier(*config), messages)
+    engine_time, engine = _run("motor", engine_classifier(*config), messages)
+
+    mismatches = sum(a != b for a, b in zip(legacy, engine))
+    print(f"speedup  {legacy_time / engine_time:8.2f}x  divergências: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
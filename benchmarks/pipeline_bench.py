@@ -0,0 +1,273 @@
+"""
+Benchmark de ponta a ponta: caixas sintéticas servidas por um Graph falso
+local (`benchmarks.fake_graph`) e o pipeline completo (`FetchAndStoreMetrics`
++ `PgEmailRepository`) gravando num Postgres local.
+
+Cada cenário roda num processo filho (configuração lida do ambiente e pico
+de RSS isolado) e informa, por execução:
+
+- mensagens/s (e-mails enviados da caixa / tempo total do `execute`);
+- requisições ao Graph por tipo (`folders`, `messages`, `delta`, `batch`,
+  `batch_items`, `heads`) e quantas receberam 429;
+- tempo em chamadas ao banco (execute/COPY no cursor) e idas ao banco;
+- pico de RSS do processo.
+
+    python -m benchmarks.pipeline_bench --db-url postgresql+psycopg2://... \\
+        --scenarios baseline fanout throttled async delta
+
+Cenários com `runs=2` repetem o `execute` sobre o mesmo banco: a segunda linha
+mede a reexecução (vereditos salvos, linhas inalteradas, deltaLink).
+Usa contas `bench-<n>@bench.local`, apagadas antes de cada cenário.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, List
+
+from benchmarks.fake_graph import FakeGraphServer, generate_mailbox
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    accounts: int = 2
+    size: int = 2_000             # e-mails enviados por conta
+    fanout: int = 3               # e-mails enviados por conversa
+    reply_ratio: float = 0.3
+    bounce_ratio: float = 0.05
+    throttle_ratio: float = 0.0   # fração das requisições respondidas com 429
+    retry_after: float = 1.0
+    runs: int = 1
+    env: tuple = ()               # pares (variável, valor) extras para o filho
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s
+    for s in (
+        Scenario("baseline", runs=2),
+        Scenario("fanout", fanout=10, reply_ratio=0.6),
+        Scenario("bounces", bounce_ratio=0.4, reply_ratio=0.1),
+        Scenario("throttled", throttle_ratio=0.02),
+        Scenario("async", env=(("GRAPH_CLIENT_MODE", "async"),)),
+        Scenario("parallel", accounts=8, size=1_000, env=(("ACCOUNT_WORKERS", "4"),)),
+        Scenario("stream", env=(("PIPELINE_MODE", "stream"), ("PIPELINE_CHUNK_SIZE", "500"))),
+        Scenario("delta", runs=2, env=(("GRAPH_SYNC_MODE", "delta"),)),
+    )
+}
+
+# Configuração comum a todos os cenários; `env` do cenário e o ambiente do shell vêm depois
+BASE_ENV = {
+    "TENANT_ID": "bench",
+    "CLIENT_ID": "bench",
+    "CLIENT_SECRET": "bench",
+    "SENT_FOLDER_NAME": "itens enviados",
+    "SUBJECT_FILTER": "proposta",
+    "IGNORED_RECIPIENT_PATTERNS": "",
+    "LOOKBACK_DAYS": "0",
+    # O limitador continua ativo (429 reduz a taxa), mas não é o gargalo sem throttling
+    "RATE_LIMIT_MAILBOX_RPS": "1000",
+    "RATE_LIMIT_TENANT_RPS": "5000",
+}
+
+
+def accounts_for(scenario: Scenario) -> List[str]:
+    return [f"bench-{i}@bench.local" for i in range(scenario.accounts)]
+
+
+# ---------------------------------------------------------------------- #
+#  Processo pai: servidor falso + um filho por cenário                   #
+# ---------------------------------------------------------------------- #
+def run_scenario(scenario: Scenario, db_url: str, seed: int) -> List[dict]:
+    accounts = accounts_for(scenario)
+    boxes = [
+        generate_mailbox(
+            account, scenario.size, scenario.fanout, scenario.reply_ratio,
+            scenario.bounce_ratio, seed=seed + i,
+        )
+        for i, account in enumerate(accounts)
+    ]
+    with FakeGraphServer(boxes, scenario.throttle_ratio, scenario.retry_after, seed=seed) as server:
+        env = {
+            **os.environ,
+            **BASE_ENV,
+            **dict(scenario.env),
+            "GRAPH_BASE_URL": server.url,
+            "LOGIN_BASE_URL": server.url,
+            "EMAIL_ACCOUNTS": ",".join(accounts),
+        }
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pipeline_bench", "--child", json.dumps(asdict(scenario)), db_url],
+            env=env, stdout=subprocess.PIPE, check=True, text=True,
+        )
+    return [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DB_URL"), help="URL SQLAlchemy (padrão: BENCH_DB_URL)")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--size", type=int, help="sobrescreve o nº de e-mails por conta dos cenários")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return _child(Scenario(**json.loads(args.child[0])), args.child[1])
+    if not args.db_url:
+        parser.error("informe --db-url ou BENCH_DB_URL")
+
+    print(
+        f"{'cenário':<10} {'run':>3} {'e-mails':>8} {'tempo (s)':>9} {'msg/s':>8} "
+        f"{'graph':>6} {'429':>5} {'banco (s)':>9} {'idas':>6} {'RSS (MB)':>8}  requisições"
+    )
+    for name in args.scenarios:
+        scenario = SCENARIOS[name]
+        if args.size:
+            scenario = replace(scenario, size=args.size)
+        for r in run_scenario(scenario, args.db_url, args.seed):
+            if r["accounts_ok"] < scenario.accounts:
+                print(f"{name}: {scenario.accounts - r['accounts_ok']} conta(s) com erro (ver stderr)")
+            graph = r["graph"]
+            kinds = " ".join(f"{k}={v}" for k, v in sorted(graph.items()) if k != "throttled")
+            total = sum(v for k, v in graph.items() if k not in ("throttled", "batch_items"))
+            print(
+                f"{name:<10} {r['run']:>3} {r['emails']:>8,} {r['elapsed']:>9.2f} "
+                f"{r['emails'] / r['elapsed']:>8,.0f} {total:>6,} {graph.get('throttled', 0):>5} "
+                f"{r['db_time']:>9.2f} {r['db_round_trips']:>6,} {r['peak_rss_mb']:>8.1f}  {kinds}"
+            )
+
+
+# ---------------------------------------------------------------------- #
+#  Processo filho: pipeline real, configurado pelo ambiente              #
+# ---------------------------------------------------------------------- #
+class _DbTimer:
+    """Soma o tempo gasto dentro do driver (execute/executemany/COPY)."""
+
+    def __init__(self) -> None:
+        import threading
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.seconds += seconds
+
+    def cursor_factory(self):
+        import time
+        from psycopg2.extensions import cursor
+
+        timer = self
+
+        class TimedCursor(cursor):
+            def execute(self, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return super().execute(*args, **kwargs)
+                finally:
+                    timer.add(time.perf_counter() - start)
+
+            def executemany(self, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return super().executemany(*args, **kwargs)
+                finally:
+                    timer.add(time.perf_counter() - start)
+
+            def copy_expert(self, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return super().copy_expert(*args, **kwargs)
+                finally:
+                    timer.add(time.perf_counter() - start)
+
+        return TimedCursor
+
+
+def _child(scenario: Scenario, db_url: str) -> None:
+    import logging
+    import resource
+    import time
+
+    import requests
+    import structlog
+    from sqlalchemy import event
+    from sqlalchemy.pool import Pool
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+
+    from adapters.graph.graph_api_client import GraphApiClient
+    from adapters.repository.sql_email_repository import PgEmailRepository
+    from application.usecase.fetch_and_store_metrics import FetchAndStoreMetrics
+    from config.settings import GRAPH_BASE_URL, GRAPH_CLIENT_MODE
+    from domain.service.email_metrics_service import EmailMetricsService
+
+    timer = _DbTimer()
+    factory = timer.cursor_factory()
+
+    @event.listens_for(Pool, "connect")
+    def _timed_cursors(dbapi_conn, _record) -> None:
+        dbapi_conn.cursor_factory = factory
+
+    repo = PgEmailRepository(db_url)
+    _reset(repo, accounts_for(scenario))
+
+    if GRAPH_CLIENT_MODE == "async":
+        from adapters.graph.async_graph_api_client import AsyncGraphApiClient
+        graph = AsyncGraphApiClient()
+    else:
+        graph = GraphApiClient()
+    job = FetchAndStoreMetrics(
+        graph_client=graph,
+        email_repo=repo,
+        metrics_repo=repo,
+        metrics_service=EmailMetricsService(graph, state_repo=repo),
+        sync_state_repo=repo,
+        unit_of_work=repo,
+    )
+    stats_url = f"{GRAPH_BASE_URL.rstrip('/')}/_bench/stats?reset=1"
+    requests.get(stats_url, timeout=5)
+
+    for run in range(1, scenario.runs + 1):
+        timer.seconds, trips = 0.0, repo.round_trips
+        start = time.perf_counter()
+        results = job.execute()
+        elapsed = time.perf_counter() - start
+        graph_stats = requests.get(stats_url, timeout=5).json()
+        graph_stats.pop("token", None)
+        print(json.dumps({
+            "run": run,
+            "emails": scenario.size * scenario.accounts,
+            "accounts_ok": len(results),
+            "elapsed": elapsed,
+            "graph": graph_stats,
+            "db_time": timer.seconds,
+            "db_round_trips": repo.round_trips - trips,
+            # ru_maxrss vem em KiB no Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }), flush=True)
+
+    _reset(repo, accounts_for(scenario))
+    repo.engine.dispose()
+
+
+def _reset(repo, accounts: List[str]) -> None:
+    from sqlalchemy import text
+
+    with repo.engine.begin() as conn:
+        for table in ("email_daily_rollups", "emails", "metrics", "sync_states", "conversation_states"):
+            conn.execute(
+                text(
+                    f"DELETE FROM {table} WHERE account_id IN "
+                    "(SELECT id FROM accounts WHERE email_address = ANY(:accs))"
+                ),
+                {"accs": accounts},
+            )
+
+
+if __name__ == "__main__":
+    main()
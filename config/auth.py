@@ -0,0 +1,244 @@
+"""
+Tokens OAuth2 (client credentials) do Microsoft Graph e do Exchange.
+
+`TokenManager.get_token` é chamado a cada requisição, de várias threads:
+
+- o token em memória é devolvido sem lock enquanto for válido;
+- só uma renovação por escopo acontece por vez (as demais threads esperam e
+  reutilizam o resultado, sem "estouro" de requisições ao login);
+- faltando menos de `refresh_margin` segundos para vencer, o token atual
+  continua sendo devolvido e uma thread de fundo o renova;
+- o endpoint de login usa uma sessão HTTP própria (pool + retries);
+- com `cache_path` e `cache_key` (chave Fernet, pacote `cryptography`), os
+  tokens vão para um arquivo criptografado e um reinício reaproveita os que
+  ainda valem, sem esperar pela autenticação.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import requests
+import structlog
+from requests.adapters import HTTPAdapter, Retry
+
+try:  # cache em disco só com o pacote `cryptography` instalado
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class _Token:
+    access_token: str
+    expires_at: float
+
+
+class TokenManager:
+    # Escopo padrão para a API principal do Microsoft Graph
+    DEFAULT_SCOPE = "https://graph.microsoft.com/.default"
+    _TIMEOUT = (3.05, 30)  # (connect, read)
+    # Considera o token vencido um pouco antes do `expires_in` (relógios, latência)
+    _EXPIRY_SKEW = 60.0
+
+    def __init__(
+        self,
+        tenant_id: Optional[str],
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        login_base_url: str = "https://login.microsoftonline.com",
+        refresh_margin: float = 300.0,
+        cache_path: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.token_url = f"{login_base_url.rstrip('/')}/{tenant_id}/oauth2/v2.0/token"
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self._clock = clock
+        self._tokens: Dict[str, _Token] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._refreshing: set[str] = set()
+        self._state_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._session = self._build_session()
+        self._cache = self._build_cache(cache_path, cache_key)
+        self._cache_loaded = False
+
+    # ------------------------------------------------------------------ #
+    #  API pública                                                       #
+    # ------------------------------------------------------------------ #
+    def get_token(self, scope: Optional[str] = None) -> str:
+        """
+        Token de acesso para o escopo (padrão: Graph). Só bloqueia quando não
+        há token válido; perto do vencimento, renova em segundo plano.
+        """
+        scope = scope or self.DEFAULT_SCOPE
+        if not self._cache_loaded:
+            self._load_cache()
+        token = self._tokens.get(scope)
+        now = self._clock()
+        if token is None or now >= token.expires_at:
+            return self._refresh(scope, proactive=False).access_token
+        if now >= token.expires_at - self.refresh_margin:
+            self._refresh_in_background(scope)
+        return token.access_token
+
+    # ------------------------------------------------------------------ #
+    #  Renovação                                                         #
+    # ------------------------------------------------------------------ #
+    def _refresh(self, scope: str, proactive: bool) -> _Token:
+        """Single-flight: quem chega com a renovação em curso espera e reaproveita."""
+        with self._lock_for(scope):
+            # Outra thread pode ter renovado enquanto esta esperava o lock
+            token = self._tokens.get(scope)
+            if token is not None:
+                fresh_until = token.expires_at - (self.refresh_margin if proactive else 0)
+                if self._clock() < fresh_until:
+                    return token
+            token = self._request(scope)
+            self._tokens[scope] = token
+            self._save_cache()
+            return token
+
+    def _refresh_in_background(self, scope: str) -> None:
+        with self._state_lock:
+            if scope in self._refreshing:
+                return
+            self._refreshing.add(scope)
+        threading.Thread(
+            target=self._background_refresh, args=(scope,), name="token-refresh", daemon=True
+        ).start()
+
+    def _background_refresh(self, scope: str) -> None:
+        try:
+            self._refresh(scope, proactive=True)
+        except Exception:
+            # O token atual ainda vale; a próxima chamada tenta de novo
+            logger.warning("auth.token.background_refresh_failed", scope=scope, exc_info=True)
+        finally:
+            with self._state_lock:
+                self._refreshing.discard(scope)
+
+    def _request(self, scope: str) -> _Token:
+        start = self._clock()
+        resp = self._session.post(
+            self.token_url,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": scope,
+            },
+            timeout=self._TIMEOUT,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        expires_in = int(data.get("expires_in", 3599))
+        logger.info("auth.token.acquired", scope=scope, expires_in=expires_in)
+        return _Token(data["access_token"], start + expires_in - self._EXPIRY_SKEW)
+
+    def _lock_for(self, scope: str) -> threading.Lock:
+        with self._state_lock:
+            return self._locks.setdefault(scope, threading.Lock())
+
+    @staticmethod
+    def _build_session() -> requests.Session:
+        session = requests.Session()
+        # POST de client credentials é idempotente: pode repetir em falhas transitórias
+        retry_cfg = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("POST",),
+        )
+        adapter = HTTPAdapter(max_retries=retry_cfg, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    # ------------------------------------------------------------------ #
+    #  Cache em disco (criptografado)                                    #
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _build_cache(path: Optional[str], key: Optional[str]):
+        if not path:
+            return None
+        if not key:
+            logger.warning("auth.token_cache.disabled", reason="missing_key")
+            return None
+        if Fernet is None:
+            logger.warning("auth.token_cache.disabled", reason="cryptography_not_installed")
+            return None
+        try:
+            return path, Fernet(key.encode())
+        except ValueError:
+            logger.warning("auth.token_cache.disabled", reason="invalid_key")
+            return None
+
+    def _load_cache(self) -> None:
+        # As threads que chegam durante a leitura esperam por ela
+        with self._cache_lock:
+            if not self._cache_loaded:
+                self._read_cache()
+                self._cache_loaded = True
+
+    def _read_cache(self) -> None:
+        if self._cache is None:
+            return
+        path, fernet = self._cache
+        try:
+            with open(path, "rb") as fh:
+                payload = json.loads(fernet.decrypt(fh.read()))
+        except FileNotFoundError:
+            return
+        except (InvalidToken, ValueError, OSError):
+            logger.warning("auth.token_cache.unreadable", path=path)
+            return
+        try:
+            # Tokens de outro tenant/aplicativo (mesmo arquivo, outra config) são ignorados
+            if payload.get("client") != f"{self.tenant_id}:{self.client_id}":
+                return
+            tokens = {
+                scope: _Token(item["access_token"], float(item["expires_at"]))
+                for scope, item in payload.get("tokens", {}).items()
+            }
+        except (KeyError, TypeError, ValueError, AttributeError):
+            # Decifrou, mas o conteúdo não tem o formato esperado: trata como cache ausente
+            logger.warning("auth.token_cache.unreadable", path=path)
+            return
+        now = self._clock()
+        for scope, token in tokens.items():
+            if now < token.expires_at and scope not in self._tokens:
+                self._tokens[scope] = token
+        logger.info("auth.token_cache.loaded", scopes=len(self._tokens))
+
+    def _save_cache(self) -> None:
+        if self._cache is None:
+            return
+        path, fernet = self._cache
+        with self._cache_lock:
+            payload = {
+                "client": f"{self.tenant_id}:{self.client_id}",
+                "tokens": {
+                    scope: {"access_token": t.access_token, "expires_at": t.expires_at}
+                    for scope, t in dict(self._tokens).items()
+                },
+            }
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(fernet.encrypt(json.dumps(payload).encode()))
+                os.replace(tmp, path)
+            except OSError:
+                # Falha no cache não impede o uso do token
+                logger.warning("auth.token_cache.write_failed", path=path, exc_info=True)
@@ -0,0 +1,183 @@
+"""
+Perfil por etapa das execuções (`python -m application.main --profile`).
+
+`PROFILER.span(nome, **args)` marca um trecho: a conta, cada página do Graph,
+a conversão para DTO, a consulta das conversas, o UPSERT... Sem execução
+perfilada ativa, `span` devolve um contexto vazio compartilhado (uma leitura
+de atributo e nada mais). Com `PROFILER.run(...)` ativo, cada trecho vira um
+evento "X" do formato Chrome trace e, ao final, o arquivo
+`<dir>/<AAAAMMDDTHHMMSS>.trace.json` é gravado (abre em chrome://tracing ou
+ui.perfetto.dev). Opcionalmente:
+
+- `cpu`: cProfile por thread de conta (cProfile só enxerga a thread em que
+  foi ligado), somados em `<...>.prof` (`python -m pstats`);
+- `memory`: tracemalloc; o pico de memória vira um contador no trace ao fim
+  de cada conta e o snapshot final vai para `<...>.tracemalloc`.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class _Run:
+    """Eventos e perfis de uma execução perfilada."""
+
+    def __init__(self, cpu: bool, memory: bool) -> None:
+        self.cpu = cpu
+        self.memory = memory
+        self.pid = os.getpid()
+        self.origin_ns = time.perf_counter_ns()
+        self.events: List[dict] = []
+        self.threads: dict[int, str] = {}
+        self.stats: Optional[pstats.Stats] = None
+        self.lock = threading.Lock()
+
+    def now_us(self) -> float:
+        return (time.perf_counter_ns() - self.origin_ns) / 1000
+
+    def add(self, event: dict) -> None:
+        tid = threading.get_ident()
+        event["pid"], event["tid"] = self.pid, tid
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        self.events.append(event)
+
+    def merge(self, profile: cProfile.Profile) -> None:
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def trace(self) -> dict:
+        names = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.threads.items()
+        ]
+        return {"traceEvents": names + self.events, "displayTimeUnit": "ms"}
+
+
+class _Span:
+    __slots__ = ("_run", "_name", "_args", "_start")
+
+    def __init__(self, run: _Run, name: str, args: dict) -> None:
+        self._run = run
+        self._name = name
+        self._args = args
+
+    def __enter__(self) -> None:
+        self._start = self._run.now_us()
+
+    def __exit__(self, exc_type, *exc) -> None:
+        end = self._run.now_us()
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._run.add({
+            "name": self._name, "cat": self._name.split(".", 1)[0], "ph": "X",
+            "ts": self._start, "dur": end - self._start, "args": self._args,
+        })
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self._run: Optional[_Run] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._run is not None
+
+    def span(self, name: str, **args):
+        """Trecho cronometrado; o prefixo antes do primeiro `.` vira a categoria."""
+        run = self._run
+        if run is None:
+            return _NOOP
+        return _Span(run, name, args)
+
+    @contextmanager
+    def account(self, account: str) -> Iterator[None]:
+        """Trecho da conta, com cProfile da thread e o contador de memória, se ligados."""
+        run = self._run
+        if run is None:
+            yield
+            return
+        profile = cProfile.Profile() if run.cpu else None
+        with self.span("account", account=account):
+            if profile is not None:
+                profile.enable()
+            try:
+                yield
+            finally:
+                if profile is not None:
+                    profile.disable()
+                    run.merge(profile)
+        if run.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            run.add({
+                "name": "memory", "ph": "C", "ts": run.now_us(),
+                "args": {"current_mb": current / 2**20, "peak_mb": peak / 2**20},
+            })
+
+    @contextmanager
+    def run(self, directory: str, cpu: bool = False, memory: bool = False) -> Iterator[None]:
+        """Perfila o bloco e grava os arquivos em `directory` ao final (mesmo com erro)."""
+        if self._run is not None:
+            # Execução já perfilada (ex.: chamada aninhada): só acumula os trechos
+            yield
+            return
+        run = _Run(cpu, memory)
+        started_memory = memory and not tracemalloc.is_tracing()
+        if started_memory:
+            tracemalloc.start()
+        self._run = run
+        try:
+            with self.span("run"):
+                yield
+        finally:
+            self._run = None
+            self._write(run, directory)
+            if started_memory:
+                tracemalloc.stop()
+
+    @staticmethod
+    def _write(run: _Run, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, datetime.now().strftime("%Y%m%dT%H%M%S"))
+        files = [f"{base}.trace.json"]
+        with open(files[0], "w", encoding="utf-8") as fh:
+            json.dump(run.trace(), fh)
+        if run.stats is not None:
+            run.stats.dump_stats(f"{base}.prof")
+            files.append(f"{base}.prof")
+        if run.memory and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(f"{base}.tracemalloc")
+            files.append(f"{base}.tracemalloc")
+        logger.info("profile.written", files=files, spans=len(run.events))
+
+
+PROFILER = Profiler()
@@ -1,8 +1,7 @@
 import os
-import time
-from typing import Optional, Dict
+import socket
 
-import requests
+from config.auth import TokenManager
 
 # --- Configurações ---
 def _split_list(value: str | None) -> list[str]:
@@ -12,6 +11,7 @@ TENANT_ID = os.getenv("TENANT_ID")
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+LOGIN_BASE_URL = os.getenv("LOGIN_BASE_URL", "https://login.microsoftonline.com")
 EMAIL_ACCOUNTS: list[str] = _split_list(os.getenv("EMAIL_ACCOUNTS"))
 DB_HOST = os.getenv("POSTGRES_HOST")
 DB_PORT = int(os.getenv("POSTGRES_PORT"))
@@ -22,54 +22,85 @@ SENT_FOLDER_NAME = os.getenv("SENT_FOLDER_NAME", "itens enviados").lower()
 SUBJECT_FILTER = _split_list(os.getenv("SUBJECT_FILTER"))
 IGNORED_RECIPIENT_PATTERNS = _split_list(os.getenv("IGNORED_RECIPIENT_PATTERNS"))
 IGNORE_SUBJECT_PREFIXES = ["RES:", "ENC:", "FW:", "FWD:"]
+# Trechos de assunto descartados (e-mails de teste); comparação sem diferenciar maiúsculas
+EXCLUDED_SUBJECT_PATTERNS = [
+    p.lower() for p in _split_list(os.getenv("EXCLUDED_SUBJECT_PATTERNS", "oportunidade de acordo: - parte:"))
+]
+# Janela de look-back em dias (0 = pasta inteira); vai para o $filter do Graph.
+# Deve cobrir a conversa mais longa: o original que sai da janela não é mais reavaliado
+LOOKBACK_DAYS = max(0, int(os.getenv("LOOKBACK_DAYS", 0)))
+# Conversas sem resposta nem bounce de execuções anteriores voltam ao Graph a cada execução (a
+# resposta/NDR chega na Caixa de Entrada, fora do delta/janela de Enviados): só as iniciadas há até
+# OPEN_CONVERSATION_RECHECK_DAYS (0 = desliga) e checadas há mais de OPEN_CONVERSATION_RECHECK_INTERVAL_SEC,
+# no máximo OPEN_CONVERSATION_RECHECK_LIMIT por execução (as checadas há mais tempo primeiro)
+OPEN_CONVERSATION_RECHECK_DAYS = max(0, int(os.getenv("OPEN_CONVERSATION_RECHECK_DAYS", 14)))
+OPEN_CONVERSATION_RECHECK_INTERVAL_SEC = max(0.0, float(os.getenv("OPEN_CONVERSATION_RECHECK_INTERVAL_SEC", 3600)))
+OPEN_CONVERSATION_RECHECK_LIMIT = max(1, int(os.getenv("OPEN_CONVERSATION_RECHECK_LIMIT", 500)))
 DB_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-MAX_MIME_WORKERS=10
-MIME_TIMEOUT_SEC=30
+# "full" varre a pasta inteira; "delta" usa o deltaLink salvo no repositório
+GRAPH_SYNC_MODE = os.getenv("GRAPH_SYNC_MODE", "full").strip().lower()
+# "sync" usa requests; "async" usa httpx (HTTP/2, keep-alive) com até GRAPH_MAX_IN_FLIGHT requisições simultâneas
+GRAPH_CLIENT_MODE = os.getenv("GRAPH_CLIENT_MODE", "sync").strip().lower()
+GRAPH_MAX_IN_FLIGHT = int(os.getenv("GRAPH_MAX_IN_FLIGHT", 100))
+# "batch" processa a pasta como um único lote; "stream" processa e grava em lotes de ~PIPELINE_CHUNK_SIZE
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "batch").strip().lower()
+PIPELINE_CHUNK_SIZE = int(os.getenv("PIPELINE_CHUNK_SIZE", 1000))
+# Checkpoints por lote (modo stream + GRAPH_SYNC_MODE=full): execução interrompida retoma de onde parou
+RESUMABLE_RUNS = os.getenv("RESUMABLE_RUNS", "false").strip().lower() in ("1", "true", "yes")
+CHECKPOINT_MAX_AGE_HOURS = max(0.0, float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", 24)))
+# "copy" grava e-mails via COPY + merge em tabela temporária; "insert" usa INSERT ... ON CONFLICT em lotes
+DB_BULK_MODE = os.getenv("DB_BULK_MODE", "copy").strip().lower()
+# Contas processadas em paralelo por FetchAndStoreMetrics (1 = sequencial)
+ACCOUNT_WORKERS = max(1, int(os.getenv("ACCOUNT_WORKERS", 1)))
+# "all": cada instância processa todas as EMAIL_ACCOUNTS; "leases": as instâncias dividem as
+# contas por leases no Postgres (renovados a cada LEASE_TTL_SEC/3; vencidos são reassumidos)
+WORK_DISTRIBUTION = os.getenv("WORK_DISTRIBUTION", "all").strip().lower()
+NODE_ID = os.getenv("NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+LEASE_TTL_SEC = max(5.0, float(os.getenv("LEASE_TTL_SEC", 90)))
+# "daily" roda todas as contas às 08:00; "incremental" sincroniza cada conta em intervalos
+# adaptativos entre SYNC_MIN_INTERVAL_SEC (caixa ativa) e SYNC_MAX_INTERVAL_SEC (ociosa), ± SYNC_JITTER
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "daily").strip().lower()
+SYNC_MIN_INTERVAL_SEC = max(1.0, float(os.getenv("SYNC_MIN_INTERVAL_SEC", 300)))
+SYNC_MAX_INTERVAL_SEC = max(SYNC_MIN_INTERVAL_SEC, float(os.getenv("SYNC_MAX_INTERVAL_SEC", 3600)))
+SYNC_JITTER = min(0.5, max(0.0, float(os.getenv("SYNC_JITTER", 0.2))))
+# Pool de conexões do PostgreSQL (uma conexão por thread de conta + folga)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", max(5, ACCOUNT_WORKERS)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").strip().lower() in ("1", "true", "yes")
+# Partições mensais de `emails` (por sent_datetime): meses mantidos para trás e criados à frente;
+# EMAILS_RETENTION_MONTHS > 0 desanexa as partições mais antigas que isso (0 = nunca)
+EMAILS_PARTITION_MONTHS_BACK = max(0, int(os.getenv("EMAILS_PARTITION_MONTHS_BACK", 24)))
+EMAILS_PARTITION_MONTHS_AHEAD = max(1, int(os.getenv("EMAILS_PARTITION_MONTHS_AHEAD", 3)))
+EMAILS_RETENTION_MONTHS = max(0, int(os.getenv("EMAILS_RETENTION_MONTHS", 0)))
+# Fuso que define o "dia" dos rollups diários (email_daily_rollups)
+ROLLUP_TIMEZONE = os.getenv("ROLLUP_TIMEZONE", "America/Sao_Paulo").strip()
+# Endpoint Prometheus (/metrics); 0 desliga
+METRICS_PORT = int(os.getenv("METRICS_PORT", 8985))
+# Limitador adaptativo (token bucket + AIMD) compartilhado por Graph e Exchange
+RATE_LIMIT_MAILBOX_RPS = float(os.getenv("RATE_LIMIT_MAILBOX_RPS", 4))
+RATE_LIMIT_TENANT_RPS = float(os.getenv("RATE_LIMIT_TENANT_RPS", 50))
+RATE_LIMIT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", 0.5))
+RATE_LIMIT_MAX_FACTOR = float(os.getenv("RATE_LIMIT_MAX_FACTOR", 4))
+# Leitura dos cabeçalhos MIME: requisições simultâneas e tempo máximo por mensagem
+MAX_MIME_WORKERS = max(1, int(os.getenv("MAX_MIME_WORKERS", 10)))
+MIME_TIMEOUT_SEC = float(os.getenv("MIME_TIMEOUT_SEC", 30))
+# Enriquecimento de entrega (cabeçalhos MIME): e-mails por lote de cada conta e se roda após cada execução
+ENRICH_BATCH_SIZE = max(1, int(os.getenv("ENRICH_BATCH_SIZE", 500)))
+ENRICH_AFTER_RUN = os.getenv("ENRICH_AFTER_RUN", "false").strip().lower() in ("1", "true", "yes")
 
-class TokenProvider:
-    """
-    Um provedor de tokens que armazena em cache e pode obter tokens para diferentes APIs (escopos).
-    """
-    _token_cache: Dict[str, Dict] = {}
-    
-    # Escopo padrão para a API principal do Microsoft Graph
-    DEFAULT_SCOPE = "https://graph.microsoft.com/.default"
+# Tokens OAuth: renovação antecipada e cache em disco opcional (criptografado com Fernet)
+TOKEN_REFRESH_MARGIN_SEC = float(os.getenv("TOKEN_REFRESH_MARGIN_SEC", 300))
+TOKEN_CACHE_PATH = os.getenv("TOKEN_CACHE_PATH") or None
+TOKEN_CACHE_KEY = os.getenv("TOKEN_CACHE_KEY") or None
 
-    def get_token(self, scope: Optional[str] = None) -> str:
-        """
-        Obtém um token de acesso para o escopo especificado.
-        Se nenhum escopo for fornecido, usa o padrão do Graph.
-        """
-        target_scope = scope or self.DEFAULT_SCOPE
-        
-        # Verifica se já existe um token válido no cache para este escopo
-        if target_scope in self._token_cache:
-            cached_token = self._token_cache[target_scope]
-            if time.time() < cached_token.get("expires_at", 0):
-                return cached_token["access_token"]
-
-        # Se não houver token em cache, adquire um novo
-        url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
-        data = {
-            "grant_type": "client_credentials",
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
-            "scope": target_scope
-        }
-        
-        resp = requests.post(url, data=data)
-        resp.raise_for_status()
-        token_data = resp.json()
-
-        # Calcula o tempo de expiração com uma margem de 60 segundos
-        expires_at = time.time() + int(token_data.get("expires_in", 3599)) - 60
-        
-        # Armazena o novo token e o seu tempo de expiração no cache
-        self._token_cache[target_scope] = {
-            "access_token": token_data["access_token"],
-            "expires_at": expires_at
-        }
-        
-        return token_data["access_token"]
-
-TOKEN_PROVIDER = TokenProvider()
\ No newline at end of file
+TOKEN_PROVIDER = TokenManager(
+    TENANT_ID,
+    CLIENT_ID,
+    CLIENT_SECRET,
+    login_base_url=LOGIN_BASE_URL,
+    refresh_margin=TOKEN_REFRESH_MARGIN_SEC,
+    cache_path=TOKEN_CACHE_PATH,
+    cache_key=TOKEN_CACHE_KEY,
+)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(slots=True)
+class ConversationState:
+    """Veredito já apurado de uma conversa (bounce/resposta), persistido entre execuções."""
+    conversation_id: str
+    is_bounced: bool = False
+    is_replied: bool = False
+    first_reply_at: datetime | None = None
+    last_checked_at: datetime | None = None
+
+    @property
+    def is_final(self) -> bool:
+        """Bounce ou resposta não mudam mais; a conversa não precisa voltar ao Graph."""
+        return self.is_bounced or self.is_replied
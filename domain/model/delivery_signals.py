@@ -0,0 +1,17 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(slots=True)
+class DeliverySignals:
+    """Veredito de entrega de uma mensagem (cabeçalhos MIME), apurado uma única vez."""
+    internet_message_id: str
+    scl: int | None = None
+    dkim_pass: bool | None = None
+    spf_pass: bool | None = None
+    dmarc_pass: bool | None = None
+    from_ip: str | None = None
+    to_ip: str | None = None
+    delivery_latency_sec: float | None = None
+    analyzed_at: datetime | None = None
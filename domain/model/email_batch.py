@@ -0,0 +1,137 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+_T = TypeVar("_T", bound=Hashable)
+
+
+@dataclass(frozen=True, slots=True)
+class Verdict:
+    """Flags e métricas derivadas gravadas no e-mail original de uma conversa."""
+    is_bounced: bool = False
+    is_replied: bool = False
+    reply_latency_sec: float | None = None
+    engagement_score: int = 0
+    temperature_label: str = "frio"  # 'quente' | 'morno' | 'frio'
+
+
+NO_VERDICT = Verdict()
+
+
+class StringPool:
+    """
+    Uma única instância por valor repetido (ids de conversa, endereços,
+    listas de destinatários): as linhas de um lote guardam referências
+    para o mesmo objeto em vez de cópias vindas de cada página do Graph.
+    """
+
+    __slots__ = ("_values",)
+
+    def __init__(self) -> None:
+        self._values: Dict[Hashable, Hashable] = {}
+
+    def __call__(self, value: _T) -> _T:
+        return self._values.setdefault(value, value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class EmailBatch:
+    """
+    Lote de e-mails em colunas: uma lista por campo (flags do Graph em
+    `bytearray`), sem objeto, uuid nem lista de destinatários por mensagem.
+    A linha `i` é o i-ésimo valor de cada coluna.
+
+    Ids de conversa, endereços, tuplas de destinatários e importância passam
+    pelo `pool` do lote (`take`/`copy` o reaproveitam). As flags
+    derivadas só existem para o e-mail original de cada conversa, então ficam
+    esparsas em `verdicts` (linha -> `Verdict`; as demais usam `NO_VERDICT`).
+    """
+
+    COLUMNS = (
+        "message_id", "conversation_id", "subject", "sent_datetime", "to_addresses",
+        "is_read", "has_attachments", "importance", "is_read_receipt_requested",
+        "internet_message_id",
+    )
+    __slots__ = ("pool", "verdicts", *COLUMNS)
+
+    def __init__(self, pool: Optional[StringPool] = None) -> None:
+        self.pool = pool if pool is not None else StringPool()
+        self.message_id: List[str] = []
+        self.conversation_id: List[str] = []
+        self.subject: List[str | None] = []
+        self.sent_datetime: List[datetime | None] = []
+        self.to_addresses: List[Tuple[str, ...]] = []
+        self.is_read = bytearray()
+        self.has_attachments = bytearray()
+        self.importance: List[str | None] = []
+        self.is_read_receipt_requested = bytearray()
+        self.internet_message_id: List[str | None] = []
+        self.verdicts: Dict[int, Verdict] = {}
+
+    def __len__(self) -> int:
+        return len(self.message_id)
+
+    def append(
+        self,
+        message_id: str,
+        conversation_id: str,
+        subject: str | None,
+        sent_datetime: datetime | None,
+        to_addresses: Iterable[str] = (),
+        is_read: bool = False,
+        has_attachments: bool = False,
+        importance: str | None = None,
+        is_read_receipt_requested: bool = False,
+        internet_message_id: str | None = None,
+    ) -> int:
+        """Acrescenta uma linha (internando os valores repetidos); retorna o índice dela."""
+        pool = self.pool
+        self.message_id.append(message_id)
+        self.conversation_id.append(pool(conversation_id))
+        self.subject.append(subject)
+        self.sent_datetime.append(sent_datetime)
+        self.to_addresses.append(pool(tuple(pool(a) for a in to_addresses)))
+        self.is_read.append(bool(is_read))
+        self.has_attachments.append(bool(has_attachments))
+        self.importance.append(pool(importance))
+        self.is_read_receipt_requested.append(bool(is_read_receipt_requested))
+        self.internet_message_id.append(internet_message_id)
+        return len(self.message_id) - 1
+
+    def append_row(self, source: EmailBatch, i: int) -> int:
+        """Copia a linha `i` de `source`, sem o veredito; os valores já vêm internados."""
+        self.message_id.append(source.message_id[i])
+        self.conversation_id.append(source.conversation_id[i])
+        self.subject.append(source.subject[i])
+        self.sent_datetime.append(source.sent_datetime[i])
+        self.to_addresses.append(source.to_addresses[i])
+        self.is_read.append(source.is_read[i])
+        self.has_attachments.append(source.has_attachments[i])
+        self.importance.append(source.importance[i])
+        self.is_read_receipt_requested.append(source.is_read_receipt_requested[i])
+        self.internet_message_id.append(source.internet_message_id[i])
+        return len(self.message_id) - 1
+
+    def take(self, rows: Iterable[int]) -> EmailBatch:
+        """Novo lote (mesmo pool) só com as linhas informadas, na ordem dada, com os vereditos."""
+        out = EmailBatch(self.pool)
+        for i in rows:
+            row = out.append_row(self, i)
+            verdict = self.verdicts.get(i)
+            if verdict is not None:
+                out.verdicts[row] = verdict
+        return out
+
+    def copy(self) -> EmailBatch:
+        """Cópia rasa de todas as linhas (fatias das colunas, sem passar linha a linha)."""
+        out = EmailBatch(self.pool)
+        for name in self.COLUMNS:
+            setattr(out, name, getattr(self, name).copy())
+        out.verdicts = self.verdicts.copy()
+        return out
+
+    def verdict(self, i: int) -> Verdict:
+        return self.verdicts.get(i, NO_VERDICT)
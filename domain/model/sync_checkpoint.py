@@ -0,0 +1,16 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(slots=True)
+class SyncCheckpoint:
+    """Progresso já gravado de uma sincronização completa ainda não concluída."""
+    folder_id: str
+    next_link: str | None = None          # página seguinte ao último lote gravado (None: todas lidas)
+    boundary: datetime | None = None      # sent_datetime mais antigo já gravado
+    window_start: datetime | None = None  # início da janela de look-back da execução
+    chunks: int = 0                       # lotes confirmados
+    emails: int = 0                       # e-mails nesses lotes
+    started_at: datetime | None = None
+    updated_at: datetime | None = None
@@ -1,29 +1,21 @@
-import re
 import uuid
-from collections import defaultdict
-from datetime import date, datetime, timezone
-from typing import List
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
 import structlog
 
 from application.dto.email_dto import EmailDTO
-from config.settings import IGNORE_SUBJECT_PREFIXES
-from domain.model.email import Email
+from config.profiling import PROFILER
+from domain.model.conversation_state import ConversationState
+from domain.model.email_batch import EmailBatch, Verdict
 from domain.model.metrics import EmailMetrics
+from domain.service.filter_rules import FILTER_RULES
 from ports.graph_client import GraphClientPort
+from ports.persistence import ConversationStateRepositoryPort
 
 logger = structlog.get_logger(__name__).bind(service="email_metrics")
 
-_BOUNCE_INDICATORS_RE = re.compile(
-    r"undeliverable|falha na entrega|delivery has failed|não foi possível entregar|user doesn't exist|recipient address rejected",
-    re.I
-)
-_POSTMASTER_RE = re.compile(
-    r"postmaster|mailer-daemon|system administrator|microsoftexchange",
-    re.I
-)
-PREFIXES = tuple(p.upper() for p in IGNORE_SUBJECT_PREFIXES)
-
 def calculate_engagement_score(
     is_replied: bool, 
     is_bounced: bool, 
@@ -55,49 +47,137 @@ def score_to_label(score: int) -> str:
         return "frio"
     return "morno"
 
-def _is_bounce(m: Email) -> bool:
-    """Verifica se um e-mail é um bounce checando assunto, remetente E corpo."""
-    if _POSTMASTER_RE.search(m.from_address or ""):
-        return True
-    
-    text_to_check = (m.subject or "") + " " + (m.body_preview or "")
-    if _BOUNCE_INDICATORS_RE.search(text_to_check):
-        return True
-        
-    return False
-
 def _is_prefixed(subject: str | None) -> bool:
-    return (subject or "").lstrip().upper().startswith(PREFIXES)
+    return FILTER_RULES.is_prefixed(FILTER_RULES.match("subject", subject))
 
 def _label(rate: float) -> str:
     return "quente" if rate >= 0.50 else ("morno" if rate >= 0.20 else "frio")
 
-class EmailMetricsService:
-    def __init__(self, graph_client: GraphClientPort) -> None:
+def _reply_latency(is_replied: bool, original_sent: datetime | None, first_reply_at: datetime | None) -> float | None:
+    if is_replied and original_sent and first_reply_at:
+        latency_sec = (first_reply_at - original_sent).total_seconds()
+        if latency_sec > 0:
+            return latency_sec
+    return None
+
+def _verdict(is_bounced: bool, is_replied: bool, reply_latency_sec: float | None) -> Verdict:
+    score = calculate_engagement_score(is_replied, is_bounced, reply_latency_sec)
+    return Verdict(
+        is_bounced=is_bounced,
+        is_replied=is_replied,
+        reply_latency_sec=reply_latency_sec,
+        engagement_score=score,
+        temperature_label=score_to_label(score),
+    )
+
+@dataclass(slots=True)
+class _ConversationState:
+    """Estado incremental de uma conversa durante a execução."""
+    first_row: int                     # e-mail original mais antigo visto até agora (linha em `_firsts`)
+    first_sent: datetime | None        # sent_datetime desse e-mail
+    batch_row: int | None = None       # linha dele no lote em andamento, se veio nesse lote
+    count: int = 0                     # e-mails enviados da conversa nesta execução
+    clean: bool = False                # ao menos um e-mail sem prefixo ignorado
+    evaluated: bool = False            # bounce/reply já resolvidos via Graph
+    is_bounced: bool = False
+    is_replied: bool = False
+    first_reply_at: datetime | None = None
+    reply_latency_sec: float | None = None
+    stored_first: datetime | None = None  # e-mail mais antigo da conversa já gravado no banco
+
+    @property
+    def stored_older(self) -> bool:
+        """O original é um e-mail já gravado, anterior a todos os desta execução."""
+        return self.stored_first is not None and (self.first_sent is None or self.stored_first < self.first_sent)
+
+
+class DailyMetricsAccumulator:
+    """
+    Calcula as métricas de uma conta lote a lote.
+
+    Só guarda um estado por conversa (não a lista de e-mails), então pode ser
+    alimentado em streaming. As flags vão para o e-mail original mais antigo
+    da conversa; se um lote posterior trouxer um original ainda mais antigo,
+    o anterior perde as flags e é devolvido por `add` para ser regravado.
+    Para isso, a linha de cada original fica copiada em `_firsts` (os lotes
+    já gravados não são retidos); as linhas substituídas são descartadas
+    quando passam de metade de `_firsts` (ver `_COMPACT_MIN_DEAD`).
+
+    Com `state_repo`, conversas já finalizadas (bounce ou resposta) usam o
+    veredito salvo e só as abertas voltam ao Graph. Além disso, uma execução
+    parcial (delta ou janela de look-back) só vê parte de cada conversa: se já
+    há no banco um e-mail mais antigo dela, o original é esse, e nenhum e-mail
+    desta execução recebe as flags (nem fica com as de uma execução anterior).
+    As conversas abertas que não vieram na execução voltam ao Graph em
+    `recheck_open`.
+    """
+
+    _COMPACT_MIN_DEAD = 1024  # linhas substituídas em `_firsts` antes de valer a pena recopiar
+
+    def __init__(
+        self,
+        graph_client: GraphClientPort,
+        account: str,
+        state_repo: Optional[ConversationStateRepositoryPort] = None,
+    ) -> None:
         self.graph = graph_client
+        self.account = account
+        self.state_repo = state_repo
+        self.log = logger.new(account=account)
+        self._states: Dict[str, _ConversationState] = {}
+        self._firsts: EmailBatch | None = None
+        self._dead_firsts = 0  # linhas de `_firsts` que já não são o original de nenhuma conversa
+        self._total = 0
+        self._latest: datetime | None = None
 
-    @staticmethod
-    def _to_domain(dto: EmailDTO) -> Email:
-        return Email(
-            message_id=dto.id,
-            internet_message_id=dto.internet_message_id,
-            subject=dto.subject,
-            sent_datetime=dto.sent_datetime,
-            is_read=dto.is_read,
-            conversation_id=dto.conversation_id,
-            has_attachments=dto.has_attachments,
-            to_addresses=dto.to_addresses,
-            importance=dto.importance,
-            is_read_receipt_requested=dto.is_read_receipt_requested,
-            from_address=dto.from_address,
-            body_preview=dto.body_preview
-        )
+    def add(self, batch: EmailBatch) -> EmailBatch:
+        """Incorpora um lote e retorna os e-mails a persistir (lote + rebaixados)."""
+        if self._firsts is None:
+            self._firsts = EmailBatch()  # pool próprio: não retém o do primeiro lote
+        firsts = self._firsts
+        demoted: List[int] = []
+        new_convs: List[str] = []
+        touched: Dict[str, _ConversationState] = {}
 
-    def calculate_daily_metrics(self, sent_emails: List[Email], account: str) -> EmailMetrics:
-        log = logger.new(total_raw=len(sent_emails), account=account)
-        log.info("metrics.calc.start")
+        for i, (conv_id, sent) in enumerate(zip(batch.conversation_id, batch.sent_datetime)):
+            self._total += 1
+            if sent and (self._latest is None or sent > self._latest):
+                self._latest = sent
 
-        if not sent_emails:
+            state = self._states.get(conv_id)
+            if state is None:
+                state = self._states[conv_id] = _ConversationState(firsts.append_row(batch, i), sent, i)
+                new_convs.append(conv_id)
+            elif sent < state.first_sent:
+                # Original de um lote anterior: volta sem as flags; deste lote, ainda não tem flags
+                if state.batch_row is None:
+                    demoted.append(state.first_row)
+                state.first_row, state.first_sent, state.batch_row = firsts.append_row(batch, i), sent, i
+                self._dead_firsts += 1
+            state.count += 1
+            state.clean = state.clean or not _is_prefixed(batch.subject[i])
+            touched[conv_id] = state
+
+        if new_convs:
+            self._load_stored_starts(new_convs)
+            self._evaluate(new_convs)
+
+        for state in touched.values():
+            self._apply(state, batch)
+            state.batch_row = None
+
+        out = batch
+        if demoted:
+            out = batch.copy()
+            for row in demoted:
+                out.append_row(firsts, row)
+        if self._dead_firsts >= max(self._COMPACT_MIN_DEAD, len(firsts) // 2):
+            self._compact_firsts()
+        return out
+
+    def result(self) -> EmailMetrics:
+        log = self.log.bind(total_raw=self._total)
+        if not self._total:
             log.warn("metrics.calc.skip_empty_list")
             return EmailMetrics(
                 id=uuid.uuid4(), run_at=datetime.now(timezone.utc), date=date.today(),
@@ -106,74 +186,24 @@ class EmailMetricsService:
                 temperature_label='frio'
             )
 
-        conv_map: dict[str, List[Email]] = defaultdict(list)
-        for mail in sent_emails:
-            conv_map[mail.conversation_id].append(mail)
-
         bounced_convs, replied_convs = 0, 0
         raw_bounced, raw_replied = 0, 0
         reply_latencies: List[float] = []
+        total_sent = 0
 
-        for conv_id, mails_in_conv in conv_map.items():
-            try:
-                head_dtos = self.graph.fetch_conversation_head(account, conv_id)
-                head_mails = sorted([self._to_domain(dto) for dto in head_dtos], key=lambda m: m.sent_datetime)
-            except Exception:
-                log.exception("metrics.thread.error", conv_id=conv_id)
-                continue
-
-            first_original_mail = sorted(mails_in_conv, key=lambda m: m.sent_datetime)[0]
-            
-            is_bounce_thread = any(_is_bounce(m) for m in head_mails)
-            first_reply_mail = None
-            is_reply_thread = False
-
-            if not is_bounce_thread:
-                first_reply_mail = next((m for m in head_mails if m.from_address and m.from_address.lower() != account.lower() and not _is_prefixed(m.subject)), None)
-                is_reply_thread = first_reply_mail is not None
-
-            first_original_mail.is_bounced = is_bounce_thread
-            first_original_mail.is_replied = is_reply_thread
-            
-            if is_bounce_thread:
+        for state in self._states.values():
+            total_sent += state.clean
+            if state.is_bounced:
                 bounced_convs += 1
-                raw_bounced += len(mails_in_conv)
-            elif is_reply_thread:
+                raw_bounced += state.count
+            elif state.is_replied:
                 replied_convs += 1
-                raw_replied += len(mails_in_conv)
-                if first_original_mail.sent_datetime and first_reply_mail.sent_datetime:
-                    latency = first_reply_mail.sent_datetime - first_original_mail.sent_datetime
-                    latency_sec = latency.total_seconds()
-                    if latency_sec > 0:
-                        first_original_mail.reply_latency_sec = latency_sec
-                        reply_latencies.append(latency_sec)
-
-            score = calculate_engagement_score(
-                is_reply_thread,
-                is_bounce_thread,
-                first_original_mail.reply_latency_sec 
-            )
-            first_original_mail.engagement_score = score
-            first_original_mail.temperature_label = score_to_label(score)
+                raw_replied += state.count
+                if state.reply_latency_sec is not None:
+                    reply_latencies.append(state.reply_latency_sec)
 
-            if is_bounce_thread:
-                bounced_convs += 1
-                raw_bounced += len(mails_in_conv)
-            elif is_reply_thread:
-                replied_convs += 1
-                raw_replied += len(mails_in_conv)
-                if first_original_mail.sent_datetime and first_reply_mail.sent_datetime:
-                    latency = first_reply_mail.sent_datetime - first_original_mail.sent_datetime
-                    latency_sec = latency.total_seconds()
-                    if latency_sec > 0:
-                        first_original_mail.reply_latency_sec = latency_sec
-                        reply_latencies.append(latency_sec)
-
-        raw_total_sent = len(sent_emails)
+        raw_total_sent = self._total
         raw_total_delivered = raw_total_sent - raw_bounced
-        
-        clean_conv_ids = {e.conversation_id for e in sent_emails if not _is_prefixed(e.subject)}
-        total_sent = len(clean_conv_ids)
         total_delivered = total_sent - bounced_convs
 
         avg_reply_latency = sum(reply_latencies) / len(reply_latencies) if reply_latencies else None
@@ -183,7 +213,7 @@ class EmailMetricsService:
         metrics = EmailMetrics(
             id=uuid.uuid4(),
             run_at=datetime.now(timezone.utc),
-            date=sent_emails[0].sent_datetime.date(),
+            date=self._latest.date(),
             total_sent=total_sent,
             total_delivered=total_delivered,
             total_bounced=bounced_convs,
@@ -199,4 +229,211 @@ class EmailMetricsService:
         )
 
         log.info("metrics.calc.success", **metrics.to_dict())
-        return metrics
\ No newline at end of file
+        return metrics
+
+    def recheck_open(self, max_age: timedelta, min_interval: timedelta, limit: int) -> int:
+        """
+        Volta ao Graph com as conversas abertas de execuções anteriores que
+        esta execução não trouxe (a resposta ou o NDR chega na Caixa de
+        Entrada, não no delta/janela de Enviados): iniciadas há até `max_age`,
+        checadas há mais de `min_interval`, no máximo `limit`. As que fecharam
+        têm o veredito gravado no e-mail original já salvo. Não entra nas
+        métricas desta execução (só nos rollups). Retorna os e-mails alterados.
+        """
+        if self.state_repo is None:
+            return 0
+        now = datetime.now(timezone.utc)
+        try:
+            starts = self.state_repo.get_open_conversations(self.account, now - max_age, now - min_interval, limit)
+        except Exception:
+            self.log.exception("metrics.open_conversations.load_error")
+            return 0
+        # As desta execução já foram avaliadas em `_evaluate`
+        conv_ids = [conv_id for conv_id in starts if conv_id not in self._states]
+        if not conv_ids:
+            return 0
+
+        try:
+            with PROFILER.span("graph.conversation_heads", conversations=len(conv_ids)):
+                heads = self.graph.fetch_conversation_heads(self.account, conv_ids)
+        except Exception:
+            self.log.exception("metrics.heads.error", conversations=len(conv_ids))
+            return 0
+
+        checked: List[ConversationState] = []
+        verdicts: Dict[str, Verdict] = {}
+        for conv_id in conv_ids:
+            head_dtos = heads.get(conv_id)
+            if head_dtos is None:
+                self.log.warning("metrics.thread.error", conv_id=conv_id)
+                continue
+            is_bounced, is_replied, first_reply_at = self._judge(head_dtos)
+            checked.append(ConversationState(conv_id, is_bounced, is_replied, first_reply_at, now))
+            if is_bounced or is_replied:
+                latency = _reply_latency(is_replied, starts[conv_id], first_reply_at)
+                verdicts[conv_id] = _verdict(is_bounced, is_replied, latency)
+
+        with PROFILER.span("db.save_conversation_states", conversations=len(checked)):
+            self._store(checked)
+        updated = 0
+        if verdicts:
+            try:
+                with PROFILER.span("db.save_original_verdicts", conversations=len(verdicts)):
+                    updated = self.state_repo.save_original_verdicts(self.account, verdicts)
+            except Exception:
+                self.log.exception("metrics.open_conversations.save_error", conversations=len(verdicts))
+        self.log.info("metrics.open_conversations.rechecked", checked=len(checked), closed=len(verdicts))
+        return updated
+
+    # ------------------------------------------------------------------ #
+    #  Helpers                                                           #
+    # ------------------------------------------------------------------ #
+    def _compact_firsts(self) -> None:
+        """Recopia só as linhas ainda vivas de `_firsts` (depois de `add` montar os rebaixados)."""
+        old, firsts = self._firsts, EmailBatch()
+        for state in self._states.values():
+            state.first_row = firsts.append_row(old, state.first_row)
+        self.log.debug("metrics.firsts.compacted", dropped=self._dead_firsts, rows=len(firsts))
+        self._firsts, self._dead_firsts = firsts, 0
+
+    def _evaluate(self, conv_ids: List[str]) -> None:
+        """
+        Resolve bounce/reply das conversas novas: primeiro pelos vereditos
+        salvos, depois com uma busca em lote no Graph para as que seguem abertas.
+        """
+        with PROFILER.span("metrics.restore_states", conversations=len(conv_ids)):
+            open_ids = self._restore_final(conv_ids)
+        if not open_ids:
+            return
+
+        try:
+            with PROFILER.span("graph.conversation_heads", conversations=len(open_ids)):
+                heads = self.graph.fetch_conversation_heads(self.account, open_ids)
+        except Exception:
+            self.log.exception("metrics.heads.error", conversations=len(open_ids))
+            heads = {}
+
+        checked_at = datetime.now(timezone.utc)
+        checked: List[ConversationState] = []
+        for conv_id in open_ids:
+            head_dtos = heads.get(conv_id)
+            if head_dtos is None:
+                self.log.warning("metrics.thread.error", conv_id=conv_id)
+                continue
+            state = self._states[conv_id]
+            state.evaluated = True
+            state.is_bounced, state.is_replied, state.first_reply_at = self._judge(head_dtos)
+            checked.append(
+                ConversationState(
+                    conversation_id=conv_id,
+                    is_bounced=state.is_bounced,
+                    is_replied=state.is_replied,
+                    first_reply_at=state.first_reply_at,
+                    last_checked_at=checked_at,
+                )
+            )
+
+        with PROFILER.span("db.save_conversation_states", conversations=len(checked)):
+            self._store(checked)
+
+    def _judge(self, head_dtos: List[EmailDTO]) -> Tuple[bool, bool, datetime | None]:
+        """Bounce, resposta e horário da primeira resposta a partir da cabeça da conversa."""
+        head_mails = sorted(head_dtos, key=lambda m: m.sent_datetime)
+        # Uma varredura por e-mail responde bounce e prefixo de uma vez
+        hits = [
+            FILTER_RULES.classify(subject=m.subject, sender=m.from_address, body=m.body_preview)
+            for m in head_mails
+        ]
+        if any(FILTER_RULES.is_bounce(h) for h in hits):
+            return True, False, None
+        account = self.account.lower()
+        first_reply_mail = next((m for m, h in zip(head_mails, hits) if m.from_address and m.from_address.lower() != account and not FILTER_RULES.is_prefixed(h)), None)
+        if first_reply_mail is None:
+            return False, False, None
+        return False, True, first_reply_mail.sent_datetime
+
+    def _load_stored_starts(self, conv_ids: List[str]) -> None:
+        """Marca nas conversas novas o `sent_datetime` do e-mail mais antigo já gravado."""
+        if self.state_repo is None:
+            return
+        try:
+            with PROFILER.span("db.conversation_starts", conversations=len(conv_ids)):
+                starts = self.state_repo.get_conversation_starts(self.account, conv_ids)
+        except Exception:
+            self.log.exception("metrics.conversation_starts.load_error", conversations=len(conv_ids))
+            return
+        for conv_id, sent in starts.items():
+            self._states[conv_id].stored_first = sent
+
+    def _restore_final(self, conv_ids: List[str]) -> List[str]:
+        """Aplica os vereditos finais salvos; retorna as conversas ainda abertas."""
+        if self.state_repo is None:
+            return conv_ids
+        try:
+            saved = self.state_repo.get_conversation_states(self.account, conv_ids)
+        except Exception:
+            self.log.exception("metrics.conversation_state.load_error", conversations=len(conv_ids))
+            return conv_ids
+
+        open_ids: List[str] = []
+        for conv_id in conv_ids:
+            known = saved.get(conv_id)
+            if known is None or not known.is_final:
+                open_ids.append(conv_id)
+                continue
+            state = self._states[conv_id]
+            state.evaluated = True
+            state.is_bounced = known.is_bounced
+            state.is_replied = known.is_replied
+            state.first_reply_at = known.first_reply_at
+        self.log.debug(
+            "metrics.conversation_state.restored",
+            final=len(conv_ids) - len(open_ids), open=len(open_ids),
+        )
+        return open_ids
+
+    def _store(self, checked: List[ConversationState]) -> None:
+        """Salva os vereditos apurados; falha aqui só custa uma nova consulta na próxima execução."""
+        if self.state_repo is None or not checked:
+            return
+        try:
+            self.state_repo.save_conversation_states(self.account, checked)
+        except Exception:
+            self.log.exception("metrics.conversation_state.save_error", conversations=len(checked))
+
+    @staticmethod
+    def _apply(state: _ConversationState, batch: EmailBatch) -> None:
+        """
+        Calcula o veredito e a pontuação do e-mail original da conversa e os
+        marca no lote, se o original veio nele (um de lote anterior já foi
+        gravado; um de execução anterior, idem: o e-mail do lote fica sem flags).
+        """
+        if not state.evaluated:
+            return
+        stored_older = state.stored_older
+        original_sent = state.stored_first if stored_older else state.first_sent
+        state.reply_latency_sec = _reply_latency(state.is_replied, original_sent, state.first_reply_at)
+        if state.batch_row is not None and not stored_older:
+            batch.verdicts[state.batch_row] = _verdict(state.is_bounced, state.is_replied, state.reply_latency_sec)
+
+
+class EmailMetricsService:
+    def __init__(
+        self,
+        graph_client: GraphClientPort,
+        state_repo: Optional[ConversationStateRepositoryPort] = None,
+    ) -> None:
+        self.graph = graph_client
+        self.state_repo = state_repo
+
+    def accumulator(self, account: str) -> DailyMetricsAccumulator:
+        """Acumulador incremental para o modo streaming (ver `DailyMetricsAccumulator`)."""
+        return DailyMetricsAccumulator(self.graph, account, self.state_repo)
+
+    def calculate_daily_metrics(self, sent_emails: EmailBatch, account: str) -> EmailMetrics:
+        log = logger.new(total_raw=len(sent_emails), account=account)
+        log.info("metrics.calc.start")
+
+        acc = self.accumulator(account)
+        acc.add(sent_emails)
+        return acc.result()
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from config.settings import (
+    EXCLUDED_SUBJECT_PATTERNS,
+    IGNORE_SUBJECT_PREFIXES,
+    IGNORED_RECIPIENT_PATTERNS,
+    SUBJECT_FILTER,
+)
+
+# --- nomes das regras -------------------------------------------------------
+SUBJECT_MATCH = "subject_filter"          # assunto contém um termo de SUBJECT_FILTER
+SUBJECT_EXCLUDED = "excluded_subject"     # assunto contém um trecho excluído (testes)
+RECIPIENT_IGNORED = "ignored_recipient"   # algum destinatário casa IGNORED_RECIPIENT_PATTERNS
+SUBJECT_PREFIXED = "ignored_prefix"       # assunto começa com RES:/ENC:/FW:...
+BOUNCE_SENDER = "bounce_sender"           # remetente é um sistema (postmaster, ...)
+BOUNCE_TEXT = "bounce_text"               # assunto/corpo indicam falha na entrega
+
+BOUNCE_SENDER_TERMS = ("postmaster", "mailer-daemon", "system administrator", "microsoftexchange")
+BOUNCE_TEXT_TERMS = (
+    "undeliverable", "falha na entrega", "delivery has failed",
+    "não foi possível entregar", "user doesn't exist", "recipient address rejected",
+)
+
+FIELDS = ("subject", "recipients", "sender", "body")
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """
+    Regra de texto: casa se algum dos `terms` aparece (sem diferenciar
+    maiúsculas) em algum dos `fields`. Com `anchored`, o termo precisa
+    estar no início do campo, ignorando espaços.
+    """
+    name: str
+    fields: tuple[str, ...]
+    terms: tuple[str, ...]
+    anchored: bool = False
+
+
+class _FieldMatcher:
+    """
+    Todos os termos de um campo compilados em uma única alternação.
+
+    A alternação é gerada a partir de uma trie dos termos (prefixos comuns
+    fatorados, opcionais gulosos), então o `re` testa cada caractere uma vez
+    por posição e cada casamento é o termo mais longo que começa ali; `_closure` leva
+    desse termo a todas as regras cujos termos são substrings dele. Quando um
+    termo pode se sobrepor ao começo de outro (o que a busca sem sobreposição
+    perderia), a varredura recomeça um caractere adiante, como o link de falha
+    de um autômato Aho-Corasick. Termos ancorados viram um `match` separado.
+    """
+
+    __slots__ = ("_pattern", "_closure", "_overlapping", "_anchored", "_anchored_rules")
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        term_rules: Dict[str, set[str]] = {}
+        anchored_rules: Dict[str, set[str]] = {}
+        for rule in rules:
+            target = anchored_rules if rule.anchored else term_rules
+            for term in rule.terms:
+                # Termos ancorados valem após os espaços iniciais, então não começam com espaço
+                term = term.lstrip().lower() if rule.anchored else term.lower()
+                if term:
+                    target.setdefault(term, set()).add(rule.name)
+
+        terms = sorted(term_rules, key=len, reverse=True)
+        self._pattern = re.compile(self._trie_pattern(terms)) if terms else None
+        self._closure: Dict[str, FrozenSet[str]] = {
+            t: frozenset(name for u in terms if u in t for name in term_rules[u]) for t in terms
+        }
+        self._overlapping = frozenset(t for t in terms if self._may_overlap(t, terms))
+
+        anchored = sorted(anchored_rules, key=len, reverse=True)
+        self._anchored = (
+            re.compile(r"\s*+(" + self._trie_pattern(anchored) + ")") if anchored else None
+        )
+        self._anchored_rules = {
+            t: frozenset(name for u in anchored if t.startswith(u) for name in anchored_rules[u])
+            for t in anchored
+        }
+
+    def match(self, text: str) -> FrozenSet[str]:
+        hits: FrozenSet[str] = frozenset()
+        if self._anchored is not None:
+            m = self._anchored.match(text)
+            if m:
+                hits = self._anchored_rules[m.group(1)]
+        if self._pattern is None:
+            return hits
+
+        search = self._pattern.search
+        pos = 0
+        while (m := search(text, pos)) is not None:
+            term = m.group()
+            hits = hits | self._closure[term]
+            pos = m.start() + 1 if term in self._overlapping else m.end()
+        return hits
+
+    @staticmethod
+    def _trie_pattern(terms: Iterable[str]) -> str:
+        """Regex equivalente a `t1|t2|...` com prefixos fatorados, preferindo o mais longo."""
+        trie: dict = {}
+        for term in terms:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        def emit(node: dict) -> str:
+            alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+            if not alts:
+                return ""
+            body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+            # Fim de termo com continuação: o `?` guloso tenta primeiro o termo mais longo
+            return f"(?:{body})?" if "" in node else body
+
+        return emit(trie)
+
+    @staticmethod
+    def _may_overlap(term: str, terms: Sequence[str]) -> bool:
+        """True se um sufixo próprio de `term` é prefixo de um termo que não cabe em `term`."""
+        for other in terms:
+            if other in term:
+                continue
+            for k in range(1, len(term)):
+                suffix = term[k:]
+                if len(other) > len(suffix) and other.startswith(suffix):
+                    return True
+        return False
+
+
+class FilterRules:
+    """
+    Motor de regras compilado uma vez a partir da configuração.
+
+    `classify` varre cada campo da mensagem uma única vez (todas as regras do
+    campo no mesmo autômato) e devolve o conjunto de regras que casaram;
+    os predicados `accepts`, `is_bounce` e `is_prefixed` leem esse conjunto.
+    """
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.rules: List[Rule] = list(rules)
+        self._matchers: Dict[str, _FieldMatcher] = {
+            field: _FieldMatcher([r for r in self.rules if field in r.fields])
+            for field in FIELDS
+        }
+
+    @classmethod
+    def from_settings(cls) -> "FilterRules":
+        return cls([
+            Rule(SUBJECT_MATCH, ("subject",), tuple(SUBJECT_FILTER)),
+            Rule(SUBJECT_EXCLUDED, ("subject",), tuple(EXCLUDED_SUBJECT_PATTERNS)),
+            Rule(SUBJECT_PREFIXED, ("subject",), tuple(IGNORE_SUBJECT_PREFIXES), anchored=True),
+            Rule(RECIPIENT_IGNORED, ("recipients",), tuple(IGNORED_RECIPIENT_PATTERNS)),
+            Rule(BOUNCE_SENDER, ("sender",), BOUNCE_SENDER_TERMS),
+            Rule(BOUNCE_TEXT, ("subject", "body"), BOUNCE_TEXT_TERMS),
+        ])
+
+    def classify(
+        self,
+        subject: Optional[str] = None,
+        recipients: Iterable[str] = (),
+        sender: Optional[str] = None,
+        body: Optional[str] = None,
+    ) -> FrozenSet[str]:
+        """Regras que casam com a mensagem; campos None/vazios não são varridos."""
+        hits: FrozenSet[str] = frozenset()
+        if subject:
+            hits = self._matchers["subject"].match(subject.lower())
+        if recipients:
+            # Cada destinatário separado por "\n" para nenhum termo casar entre dois endereços
+            hits = hits | self._matchers["recipients"].match("\n".join(recipients).lower())
+        if sender:
+            hits = hits | self._matchers["sender"].match(sender.lower())
+        if body:
+            hits = hits | self._matchers["body"].match(body.lower())
+        return hits
+
+    def match(self, field: str, text: Optional[str]) -> FrozenSet[str]:
+        """Regras que casam com um único campo."""
+        return self._matchers[field].match(text.lower()) if text else frozenset()
+
+    # --- predicados --------------------------------------------------------
+    @staticmethod
+    def accepts(hits: FrozenSet[str]) -> bool:
+        """Entra no processamento: assunto filtrado, não excluído, sem destinatário ignorado."""
+        return SUBJECT_MATCH in hits and SUBJECT_EXCLUDED not in hits and RECIPIENT_IGNORED not in hits
+
+    @staticmethod
+    def is_bounce(hits: FrozenSet[str]) -> bool:
+        return BOUNCE_SENDER in hits or BOUNCE_TEXT in hits
+
+    @staticmethod
+    def is_prefixed(hits: FrozenSet[str]) -> bool:
+        return SUBJECT_PREFIXED in hits
+
+
+FILTER_RULES = FilterRules.from_settings()
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
 from application.dto.trace_dto import MessageTraceDTO
 
@@ -29,4 +29,29 @@ class ExchangeAdminPort(ABC):
         Returns:
             Um MessageTraceDTO com os detalhes de entrega ou None se não for encontrado.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def trace_messages(
+        self,
+        sender_address: str,
+        message_ids: Iterable[str],
+        start: datetime,
+        end: datetime
+    ) -> Dict[str, MessageTraceDTO]:
+        """
+        Rastreia várias mensagens de um mesmo remetente enviadas em [start, end].
+
+        A implementação padrão faz uma consulta por mensagem; adaptadores que
+        conseguem ler o rastreamento da janela inteira de uma vez devem
+        sobrescrevê-la.
+
+        Returns:
+            Dicionário Message-ID (como recebido) -> MessageTraceDTO; mensagens
+            não encontradas ficam de fora.
+        """
+        found: Dict[str, MessageTraceDTO] = {}
+        for message_id in message_ids:
+            trace = self.trace_message_by_id(message_id, sender_address, end)
+            if trace is not None:
+                found[message_id] = trace
+        return found
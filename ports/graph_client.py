@@ -1,20 +1,122 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
 from application.dto.email_dto import EmailDTO
 from application.dto.folder_dto import FolderDTO
+from application.dto.mime_headers_dto import MimeHeadersDTO
+from application.dto.page_dto import MessagePageDTO
 
 class GraphClientPort:
     def fetch_mail_folders(self, account: str) -> List[FolderDTO]:
         """Lista todas as mailFolders do usuário."""
         raise NotImplementedError
 
-    def fetch_conversation_head(self, account: str, conversation_id: str, top: int = 10) -> List[EmailDTO]: 
+    def fetch_conversation_head(self, account: str, conversation_id: str, top: int = 10) -> List[EmailDTO]:
+        raise NotImplementedError
+
+    def fetch_conversation_heads(
+        self,
+        account: str,
+        conversation_ids: Iterable[str],
+        top: int = 10
+    ) -> Dict[str, List[EmailDTO]]:
+        """
+        Busca o head de várias conversas. Conversas cuja consulta falhou
+        ficam fora do resultado. Implementação padrão: uma chamada por conversa.
+        """
+        heads: Dict[str, List[EmailDTO]] = {}
+        for conv_id in dict.fromkeys(conversation_ids):
+            try:
+                heads[conv_id] = self.fetch_conversation_head(account, conv_id, top)
+            except Exception:
+                continue
+        return heads
+
+    def fetch_message_headers(self, account: str, message_id: str, timeout: Optional[float] = None) -> str:
+        """
+        Só o bloco de cabeçalhos do MIME da mensagem (até a primeira linha em
+        branco), sem baixar o corpo nem os anexos. `timeout` limita a leitura toda.
+        """
+        raise NotImplementedError
+
+    def fetch_message_headers_many(
+        self,
+        account: str,
+        message_ids: Iterable[str],
+        max_workers: int,
+        timeout: float
+    ) -> Dict[str, str]:
+        """
+        Cabeçalhos de várias mensagens, até `max_workers` ao mesmo tempo.
+        Mensagens cuja leitura falhou ficam fora do resultado.
+        Implementação padrão: `fetch_message_headers` num pool de threads.
+        """
+        ids = list(dict.fromkeys(message_ids))
+        heads: Dict[str, str] = {}
+        if not ids:
+            return heads
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mime") as pool:
+            futures = {pool.submit(self.fetch_message_headers, account, mid, timeout): mid for mid in ids}
+            for future, mid in futures.items():
+                try:
+                    heads[mid] = future.result()
+                except Exception:
+                    continue
+        return heads
+
+    def analyze_message_headers(
+        self,
+        account: str,
+        message_ids: Iterable[str],
+        max_workers: int,
+        timeout: float
+    ) -> Dict[str, MimeHeadersDTO]:
+        """
+        Sinais de entrega (SCL, DKIM/SPF/DMARC, IPs, latência) a partir dos
+        cabeçalhos MIME de cada mensagem; as que falharam ficam de fora.
+        """
         raise NotImplementedError
 
     def fetch_messages_in_folder(
         self,
         account: str,
         folder_id: str,
-        page_size: int = 50
+        page_size: int = 50,
+        since: Optional[datetime] = None
     ) -> List[EmailDTO]:
-        """Retorna todas as mensagens de uma pasta, paginando."""
+        """Retorna as mensagens da pasta (apenas as enviadas desde `since`, se informado)."""
+        raise NotImplementedError
+
+    def iter_messages_in_folder(
+        self,
+        account: str,
+        folder_id: str,
+        page_size: int = 50,
+        since: Optional[datetime] = None,
+        start_link: Optional[str] = None,
+    ) -> Iterator[MessagePageDTO]:
+        """
+        Entrega as mensagens da pasta página a página, sem acumular a pasta.
+        Com `since`, para de paginar ao passar do início da janela. Com
+        `start_link` (o `next_link` de uma página já processada), retoma a
+        paginação daquele ponto.
+        Implementação padrão: uma única página com `fetch_messages_in_folder`
+        (sem retomada: a pasta inteira vem de novo).
+        """
+        yield MessagePageDTO(emails=self.fetch_messages_in_folder(account, folder_id, page_size, since))
+
+    def iter_message_delta(
+        self,
+        account: str,
+        folder_id: str,
+        delta_link: Optional[str] = None,
+        page_size: int = 50,
+        since: Optional[datetime] = None
+    ) -> Iterator[MessagePageDTO]:
+        """
+        Itera sobre as páginas da consulta delta da pasta.
+        Sem `delta_link` (ou com token expirado) faz a sincronização completa,
+        limitada a `since` se informado; a última página traz o `delta_link`
+        da próxima execução.
+        """
         raise NotImplementedError
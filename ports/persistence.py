@@ -1,13 +1,178 @@
-from domain.model.email import Email
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from domain.model.conversation_state import ConversationState
+from domain.model.delivery_signals import DeliverySignals
+from domain.model.email_batch import EmailBatch, Verdict
 from domain.model.metrics import EmailMetrics
-from typing import List
+from domain.model.sync_checkpoint import SyncCheckpoint
+from typing import ContextManager, Dict, Iterable, Iterator, List, Optional
+
+@dataclass
+class UpsertStats:
+    """Resultado de um UPSERT: linhas novas, alteradas e idênticas às já gravadas."""
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __add__(self, other: "UpsertStats") -> "UpsertStats":
+        return UpsertStats(
+            self.inserted + other.inserted,
+            self.updated + other.updated,
+            self.unchanged + other.unchanged,
+        )
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
 
 class EmailRepositoryPort:
-    def save_all(self, emails: List[Email]) -> None:
-        """Persistir lista de e-mails."""
+    def save_all(self, account_email: str, emails: EmailBatch) -> UpsertStats:
+        """Persistir o lote de e-mails; linhas sem mudança não são reescritas."""
+        raise NotImplementedError
+
+    def preload_accounts(self, account_emails: Iterable[str]) -> None:
+        """Garante/carrega as contas de uma vez antes da execução. Padrão: nada a fazer."""
+        return None
+
+    def maintain_partitions(self) -> None:
+        """Cria as partições futuras e desanexa as vencidas. Padrão: nada a fazer."""
+        return None
+
+    def iter_emails(self, account_email: str, since: datetime, page_size: int) -> Iterator[EmailBatch]:
+        """
+        E-mails gravados da conta com `sent_datetime >= since`, mais recentes
+        primeiro, em páginas de até `page_size`, só com os campos vindos do
+        Graph (flags derivadas no padrão).
+        """
+        raise NotImplementedError
+
+    def delete_emails(self, account_email: str, message_ids: Iterable[str]) -> int:
+        """
+        Remove os e-mails apagados/movidos da pasta (ids do Graph), com os
+        agregados que dependem deles. Retorna quantos foram removidos.
+        """
         raise NotImplementedError
 
 class MetricsRepositoryPort:
     def save(self, metrics: EmailMetrics) -> None:
         """Persistir métricas diárias."""
         raise NotImplementedError
+
+class RollupRepositoryPort:
+    def rebuild_rollups(self, start: date, end: date, account_email: Optional[str] = None) -> int:
+        """Reagrega os rollups diários de [start, end] a partir dos e-mails; retorna linhas gravadas."""
+        raise NotImplementedError
+
+class SyncStateRepositoryPort:
+    def get_delta_link(self, account_email: str, folder_id: str) -> Optional[str]:
+        """Retorna o deltaLink salvo para a pasta (ou None)."""
+        raise NotImplementedError
+
+    def save_delta_link(self, account_email: str, folder_id: str, delta_link: str) -> None:
+        """Persistir o deltaLink da última sincronização concluída."""
+        raise NotImplementedError
+
+class CheckpointRepositoryPort:
+    """Checkpoints das sincronizações interrompidas (RESUMABLE_RUNS)."""
+
+    def get_checkpoint(self, account_email: str, folder_id: str) -> Optional[SyncCheckpoint]:
+        """Checkpoint da pasta (ou None se a última execução terminou)."""
+        raise NotImplementedError
+
+    def save_checkpoint(self, account_email: str, checkpoint: SyncCheckpoint) -> None:
+        """Persistir (UPSERT) o progresso; deve entrar na transação do lote que ele cobre."""
+        raise NotImplementedError
+
+    def clear_checkpoint(self, account_email: str, folder_id: str) -> None:
+        """Apaga o checkpoint ao fim de uma execução concluída."""
+        raise NotImplementedError
+
+class ConversationStateRepositoryPort:
+    def get_conversation_states(
+        self, account_email: str, conversation_ids: Iterable[str]
+    ) -> Dict[str, ConversationState]:
+        """Estados salvos das conversas informadas (as desconhecidas ficam de fora)."""
+        raise NotImplementedError
+
+    def save_conversation_states(self, account_email: str, states: List[ConversationState]) -> None:
+        """Persistir (UPSERT) os vereditos apurados nesta execução."""
+        raise NotImplementedError
+
+    def get_conversation_starts(
+        self, account_email: str, conversation_ids: Iterable[str]
+    ) -> Dict[str, datetime]:
+        """
+        `sent_datetime` do e-mail mais antigo já gravado de cada conversa
+        informada (as sem e-mail gravado ficam de fora).
+        """
+        raise NotImplementedError
+
+    def get_open_conversations(
+        self, account_email: str, started_after: datetime, checked_before: datetime, limit: int
+    ) -> Dict[str, datetime]:
+        """
+        Até `limit` conversas salvas ainda abertas (sem bounce nem resposta),
+        checadas antes de `checked_before` e cujo e-mail mais antigo gravado é
+        de `started_after` em diante, as checadas há mais tempo primeiro:
+        conversation_id -> `sent_datetime` desse e-mail.
+        """
+        raise NotImplementedError
+
+    def save_original_verdicts(self, account_email: str, verdicts: Dict[str, Verdict]) -> int:
+        """
+        Grava o veredito no e-mail original já gravado (o mais antigo) de cada
+        conversa, com os rollups dos dias afetados. Retorna os e-mails alterados.
+        """
+        raise NotImplementedError
+
+class DeliverySignalRepositoryPort:
+    def pending_delivery_signals(self, account_email: str, limit: int) -> Dict[str, str]:
+        """
+        Até `limit` e-mails da conta (mais recentes primeiro) cujo
+        internet_message_id ainda não tem sinais de entrega gravados:
+        message_id do Graph -> internet_message_id.
+        """
+        raise NotImplementedError
+
+    def save_delivery_signals(self, account_email: str, signals: List[DeliverySignals]) -> int:
+        """Grava os sinais; um internet_message_id já gravado não é reescrito. Retorna os novos."""
+        raise NotImplementedError
+
+class AccountLeaseRepositoryPort:
+    """
+    Divisão das contas entre instâncias: cada conta tem no máximo um dono
+    por vez, com lease que expira se não for renovado (instância caída).
+    Tempos seguem o relógio do banco, comum a todas as instâncias.
+    """
+
+    def heartbeat(self, node_id: str, ttl: float) -> int:
+        """Registra a instância como viva; retorna quantas estão vivas (inclui esta)."""
+        raise NotImplementedError
+
+    def claim_accounts(self, node_id: str, accounts: List[str], limit: int, ttl: float) -> List[str]:
+        """Assume até `limit` contas sem dono ou com lease vencido (sem esperar por linhas bloqueadas)."""
+        raise NotImplementedError
+
+    def renew_leases(self, node_id: str, ttl: float) -> List[str]:
+        """Estende os leases da instância; retorna as contas que continuam com ela."""
+        raise NotImplementedError
+
+    def release_leases(self, node_id: str, accounts: Optional[List[str]] = None) -> None:
+        """Libera as contas informadas (ou todas) da instância."""
+        raise NotImplementedError
+
+@dataclass
+class UnitOfWorkStats:
+    """Contadores de uma unidade de trabalho."""
+    round_trips: int = 0   # statements + COMMIT/ROLLBACK enviados ao banco
+
+
+class UnitOfWorkPort:
+    def unit_of_work(self) -> ContextManager[UnitOfWorkStats]:
+        """
+        Agrupa numa única transação tudo o que os repositórios gravarem dentro
+        do bloco (na mesma thread); commit na saída normal, rollback em erro.
+        """
+        raise NotImplementedError
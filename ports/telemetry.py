@@ -0,0 +1,6 @@
+class TelemetryPort:
+    """Métricas operacionais do caso de uso. Padrão: nada é registrado."""
+
+    def account_run(self, account_email: str, seconds: float, ok: bool) -> None:
+        """Registra a duração de uma execução da conta e se terminou sem erro."""
+        return None
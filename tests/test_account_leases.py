@@ -0,0 +1,85 @@
+import unittest
+from typing import List, Optional
+
+from adapters.scheduling.account_leases import AccountLeases
+
+ACCOUNTS = ["a@empresa.com", "b@empresa.com", "c@empresa.com", "d@empresa.com"]
+
+
+class FakeLeaseRepo:
+    """Leases de uma única instância; `nodes` simula as instâncias vivas."""
+
+    def __init__(self) -> None:
+        self.nodes = 1
+        self.held: List[str] = []
+        self.released: List[str] = []
+
+    def heartbeat(self, node_id: str, ttl: float) -> int:
+        return self.nodes
+
+    def renew_leases(self, node_id: str, ttl: float) -> List[str]:
+        return list(self.held)
+
+    def claim_accounts(self, node_id: str, accounts: List[str], limit: int, ttl: float) -> List[str]:
+        free = [a for a in accounts if a not in self.held][:limit]
+        self.held += free
+        return free
+
+    def release_leases(self, node_id: str, accounts: Optional[List[str]] = None) -> None:
+        gone = list(self.held) if accounts is None else list(accounts)
+        self.held = [a for a in self.held if a not in gone]
+        self.released += gone
+
+
+class AccountLeasesTest(unittest.TestCase):
+    def test_account_with_run_in_flight_is_released_only_after_the_run(self) -> None:
+        repo = FakeLeaseRepo()
+        leases = AccountLeases(repo, ACCOUNTS, node_id="n1", ttl=60)
+        leases.refresh()
+        self.assertEqual(leases.owned(), ACCOUNTS)
+
+        with leases.running("d@empresa.com"):
+            # Outra instância entra: a cota cai para 2, mas "d" está em execução
+            repo.nodes = 2
+            leases.refresh()
+            self.assertIn("d@empresa.com", repo.held)
+            self.assertNotIn("d@empresa.com", repo.released)
+            self.assertIn("d@empresa.com", leases.owned())
+            self.assertEqual(len(leases.owned()), 2)
+
+        # Execução terminada: a próxima renovação devolve o excedente
+        leases.refresh()
+        self.assertEqual(len(repo.held), 2)
+        self.assertEqual(len(leases.owned()), 2)
+
+    def test_surplus_in_flight_leaves_owned_but_keeps_the_lease(self) -> None:
+        repo = FakeLeaseRepo()
+        leases = AccountLeases(repo, ACCOUNTS, node_id="n1", ttl=60)
+        leases.refresh()
+
+        with leases.running("c@empresa.com"), leases.running("d@empresa.com"), leases.running("a@empresa.com"):
+            repo.nodes = 2
+            leases.refresh()
+            # Cota 2 com três em execução: a terceira não recebe nova execução, mas segue com o lease
+            self.assertEqual(len(leases.owned()), 2)
+            self.assertEqual(sorted(repo.held), sorted(["a@empresa.com", "c@empresa.com", "d@empresa.com"]))
+            self.assertEqual(repo.released, ["b@empresa.com"])
+
+        leases.refresh()
+        self.assertEqual(len(repo.held), 2)
+
+    def test_run_of_account_no_longer_owned_is_refused(self) -> None:
+        repo = FakeLeaseRepo()
+        leases = AccountLeases(repo, ACCOUNTS[:2], node_id="n1", ttl=60)
+        leases.refresh()
+        repo.nodes = 2
+        leases.refresh()
+        # "b" foi liberada depois de o agendador ler `owned()`: a execução não começa
+        self.assertEqual(repo.released, ["b@empresa.com"])
+        with self.assertRaises(RuntimeError):
+            with leases.running("b@empresa.com"):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List
+
+from application.dto.email_dto import EmailDTO
+from domain.model.conversation_state import ConversationState
+from domain.model.email_batch import NO_VERDICT, EmailBatch, Verdict
+from domain.service.email_metrics_service import DailyMetricsAccumulator
+
+ACCOUNT = "conta@empresa.com"
+T0 = datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc)
+
+
+class FakeGraph:
+    """Cabeça das conversas: o e-mail original e (com `replied`) uma resposta externa 2 h depois."""
+
+    def __init__(self, replied: bool = True) -> None:
+        self.calls = 0
+        self.replied = replied
+
+    def fetch_conversation_heads(self, account: str, conv_ids: List[str]) -> Dict[str, List[EmailDTO]]:
+        self.calls += 1
+        heads: Dict[str, List[EmailDTO]] = {}
+        for conv_id in conv_ids:
+            heads[conv_id] = [
+                EmailDTO(
+                    id=f"{conv_id}-m1", subject="Proposta", sent_datetime=T0, is_read=True,
+                    conversation_id=conv_id, has_attachments=False, from_address=ACCOUNT,
+                    to_addresses=["cliente@externo.com"],
+                ),
+            ]
+            if self.replied:
+                heads[conv_id].append(
+                    EmailDTO(
+                        id=f"{conv_id}-r1", subject="Dúvida sobre a proposta",
+                        sent_datetime=T0 + timedelta(hours=2), is_read=True, conversation_id=conv_id,
+                        has_attachments=False, from_address="cliente@externo.com", to_addresses=[ACCOUNT],
+                    )
+                )
+        return heads
+
+
+class FakeStore:
+    """Vereditos das conversas e os e-mails gravados, como no banco entre execuções."""
+
+    def __init__(self) -> None:
+        self.states: Dict[str, ConversationState] = {}
+        self.emails: Dict[str, tuple] = {}  # message_id -> (conversation_id, sent_datetime)
+        self.verdicts: Dict[str, Verdict] = {}  # message_id do original -> veredito gravado depois
+
+    def get_conversation_states(self, account_email: str, conversation_ids: Iterable[str]):
+        return {c: self.states[c] for c in conversation_ids if c in self.states}
+
+    def save_conversation_states(self, account_email: str, states: List[ConversationState]) -> None:
+        self.states.update((st.conversation_id, st) for st in states)
+
+    def get_conversation_starts(self, account_email: str, conversation_ids: Iterable[str]):
+        wanted = set(conversation_ids)
+        starts: Dict[str, datetime] = {}
+        for conv_id, sent in self.emails.values():
+            if conv_id in wanted and (conv_id not in starts or sent < starts[conv_id]):
+                starts[conv_id] = sent
+        return starts
+
+    def get_open_conversations(
+        self, account_email: str, started_after: datetime, checked_before: datetime, limit: int
+    ) -> Dict[str, datetime]:
+        starts = self.get_conversation_starts(account_email, self.states)
+        return {
+            c: starts[c]
+            for c, st in self.states.items()
+            if not st.is_final and st.last_checked_at < checked_before and starts.get(c, T0) >= started_after
+        }
+
+    def save_original_verdicts(self, account_email: str, verdicts: Dict[str, Verdict]) -> int:
+        starts = self.get_conversation_starts(account_email, verdicts)
+        for message_id, (conv_id, sent) in self.emails.items():
+            if conv_id in verdicts and sent == starts[conv_id]:
+                self.verdicts[message_id] = verdicts[conv_id]
+        return len(verdicts)
+
+    def save(self, batch: EmailBatch) -> None:
+        for i in range(len(batch)):
+            self.emails[batch.message_id[i]] = (batch.conversation_id[i], batch.sent_datetime[i])
+
+
+def run(store: FakeStore, graph: FakeGraph, mails: List[tuple]) -> tuple:
+    """Uma execução da conta sobre `mails` ((message_id, sent_datetime), conversa "c1")."""
+    acc = DailyMetricsAccumulator(graph, ACCOUNT, state_repo=store)
+    batch = EmailBatch()
+    for message_id, sent in mails:
+        batch.append(message_id, "c1", "Proposta", sent, ["cliente@externo.com"])
+    saved = acc.add(batch)
+    store.save(saved)
+    return saved, acc.result()
+
+
+class DeltaOriginalsTest(unittest.TestCase):
+    def test_follow_up_in_later_delta_run_is_not_flagged(self) -> None:
+        store, graph = FakeStore(), FakeGraph()
+
+        first, _ = run(store, graph, [("m1", T0)])
+        self.assertTrue(first.verdict(0).is_replied)
+        self.assertEqual(first.verdict(0).reply_latency_sec, 7200)
+
+        # Execução delta seguinte: só o follow-up m2 mudou; m1 continua gravado como original
+        second, metrics = run(store, graph, [("m2", T0 + timedelta(days=1))])
+        self.assertIs(second.verdict(0), NO_VERDICT)
+        self.assertEqual(graph.calls, 1)  # veredito final reaproveitado
+        # A conversa segue respondida, com a latência medida a partir do original gravado
+        self.assertEqual(metrics.total_replied, 1)
+        self.assertEqual(metrics.avg_reply_latency_sec, 7200)
+
+    def test_look_back_window_past_the_original_flags_nothing(self) -> None:
+        store, graph = FakeStore(), FakeGraph()
+        run(store, graph, [("m1", T0), ("m2", T0 + timedelta(days=1))])
+
+        # Cada execução com a janela já depois de m1: o mais antigo da janela não vira original
+        for _ in range(2):
+            saved, _ = run(store, graph, [("m3", T0 + timedelta(days=9)), ("m2", T0 + timedelta(days=1))])
+            self.assertEqual([saved.verdict(i) for i in range(len(saved))], [NO_VERDICT, NO_VERDICT])
+
+    def test_original_in_the_run_is_still_flagged(self) -> None:
+        store, graph = FakeStore(), FakeGraph()
+        run(store, graph, [("m2", T0 + timedelta(days=1))])
+
+        # Uma execução que traz o original (mais antigo que o gravado) volta a marcá-lo
+        saved, _ = run(store, graph, [("m2", T0 + timedelta(days=1)), ("m1", T0)])
+        self.assertIs(saved.verdict(0), NO_VERDICT)
+        self.assertTrue(saved.verdict(1).is_replied)
+
+
+class OpenConversationRecheckTest(unittest.TestCase):
+    def test_reply_arriving_after_the_run_updates_the_stored_original(self) -> None:
+        store, graph = FakeStore(), FakeGraph(replied=False)
+        first, _ = run(store, graph, [("m1", T0)])
+        self.assertFalse(first.verdict(0).is_replied)
+        self.assertFalse(store.states["c1"].is_final)
+
+        # A resposta chega na Caixa de Entrada: a próxima execução tem o delta de Enviados vazio
+        graph.replied = True
+        max_age, interval = timedelta(days=3650), timedelta(hours=1)
+        recent = DailyMetricsAccumulator(graph, ACCOUNT, state_repo=store)
+        self.assertEqual(recent.recheck_open(max_age, interval, 100), 0)  # checada há menos de 1 h
+        self.assertEqual(graph.calls, 1)
+
+        store.states["c1"].last_checked_at -= timedelta(hours=2)
+        later = DailyMetricsAccumulator(graph, ACCOUNT, state_repo=store)
+        self.assertEqual(later.recheck_open(max_age, interval, 100), 1)
+        self.assertTrue(store.states["c1"].is_replied)
+        self.assertEqual(store.verdicts["m1"].reply_latency_sec, 7200)
+        self.assertEqual(store.verdicts["m1"].temperature_label, "quente")
+
+        # Fechada, a conversa não volta mais ao Graph
+        store.states["c1"].last_checked_at -= timedelta(hours=2)
+        again = DailyMetricsAccumulator(graph, ACCOUNT, state_repo=store)
+        self.assertEqual(again.recheck_open(max_age, interval, 100), 0)
+        self.assertEqual(graph.calls, 2)
+
+    def test_conversation_of_this_run_is_not_rechecked(self) -> None:
+        store, graph = FakeStore(), FakeGraph(replied=False)
+        run(store, graph, [("m1", T0)])
+        store.states["c1"].last_checked_at -= timedelta(hours=2)
+
+        acc = DailyMetricsAccumulator(graph, ACCOUNT, state_repo=store)
+        batch = EmailBatch()
+        batch.append("m2", "c1", "Proposta", T0 + timedelta(days=1), ["cliente@externo.com"])
+        acc.add(batch)
+        calls = graph.calls
+        self.assertEqual(acc.recheck_open(timedelta(days=3650), timedelta(hours=1), 100), 0)
+        self.assertEqual(graph.calls, calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
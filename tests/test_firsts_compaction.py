@@ -0,0 +1,36 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from domain.model.email_batch import EmailBatch, StringPool
+from domain.service.email_metrics_service import DailyMetricsAccumulator
+
+T0 = datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc)
+
+
+class NoHeadsGraph:
+    def fetch_conversation_heads(self, account, conv_ids):
+        return {conv_id: [] for conv_id in conv_ids}
+
+
+class FirstsCompactionTest(unittest.TestCase):
+    def test_replaced_originals_are_dropped_and_still_demoted(self) -> None:
+        acc = DailyMetricsAccumulator(NoHeadsGraph(), "conta@empresa.com")
+        acc._COMPACT_MIN_DEAD = 4
+        pool = StringPool()
+
+        # Pasta em ordem decrescente: cada lote traz um original mais antigo das duas conversas
+        for step in range(50):
+            batch = EmailBatch(pool)
+            for conv_id in ("c1", "c2"):
+                batch.append(f"{conv_id}-m{step}", conv_id, "Proposta", T0 - timedelta(hours=step))
+            out = acc.add(batch)
+            if step:
+                # O original do lote anterior volta para ser regravado sem as flags
+                self.assertEqual(out.message_id[2:], [f"c1-m{step - 1}", f"c2-m{step - 1}"])
+            self.assertLessEqual(len(acc._firsts), 2 + 2 * acc._COMPACT_MIN_DEAD)
+
+        self.assertEqual(acc.result().raw_total_sent, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from adapters.scheduling import incremental_scheduler
+from adapters.scheduling.incremental_scheduler import IncrementalScheduler
+from application.usecase.fetch_and_store_metrics import AccountRunResult
+
+
+class BlockingJob:
+    """`run_account` só termina quando `release` é sinalizado."""
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def prepare(self, accounts) -> None:
+        return None
+
+    def run_account(self, account: str) -> AccountRunResult:
+        self.started.set()
+        self.release.wait(5)
+        return AccountRunResult(ok=True)
+
+
+class IncrementalSchedulerTest(unittest.TestCase):
+    def test_saturated_workers_with_overdue_accounts_do_not_spin(self) -> None:
+        job = BlockingJob()
+        scheduler = IncrementalScheduler(
+            job, accounts=["a@x", "b@x", "c@x"], min_interval=0.0, max_interval=60.0, workers=1,
+        )
+        calls = []
+        real_wait = incremental_scheduler.wait
+
+        def counting_wait(*args, **kwargs):
+            calls.append(kwargs.get("timeout"))
+            return real_wait(*args, **kwargs)
+
+        with mock.patch.object(incremental_scheduler, "wait", counting_wait):
+            loop = threading.Thread(target=scheduler.start)
+            loop.start()
+            self.assertTrue(job.started.wait(5))
+            time.sleep(0.3)  # uma conta rodando, as outras duas vencidas e sem vaga
+            waits = len(calls)
+            scheduler.stop()
+            job.release.set()
+            loop.join(5)
+
+        self.assertFalse(loop.is_alive())
+        self.assertLessEqual(waits, 2)
+        self.assertEqual(calls[0], IncrementalScheduler._MAX_WAIT)
+
+
+if __name__ == "__main__":
+    unittest.main()